@@ -0,0 +1,332 @@
+#Benchmarks del compilador con programas sinteticos.
+#Uso: python benchmark.py --tamanos 1000 10000 100000 --salida resultados.json
+#     python benchmark.py --comparar resultados.json     (contra una corrida anterior)
+#     python benchmark.py --errores 300     (los motores reportan los mismos errores)
+#Cada fase (lexer, parser, escritura) se mide por separado en varios tamanos; el
+#exponente entre tamanos consecutivos muestra como crece el tiempo: cerca de 1 es
+#lineal, cerca de 2 es cuadratico
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from proyFinal import MOTORES, crear_parser, lexer, lexer_compacto
+
+FASES = ('lexer', 'lexer_compacto', 'parser', 'texto', 'binario')
+#Lexemas que mutar_programa inserta o pone en lugar de otro
+LEXEMAS_MUTACION = ('being', 'end', 'entero', 'real', 'if', 'else', 'while', 'endwhile', '(', ')',
+                    ',', ';', ':=', '=', '<', '+', '*', 'and', 'or', 'not', 'v0', '1', '2.5')
+OPERADORES = ('+', '-', '*', '/')
+COMPARADORES = ('=', '<=', '>=', '<>', '<', '>')
+CONECTORES = ('and', 'or')
+
+def generar_programa(sentencias=100, declaraciones=10, largo_expresion=5, profundidad_parentesis=2,
+                     anidamiento=2, semilla=0):
+    """Programa valido (tambien en tipos) con el numero de sentencias pedido (asignaciones y
+    encabezados de if/while), declaraciones variables, expresiones de
+    largo_expresion operandos con parentesis hasta profundidad_parentesis e
+    if/while anidados hasta anidamiento niveles. Las condiciones unen
+    comparaciones con and/or, a veces negadas con not (tambien un and/or entre
+    parentesis). Se arma sin recursion, asi que cualquier profundidad es
+    posible; la misma semilla da el mismo programa"""
+    azar = random.Random(semilla)
+    variables = [f"v{i}" for i in range(max(1, declaraciones))]
+    partes = ["being\n"]
+    for inicio in range(0, len(variables), 8):
+        grupo = variables[inicio:inicio + 8]
+        partes.append(f"{'entero' if inicio // 8 % 2 == 0 else 'real'} {', '.join(grupo)};\n")
+
+    #Las variables enteras solo reciben expresiones enteras (ver semantica.py)
+    lista_enteras = [v for i, v in enumerate(variables) if i // 8 % 2 == 0]
+    enteras = set(lista_enteras)
+
+    def operando(entera=False):
+        if azar.random() < 0.7:
+            return azar.choice(lista_enteras if entera else variables)
+        if entera or azar.random() < 0.8:
+            return str(azar.randint(1, 99))
+        return f"{azar.randint(0, 99)}.{azar.randint(0, 9)}"
+
+    def asignacion():
+        destino = azar.choice(variables)
+        return f"{destino} := {expresion(destino in enteras)}"
+
+    def expresion(entera=False):
+        piezas = []
+        abiertos = 0
+        for k in range(max(1, largo_expresion)):
+            if k:
+                piezas.append(azar.choice(OPERADORES))
+            while abiertos < profundidad_parentesis and k < largo_expresion - 1 and azar.random() < 0.3:
+                piezas.append("(")
+                abiertos += 1
+            piezas.append(operando(entera))
+            while abiertos and azar.random() < 0.3:
+                piezas.append(")")
+                abiertos -= 1
+        piezas.extend(")" * abiertos)
+        return " ".join(piezas)
+
+    def comparacion():
+        return f"{azar.choice(variables)} {azar.choice(COMPARADORES)} {operando()}"
+
+    def condicion():
+        piezas = []
+        for k in range(azar.choice((1, 1, 2, 3))):
+            if k:
+                piezas.append(azar.choice(CONECTORES))
+            eleccion = azar.random()
+            if eleccion < 0.2:
+                piezas.append(f"not ({comparacion()} {azar.choice(CONECTORES)} {comparacion()})")
+            elif eleccion < 0.35:
+                piezas.append(f"not {comparacion()}")
+            else:
+                piezas.append(comparacion())
+        return " ".join(piezas)
+
+    #Pila de bloques abiertos: [cierre, sentencias del bloque, admite else]
+    bloques = [[None, 0, False]]
+    for _ in range(sentencias):
+        bloque = bloques[-1]
+        #Cerrar el bloque actual (si ya tiene algo) deja espacio para otras construcciones
+        while len(bloques) > 1 and bloque[1] and azar.random() < 0.25:
+            if bloque[2] and azar.random() < 0.5:
+                partes.append(" else\n")
+                bloque[1] = 0
+                bloque[2] = False
+                break
+            partes.append(f" {bloques.pop()[0]}")
+            bloque = bloques[-1]
+        if bloque[1]:
+            partes.append(";\n")
+        bloque[1] += 1
+        partes.append("  " * (len(bloques) - 1))
+        if len(bloques) <= anidamiento and azar.random() < 0.3:
+            if azar.random() < 0.5:
+                partes.append(f"if ({condicion()})\n")
+                bloques.append(["end", 0, True])
+            else:
+                partes.append(f"while ({condicion()})\n")
+                bloques.append(["endwhile", 0, False])
+        else:
+            partes.append(asignacion())
+    #Un bloque recien abierto necesita al menos una orden
+    while len(bloques) > 1:
+        cierre, cantidad, _ = bloques.pop()
+        if not cantidad:
+            partes.append(asignacion())
+        partes.append(f" {cierre}")
+    if not bloques[0][1]:
+        partes.append(f"{variables[0]} := {expresion(True)}")
+    partes.append("\nend\n")
+    return "".join(partes)
+
+def mutar_programa(codigo_fuente, cambios=2, semilla=0):
+    """El programa con cambios tokens borrados, insertados o reemplazados al azar;
+    casi siempre queda con errores de sintaxis"""
+    azar = random.Random(semilla)
+    lexemas = [valor for _, valor in lexer(codigo_fuente)]
+    for _ in range(cambios):
+        i = azar.randrange(len(lexemas) + 1)
+        eleccion = azar.random()
+        if eleccion < 0.4 and i < len(lexemas):
+            del lexemas[i]
+        elif eleccion < 0.7 or i == len(lexemas):
+            lexemas.insert(i, azar.choice(LEXEMAS_MUTACION))
+        else:
+            lexemas[i] = azar.choice(LEXEMAS_MUTACION)
+    return " ".join(lexemas)
+
+def comparar_errores(programas=300, semilla=0):
+    """Analiza programas chicos mutados con cada motor (con recuperacion de
+    errores) y regresa los que no dan la misma lista de errores en todos:
+    [(codigo_fuente, {motor: errores})]"""
+    azar = random.Random(semilla)
+    distintos = []
+    for k in range(programas):
+        codigo_fuente = generar_programa(azar.randint(2, 12), declaraciones=3, largo_expresion=3,
+                                         semilla=semilla + k)
+        codigo_fuente = mutar_programa(codigo_fuente, azar.randint(1, 4), azar.getrandbits(32))
+        errores = {motor: crear_parser(lexer_compacto(codigo_fuente), motor=motor).programa()[1]
+                   for motor in MOTORES}
+        if any(lista != errores[MOTORES[0]] for lista in errores.values()):
+            distintos.append((codigo_fuente, errores))
+    return distintos
+
+def medir(funcion, repeticiones):
+    """Mejor tiempo de varias repeticiones (sin el recolector de basura de por
+    medio, como timeit) y el resultado de la ultima"""
+    mejor = math.inf
+    resultado = None
+    activo = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+    finally:
+        if activo:
+            gc.enable()
+    return mejor, resultado
+
+def medir_tamano(codigo_fuente, repeticiones=3, motor='descendente', directorio=None):
+    """Tiempos de cada fase para un programa: {fase: segundos} y sus medidas"""
+    tiempos = {}
+    tiempos['lexer'], _ = medir(lambda: lexer(codigo_fuente), repeticiones)
+    tiempos['lexer_compacto'], tokens = medir(lambda: lexer_compacto(codigo_fuente), repeticiones)
+
+    def analizar():
+        parser = crear_parser(tokens, motor=motor)
+        exito, errores = parser.programa()
+        if not exito:
+            raise ValueError(f"El programa generado tiene errores: {errores[:3]}")
+        return parser
+    tiempos['parser'], parser = medir(analizar, repeticiones)
+
+    with tempfile.TemporaryDirectory(dir=directorio) as temporal:
+        for fase, nombre in (('texto', 'salida.3d'), ('binario', 'salida.3db')):
+            ruta = os.path.join(temporal, nombre)
+            with contextlib.redirect_stdout(io.StringIO()):
+                tiempos[fase], _ = medir(lambda: parser.guardar_codigo_archivo(ruta), repeticiones)
+    return {'tokens': len(tokens), 'cuadruplos': len(parser.cuadruplos),
+            'bytes': len(codigo_fuente), 'tiempos': tiempos}
+
+def correr(tamanos, repeticiones=3, motor='descendente', **generador):
+    """Mide todas las fases en cada tamano (numero de sentencias)"""
+    resultados = []
+    for sentencias in tamanos:
+        codigo_fuente = generar_programa(sentencias, **generador)
+        medida = medir_tamano(codigo_fuente, repeticiones, motor)
+        medida['sentencias'] = sentencias
+        resultados.append(medida)
+    return resultados
+
+def exponente(resultados, fase):
+    """Pendiente del ajuste log(tiempo) contra log(tokens): 1 es lineal, 2 cuadratico"""
+    puntos = [(math.log(r['tokens']), math.log(r['tiempos'][fase]))
+              for r in resultados if r['tiempos'][fase] > 0]
+    if len(puntos) < 2:
+        return None
+    media_x = sum(x for x, _ in puntos) / len(puntos)
+    media_y = sum(y for _, y in puntos) / len(puntos)
+    varianza = sum((x - media_x) ** 2 for x, _ in puntos)
+    if not varianza:
+        return None
+    return sum((x - media_x) * (y - media_y) for x, y in puntos) / varianza
+
+def mostrar_resultados(resultados):
+    """Tabla por fase con tiempo, costo por token y una curva de escalamiento:
+    la barra es el costo por token, asi que plana es lineal y creciente es peor"""
+    for fase in FASES:
+        print("\n" + f"\033[95m{fase.upper()}\033[0m")
+        print("=" * 72)
+        print(f"{'Sentencias':>10} | {'Tokens':>10} | {'Tiempo (ms)':>12} | {'ns/token':>9} | Exp. | Curva")
+        print("-" * 72)
+        costos = [r['tiempos'][fase] / r['tokens'] * 1e9 for r in resultados]
+        maximo = max(costos) or 1
+        anterior = None
+        for r, costo in zip(resultados, costos):
+            tiempo = r['tiempos'][fase]
+            local = ""
+            if anterior is not None and anterior['tiempos'][fase] > 0 and tiempo > 0 \
+                    and r['tokens'] != anterior['tokens']:
+                local = f"{math.log(tiempo / anterior['tiempos'][fase]) / math.log(r['tokens'] / anterior['tokens']):.2f}"
+            barra = "#" * max(1, round(costo / maximo * 20))
+            print(f"{r['sentencias']:>10} | {r['tokens']:>10} | {tiempo * 1000:>12.3f} | "
+                  f"{costo:>9.1f} | {local:>4} | {barra}")
+            anterior = r
+        pendiente = exponente(resultados, fase)
+        if pendiente is not None:
+            aviso = "  \033[31m(crece mas que lineal)\033[0m" if pendiente > 1.3 else ""
+            print(f"Exponente ajustado: {pendiente:.2f}{aviso}")
+
+def comparar(resultados, anteriores):
+    """Cociente de tiempos contra una corrida anterior en los tamanos comunes
+    (menor que 1 es mejora)"""
+    por_tamano = {r['sentencias']: r for r in anteriores['resultados']}
+    print("\n" + "\033[95mCOMPARACION CON LA CORRIDA ANTERIOR\033[0m")
+    print("=" * 72)
+    print(f"{'Sentencias':>10} | " + " | ".join(f"{fase:>14}" for fase in FASES))
+    print("-" * 72)
+    for r in resultados:
+        anterior = por_tamano.get(r['sentencias'])
+        if anterior is None:
+            continue
+        cocientes = []
+        for fase in FASES:
+            antes = anterior['tiempos'].get(fase)
+            cocientes.append(f"{r['tiempos'][fase] / antes:>13.2f}x" if antes else f"{'-':>14}")
+        print(f"{r['sentencias']:>10} | " + " | ".join(cocientes))
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        prog='benchmark.py',
+        description="Mide lexer, parser y escritura con programas sinteticos de varios tamanos")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1000, 4000, 16000, 64000],
+                        help="numero de sentencias de cada programa")
+    parser.add_argument('--declaraciones', type=int, default=20)
+    parser.add_argument('--largo-expresion', type=int, default=5, help="operandos por expresion")
+    parser.add_argument('--parentesis', type=int, default=2, help="profundidad maxima de parentesis")
+    parser.add_argument('--anidamiento', type=int, default=3, help="profundidad maxima de if/while")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('-r', '--repeticiones', type=int, default=3)
+    parser.add_argument('--motor', choices=MOTORES, default='descendente')
+    parser.add_argument('--salida', metavar='JSON', help="guarda los resultados en este archivo")
+    parser.add_argument('--comparar', metavar='JSON', help="resultados de una corrida anterior")
+    parser.add_argument('--generar', type=int, metavar='N',
+                        help="solo escribe en pantalla un programa de N sentencias")
+    parser.add_argument('--errores', type=int, metavar='N',
+                        help="solo revisa que los motores den los mismos errores en N programas mutados")
+    opciones = parser.parse_args(argumentos)
+    generador = {'declaraciones': opciones.declaraciones, 'largo_expresion': opciones.largo_expresion,
+                 'profundidad_parentesis': opciones.parentesis, 'anidamiento': opciones.anidamiento,
+                 'semilla': opciones.semilla}
+    if opciones.generar is not None:
+        sys.stdout.write(generar_programa(opciones.generar, **generador))
+        return 0
+    if opciones.errores is not None:
+        distintos = comparar_errores(opciones.errores, opciones.semilla)
+        for codigo_fuente, errores in distintos[:3]:
+            print(codigo_fuente)
+            for motor, lista in errores.items():
+                print(f"  {motor}: {lista}")
+        print(f"Errores distintos entre motores: {len(distintos)} de {opciones.errores} programas")
+        return 1 if distintos else 0
+    if opciones.repeticiones < 1:
+        parser.error("se necesita al menos una repeticion")
+
+    anteriores = None
+    if opciones.comparar:
+        with open(opciones.comparar, encoding='utf-8') as f:
+            anteriores = json.load(f)
+
+    resultados = correr(sorted(opciones.tamanos), opciones.repeticiones, opciones.motor, **generador)
+    mostrar_resultados(resultados)
+    if anteriores is not None:
+        comparar(resultados, anteriores)
+    if opciones.salida:
+        corrida = {
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'motor': opciones.motor,
+            'repeticiones': opciones.repeticiones,
+            'generador': generador,
+            'resultados': resultados,
+        }
+        with open(opciones.salida, 'w', encoding='utf-8') as f:
+            json.dump(corrida, f, indent=2)
+        print(f"\nResultados guardados en: {opciones.salida}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+#Cache de compilacion por contenido: la clave es el hash del codigo fuente, de
+#las opciones de compilacion y del propio compilador, asi que un cambio en
+#cualquiera de los tres da otra clave y lo viejo simplemente deja de usarse.
+#Cada entrada guarda tokens, cuadruplos, tabla de simbolos y errores en columnas
+#de array serializadas con marshal (<hash>.bin); el directorio se mantiene bajo
+#un tamano maximo expulsando lo menos usado (por fecha de modificacion) y encima
+#hay un nivel en memoria para los archivos que se repiten en el mismo proceso
+import hashlib
+import marshal
+import os
+import tempfile
+from array import array
+from collections import OrderedDict
+
+from proyFinal import Simbolo, TablaCuadruplos, TokensCompactos, compilar_fuente, crear_parser
+
+#Modulos cuyo codigo cambia lo que produce la compilacion
+MODULOS_COMPILADOR = ('proyFinal.py', 'motor_ll1.py', 'optimizador.py', 'ciclos.py', 'grafo_flujo.py',
+                      'semantica.py')
+VERSION_FORMATO = 1
+EXTENSION_ENTRADA = '.bin'
+
+_huella_compilador = None
+
+def huella_compilador():
+    """Hash de las fuentes del compilador (se calcula una vez por proceso)"""
+    global _huella_compilador
+    if _huella_compilador is None:
+        huella = hashlib.sha256(str(VERSION_FORMATO).encode())
+        directorio = os.path.dirname(os.path.abspath(__file__))
+        for nombre in MODULOS_COMPILADOR:
+            try:
+                with open(os.path.join(directorio, nombre), 'rb') as f:
+                    huella.update(f.read())
+            except OSError:
+                huella.update(nombre.encode())
+        _huella_compilador = huella.digest()
+    return _huella_compilador
+
+def clave_compilacion(codigo_fuente, motor='descendente', reutilizar_temporales=False, optimizar=False,
+                      recuperar_errores=True, verificar_tipos=True):
+    clave = hashlib.sha256(huella_compilador())
+    clave.update(f"{motor}|{int(reutilizar_temporales)}|{int(optimizar)}|"
+                 f"{int(recuperar_errores)}|{int(verificar_tipos)}|".encode())
+    clave.update(codigo_fuente.encode('utf-8', 'surrogatepass'))
+    return clave.hexdigest()
+
+def _empacar(tokens, parser, exito, errores):
+    """Estado de una compilacion como tupla de tipos basicos (lo que marshal acepta)"""
+    if tokens is None:
+        return (exito, tuple(errores), None, None, (), None, None, None, None, (), (), (0, 0, 0, 0, 0))
+    cuadruplos = parser.cuadruplos
+    return (exito, tuple(errores), tokens.tipos.tobytes(), tokens.ids_lexema.tobytes(),
+            tuple(tokens.lexemas), cuadruplos.ops.tobytes(), cuadruplos.args1.tobytes(),
+            cuadruplos.args2.tobytes(), cuadruplos.resultados.tobytes(), tuple(cuadruplos.operandos),
+            tuple((simbolo.nombre, simbolo.tipo) for simbolo in parser.tabla_simbolos.values()),
+            (parser.contador_temp, parser.temporales_pedidas, parser.max_temporales_vivas,
+             parser.contador_etiqueta, parser.max_anidamiento))
+
+def _desempacar(estado, codigo_fuente, motor, reutilizar_temporales, recuperar_errores):
+    """Reconstruye (tokens, parser, exito, errores) sin pasar por lexer ni parser"""
+    (exito, errores, tipos, ids_lexema, lexemas, ops, args1, args2, resultados,
+     operandos, simbolos, contadores) = estado
+    if tipos is None:
+        return None, None, exito, list(errores)
+    tokens = TokensCompactos(codigo_fuente, array('B', tipos), array('I', ids_lexema), list(lexemas))
+    parser = crear_parser(tokens, motor=motor, reutilizar_temporales=reutilizar_temporales,
+                          recuperar_errores=recuperar_errores)
+    cuadruplos = TablaCuadruplos()
+    cuadruplos.ops = array('B', ops)
+    cuadruplos.args1 = array('I', args1)
+    cuadruplos.args2 = array('I', args2)
+    cuadruplos.resultados = array('I', resultados)
+    cuadruplos.operandos = list(operandos)
+    cuadruplos.indices_operando = {operando: i for i, operando in enumerate(operandos)}
+    parser.cuadruplos = cuadruplos
+    parser.tabla_simbolos = {nombre: Simbolo(nombre, tipo) for nombre, tipo in simbolos}
+    (parser.contador_temp, parser.temporales_pedidas, parser.max_temporales_vivas,
+     parser.contador_etiqueta, parser.max_anidamiento) = contadores
+    parser.errores = list(errores)
+    return tokens, parser, exito, list(errores)
+
+class CacheCompilacion:
+    """Cache de dos niveles (memoria y disco) delante de compilar_fuente"""
+
+    def __init__(self, directorio='.cache_3d', max_bytes=64 * 1024 * 1024, max_memoria=128):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.max_memoria = max_memoria
+        self.memoria = OrderedDict()  #Clave -> estado empacado, del menos al mas reciente
+        self.estadisticas = dict.fromkeys(('aciertos_memoria', 'aciertos_disco', 'fallos',
+                                           'escrituras', 'expulsiones'), 0)
+        self._bytes_disco = None  #Se mide la primera vez que se escribe
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave + EXTENSION_ENTRADA)
+
+    def compilar(self, codigo_fuente, motor='descendente', reutilizar_temporales=False, optimizar=False,
+                 recuperar_errores=True, verificar_tipos=True):
+        """Como compilar_fuente, pero devuelve (tokens, parser, exito, errores, origen)
+        con origen 'memoria', 'disco' o 'compilado'"""
+        clave = clave_compilacion(codigo_fuente, motor, reutilizar_temporales, optimizar,
+                                  recuperar_errores, verificar_tipos)
+        estado = self.memoria.get(clave)
+        if estado is not None:
+            self.memoria.move_to_end(clave)
+            self.estadisticas['aciertos_memoria'] += 1
+            return (*_desempacar(estado, codigo_fuente, motor, reutilizar_temporales, recuperar_errores),
+                    'memoria')
+        estado = self._leer(clave)
+        if estado is not None:
+            self._recordar(clave, estado)
+            self.estadisticas['aciertos_disco'] += 1
+            return (*_desempacar(estado, codigo_fuente, motor, reutilizar_temporales, recuperar_errores),
+                    'disco')
+        self.estadisticas['fallos'] += 1
+        tokens, parser, exito, errores = compilar_fuente(codigo_fuente, motor, reutilizar_temporales,
+                                                         optimizar, None, recuperar_errores, verificar_tipos)
+        estado = _empacar(tokens, parser, exito, errores)
+        self._escribir(clave, estado)
+        self._recordar(clave, estado)
+        return tokens, parser, exito, errores, 'compilado'
+
+    def _recordar(self, clave, estado):
+        self.memoria[clave] = estado
+        while len(self.memoria) > self.max_memoria:
+            self.memoria.popitem(last=False)
+
+    def _leer(self, clave):
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, 'rb') as f:
+                estado = marshal.load(f)
+            os.utime(ruta)  #Marca el uso para la expulsion LRU
+        except (OSError, EOFError, ValueError, TypeError):
+            return None  #No existe, o quedo a medias: se recompila
+        if not isinstance(estado, tuple) or len(estado) != 12:
+            return None
+        return estado
+
+    def _escribir(self, clave, estado):
+        datos = marshal.dumps(estado)
+        if len(datos) > self.max_bytes:
+            return
+        #Archivo temporal y os.replace: otro proceso nunca ve una entrada a medias
+        try:
+            descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(datos)
+            os.replace(temporal, self._ruta(clave))
+        except OSError:
+            return
+        self.estadisticas['escrituras'] += 1
+        if self._bytes_disco is None:
+            self._bytes_disco = sum(tamano for _, tamano, _ in self._entradas())
+        else:
+            self._bytes_disco += len(datos)
+        if self._bytes_disco > self.max_bytes:
+            self.expulsar()
+
+    def _entradas(self):
+        """(fecha de uso, tamano, ruta) de cada entrada en disco"""
+        entradas = []
+        with os.scandir(self.directorio) as iterador:
+            for entrada in iterador:
+                if entrada.name.endswith(EXTENSION_ENTRADA):
+                    try:
+                        informacion = entrada.stat()
+                    except OSError:
+                        continue
+                    entradas.append((informacion.st_mtime, informacion.st_size, entrada.path))
+        return entradas
+
+    def expulsar(self):
+        """Borra las entradas menos usadas hasta bajar al 90% del maximo; se vuelve
+        a medir el directorio porque otros procesos pueden estar escribiendo en el"""
+        entradas = sorted(self._entradas())
+        total = sum(tamano for _, tamano, _ in entradas)
+        objetivo = self.max_bytes * 9 // 10
+        for _, tamano, ruta in entradas:
+            if total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            total -= tamano
+            self.estadisticas['expulsiones'] += 1
+        self._bytes_disco = total
+
+    def limpiar(self):
+        """Borra todas las entradas, en memoria y en disco"""
+        self.memoria.clear()
+        for _, _, ruta in self._entradas():
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+        self._bytes_disco = 0
+
+    def mostrar_estadisticas(self):
+        """Muestra aciertos, fallos y movimiento del directorio"""
+        estadisticas = self.estadisticas
+        consultas = estadisticas['aciertos_memoria'] + estadisticas['aciertos_disco'] + estadisticas['fallos']
+        aciertos = consultas - estadisticas['fallos']
+        print("\n" + "\033[95mCACHE DE COMPILACION\033[0m")
+        print("=" * 60)
+        for nombre, cantidad in estadisticas.items():
+            print(f"{nombre:<24} | {cantidad:>8}")
+        print("-" * 60)
+        if consultas:
+            print(f"Aciertos: {aciertos}/{consultas} ({aciertos / consultas:.1%})")
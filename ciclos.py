@@ -0,0 +1,195 @@
+#Optimizacion de ciclos sobre el grafo de flujo: movimiento de codigo invariante
+#a un preencabezado y reduccion de fuerza de variables de induccion.
+#Los valores que se calculan en el preencabezado viven en variables _c0, _c1...
+#(el guion bajo no es valido en un identificador, asi que no chocan con el programa)
+#y cruzan bloques, por eso el optimizador local las trata como variables
+import re
+from collections import Counter
+
+from grafo_flujo import Bloque, GrafoFlujo
+from optimizador import es_constante, es_temporal, valor_constante
+
+_PATRON_VARIABLE_CICLO = re.compile(r'_c(\d+)')
+
+def _es_entero(operando):
+    return es_constante(operando) and isinstance(valor_constante(operando), int)
+
+class OptimizadorCiclos:
+    """Encuentra los ciclos naturales (las aristas de regreso de cada while) y,
+    de los internos a los externos, saca lo invariante y reduce multiplicaciones"""
+
+    def __init__(self, invariantes=True, induccion=True, tabla_simbolos=None):
+        self.invariantes = invariantes
+        self.induccion = induccion
+        self.tabla_simbolos = tabla_simbolos or {}
+        self.estadisticas = dict.fromkeys(('ciclos', 'preencabezados', 'invariantes',
+                                           'reducciones'), 0)
+        self.contador = 0
+
+    def es_temporal(self, operando):
+        return es_temporal(operando, self.tabla_simbolos)
+
+    def nueva_variable(self):
+        nombre = f"_c{self.contador}"
+        self.contador += 1
+        return nombre
+
+    def optimizar(self, cuadruplos):
+        """Devuelve los cuadruplos con los ciclos optimizados"""
+        cuadruplos = list(cuadruplos)
+        #Si ya se corrio antes, se sigue la numeracion de sus variables
+        for cuadruplo in cuadruplos:
+            coincidencia = _PATRON_VARIABLE_CICLO.fullmatch(cuadruplo[3] or '')
+            if coincidencia:
+                self.contador = max(self.contador, int(coincidencia.group(1)) + 1)
+
+        grafo = GrafoFlujo(cuadruplos)
+        ciclos = grafo.ciclos_naturales()
+        self.estadisticas['ciclos'] += len(ciclos)
+        for cabecera, cuerpo in ciclos:
+            preencabezado = self._optimizar_ciclo(grafo, cabecera, cuerpo)
+            if preencabezado is not None:
+                #El preencabezado queda dentro de los ciclos que envuelven a este
+                for _, otro in ciclos:
+                    if cabecera in otro and otro is not cuerpo:
+                        otro.add(preencabezado)
+        grafo.renumerar_etiquetas()
+        return grafo.cuadruplos()
+
+    def _optimizar_ciclo(self, grafo, cabecera, cuerpo):
+        posicion = grafo.bloques.index(cabecera)
+        anterior = grafo.bloques[posicion - 1] if posicion else None
+        #El preencabezado va justo antes de la cabecera: no se puede si un bloque
+        #del ciclo cae de largo en ella
+        if anterior in cuerpo and (anterior.salto is None or anterior.salto[0] != 'goto'):
+            return None
+        bloques = [bloque for bloque in grafo.bloques if bloque in cuerpo]
+        definiciones = Counter(cuadruplo[3] for bloque in bloques
+                               for cuadruplo in bloque.instrucciones)
+        calculos = []
+        if self.invariantes:
+            calculos.extend(self._mover_invariantes(bloques, definiciones))
+        if self.induccion:
+            calculos.extend(self._reducir_fuerza(bloques, definiciones))
+        if not calculos:
+            return None
+
+        preencabezado = Bloque(len(grafo.bloques), instrucciones=calculos)
+        for bloque in grafo.bloques:
+            if bloque not in cuerpo and bloque.salto is not None and bloque.destino is cabecera:
+                bloque.destino = preencabezado
+        grafo.bloques.insert(posicion, preencabezado)
+        grafo._enlazar()
+        self.estadisticas['preencabezados'] += 1
+        return preencabezado
+
+    def _mover_invariantes(self, bloques, definiciones):
+        """Un calculo es invariante si sus operandos son constantes, no se asignan
+        en el ciclo o son temporales invariantes. Se calcula una vez en el
+        preencabezado y en el ciclo queda una copia (las variables _c de un ciclo
+        interno se mueven tal cual). Como el cuerpo de un while puede no
+        ejecutarse, solo se hacen calculos sin efectos: nunca una division entre
+        algo que pueda ser cero"""
+        equivalentes = {}  #Temporal invariante -> operando con su valor antes del ciclo
+        calculos = []
+
+        def invariante(operando):
+            return (es_constante(operando) or definiciones[operando] == 0
+                    or operando in equivalentes)
+
+        cambios = True
+        while cambios:
+            cambios = False
+            for bloque in bloques:
+                instrucciones = bloque.instrucciones
+                for i, (op, arg1, arg2, resultado) in enumerate(instrucciones):
+                    if resultado in equivalentes or op is None:
+                        continue
+                    if (_PATRON_VARIABLE_CICLO.fullmatch(resultado) and definiciones[resultado] == 1
+                            and invariante(arg1) and (arg2 is None or invariante(arg2))):
+                        calculos.append((op, equivalentes.get(arg1, arg1),
+                                         equivalentes.get(arg2, arg2), resultado))
+                        instrucciones[i] = (None, None, None, None)  #Se quita al final
+                        equivalentes[resultado] = resultado
+                        self.estadisticas['invariantes'] += 1
+                        cambios = True
+                        continue
+                    unica = self.es_temporal(resultado) and definiciones[resultado] == 1
+                    if op == ':=':
+                        if unica and invariante(arg1):
+                            equivalentes[resultado] = equivalentes.get(arg1, arg1)
+                            cambios = True
+                        continue
+                    if (not invariante(arg1) or not invariante(arg2)
+                            or (es_constante(arg1) and es_constante(arg2))
+                            or (op == '/' and not (es_constante(arg2) and valor_constante(arg2) != 0))):
+                        continue
+                    nombre = self.nueva_variable()
+                    calculos.append((op, equivalentes.get(arg1, arg1), equivalentes.get(arg2, arg2), nombre))
+                    instrucciones[i] = (':=', nombre, None, resultado)
+                    if unica:
+                        equivalentes[resultado] = nombre
+                    self.estadisticas['invariantes'] += 1
+                    cambios = True
+        for bloque in bloques:
+            bloque.instrucciones = [cuadruplo for cuadruplo in bloque.instrucciones
+                                    if cuadruplo[0] is not None]
+        return calculos
+
+    def _reducir_fuerza(self, bloques, definiciones):
+        """Una variable entera de induccion i cambia una sola vez por vuelta en un
+        paso constante (i := i + k, directo o a traves de una temporal). Cada
+        i * c con c constante se sustituye por una variable que empieza en i * c
+        antes del ciclo y suma k * c justo despues de cada cambio de i"""
+        pasos = {}  #Variable de induccion -> (bloque, posicion de su asignacion, paso)
+        for bloque in bloques:
+            instrucciones = bloque.instrucciones
+            for i, (op, arg1, arg2, resultado) in enumerate(instrucciones):
+                if definiciones[resultado] != 1:
+                    continue
+                simbolo = self.tabla_simbolos.get(resultado)
+                if simbolo is None or simbolo.tipo != 'entero':
+                    continue
+                if op == ':=' and i and self.es_temporal(arg1) and definiciones[arg1] == 1:
+                    op, arg1, arg2, temporal = instrucciones[i - 1]
+                    if temporal != instrucciones[i][1]:
+                        continue
+                if op == '+' and arg2 == resultado:
+                    arg1, arg2 = arg2, arg1
+                if op in ('+', '-') and arg1 == resultado and _es_entero(arg2):
+                    paso = valor_constante(arg2)
+                    pasos[resultado] = (bloque, i, paso if op == '+' else -paso)
+
+        reducidas = {}  #(variable de induccion, constante) -> variable reducida
+        calculos = []
+        for bloque in bloques:
+            instrucciones = bloque.instrucciones
+            for i, (op, arg1, arg2, resultado) in enumerate(instrucciones):
+                if op != '*':
+                    continue
+                if arg2 in pasos and _es_entero(arg1):
+                    arg1, arg2 = arg2, arg1
+                if arg1 not in pasos or not _es_entero(arg2) or resultado == arg1:
+                    continue
+                clave = (arg1, valor_constante(arg2))
+                if clave not in reducidas:
+                    reducidas[clave] = self.nueva_variable()
+                    calculos.append(('*', arg1, arg2, reducidas[clave]))
+                instrucciones[i] = (':=', reducidas[clave], None, resultado)
+                self.estadisticas['reducciones'] += 1
+
+        #Las actualizaciones se insertan al final para no mover las posiciones guardadas
+        actualizaciones = sorted(((pasos[variable][0].instrucciones, pasos[variable][1],
+                                   ('+', nombre, repr(pasos[variable][2] * constante), nombre))
+                                  for (variable, constante), nombre in reducidas.items()),
+                                 key=lambda actualizacion: -actualizacion[1])
+        for instrucciones, i, cuadruplo in actualizaciones:
+            instrucciones.insert(i + 1, cuadruplo)
+        return calculos
+
+    def mostrar_reporte(self):
+        """Muestra los ciclos encontrados y lo que se hizo en ellos"""
+        print("\n" + "\033[95mOPTIMIZACION DE CICLOS\033[0m")
+        print("=" * 60)
+        for nombre, cantidad in self.estadisticas.items():
+            print(f"{nombre:<24} | {cantidad:>8}")
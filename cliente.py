@@ -0,0 +1,176 @@
+#Cliente del servidor de compilacion (servidor.py). Solo usa la biblioteca
+#estandar y no importa el compilador, asi que arranca rapido.
+#    with Cliente('/tmp/compilador.sock') as cliente:      (o Cliente(('127.0.0.1', 8765)))
+#        respuesta = cliente.compilar(codigo, motor='ll1', optimizar=True)
+#        respuesta['exito'], respuesta['cuadruplos'], respuesta['errores']
+#ClienteAsincrono hace lo mismo con asyncio y permite muchas compilaciones a la
+#vez por la misma conexion.
+#Uso desde la linea de comandos: python cliente.py --unix /tmp/compilador.sock programa.txt ...
+import argparse
+import asyncio
+import itertools
+import json
+import socket
+import sys
+
+class ErrorServidor(Exception):
+    """El servidor contesto ok=false"""
+
+def _linea(peticion):
+    return json.dumps(peticion, separators=(',', ':')).encode() + b'\n'
+
+def _peticion_compilar(identificador, codigo_fuente, cuadruplos, opciones):
+    return {'id': identificador, 'op': 'compilar', 'codigo': codigo_fuente,
+            'opciones': opciones, 'cuadruplos': cuadruplos}
+
+def _revisar(respuesta):
+    if not respuesta.get('ok'):
+        raise ErrorServidor(respuesta.get('error', "Error desconocido"))
+    return respuesta
+
+class Cliente:
+    """Conexion sincrona: una peticion a la vez. direccion es la ruta de un
+    socket Unix o una tupla (host, puerto)"""
+
+    def __init__(self, direccion, tiempo_espera=None):
+        if isinstance(direccion, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.settimeout(tiempo_espera)
+        self.socket.connect(direccion)
+        self.archivo = self.socket.makefile('rb')
+        self._ids = itertools.count(1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+    def cerrar(self):
+        self.archivo.close()
+        self.socket.close()
+
+    def pedir(self, peticion):
+        """Manda una peticion (dict) y regresa la respuesta"""
+        self.socket.sendall(_linea(peticion))
+        linea = self.archivo.readline()
+        if not linea:
+            raise ConnectionError("El servidor cerro la conexion")
+        return _revisar(json.loads(linea))
+
+    def compilar(self, codigo_fuente, cuadruplos=True, **opciones):
+        """Compila con las opciones de compilador.Opciones; regresa el diccionario
+        de la respuesta (exito, errores, cuadruplos, simbolos, tiempos...)"""
+        return self.pedir(_peticion_compilar(next(self._ids), codigo_fuente, cuadruplos, opciones))
+
+    def ping(self):
+        return self.pedir({'id': next(self._ids), 'op': 'ping'})
+
+    def estado(self):
+        return self.pedir({'id': next(self._ids), 'op': 'estado'})['estado']
+
+    def apagar(self):
+        return self.pedir({'id': next(self._ids), 'op': 'apagar'})
+
+class ClienteAsincrono:
+    """Conexion asyncio: las peticiones se mandan sin esperar a las anteriores y
+    cada respuesta se entrega a quien la pidio por su id.
+        cliente = await ClienteAsincrono.conectar(direccion)
+        respuestas = await asyncio.gather(*(cliente.compilar(c) for c in codigos))"""
+
+    def __init__(self, lector, escritor):
+        self.lector = lector
+        self.escritor = escritor
+        self.pendientes = {}  #Id -> Future de la respuesta
+        self._ids = itertools.count(1)
+        self._lectura = asyncio.ensure_future(self._leer())
+
+    @classmethod
+    async def conectar(cls, direccion, limite=64 * 1024 * 1024):
+        if isinstance(direccion, str):
+            lector, escritor = await asyncio.open_unix_connection(direccion, limit=limite)
+        else:
+            lector, escritor = await asyncio.open_connection(*direccion, limit=limite)
+        return cls(lector, escritor)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *excepcion):
+        await self.cerrar()
+
+    async def _leer(self):
+        try:
+            async for linea in self.lector:
+                respuesta = json.loads(linea)
+                futuro = self.pendientes.pop(respuesta.get('id'), None)
+                if futuro is not None and not futuro.done():
+                    futuro.set_result(respuesta)
+        finally:
+            for futuro in self.pendientes.values():
+                if not futuro.done():
+                    futuro.set_exception(ConnectionError("El servidor cerro la conexion"))
+            self.pendientes.clear()
+
+    async def pedir(self, peticion):
+        identificador = peticion.setdefault('id', next(self._ids))
+        futuro = asyncio.get_running_loop().create_future()
+        self.pendientes[identificador] = futuro
+        self.escritor.write(_linea(peticion))
+        await self.escritor.drain()
+        return _revisar(await futuro)
+
+    async def compilar(self, codigo_fuente, cuadruplos=True, **opciones):
+        return await self.pedir(_peticion_compilar(next(self._ids), codigo_fuente, cuadruplos, opciones))
+
+    async def estado(self):
+        return (await self.pedir({'op': 'estado'}))['estado']
+
+    async def cerrar(self):
+        self.escritor.close()
+        try:
+            await self.escritor.wait_closed()
+        except ConnectionError:
+            pass
+        self._lectura.cancel()
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        prog='cliente.py',
+        description="Compila archivos con un servidor de compilacion ya corriendo")
+    direccion = parser.add_mutually_exclusive_group()
+    direccion.add_argument('--unix', metavar='RUTA', help="socket Unix del servidor")
+    direccion.add_argument('--puerto', type=int, default=8765, help="puerto TCP (por defecto 8765)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('archivos', nargs='*', help="programas a compilar")
+    parser.add_argument('--motor', default='descendente')
+    parser.add_argument('--optimizar', action='store_true')
+    parser.add_argument('--reutilizar-temporales', action='store_true')
+    parser.add_argument('--estado', action='store_true', help="muestra las estadisticas del servidor")
+    parser.add_argument('--apagar', action='store_true', help="apaga el servidor")
+    opciones = parser.parse_args(argumentos)
+
+    fallidos = 0
+    with Cliente(opciones.unix or (opciones.host, opciones.puerto)) as cliente:
+        for ruta in opciones.archivos:
+            with open(ruta, encoding='utf-8') as f:
+                respuesta = cliente.compilar(f.read(), cuadruplos=False, motor=opciones.motor,
+                                             optimizar=opciones.optimizar,
+                                             reutilizar_temporales=opciones.reutilizar_temporales)
+            if respuesta['exito']:
+                print(f"{ruta}: {respuesta['n_cuadruplos']} cuadruplos "
+                      f"({respuesta['tiempos']['total'] * 1000:.1f} ms, {respuesta['origen']})")
+            else:
+                fallidos += 1
+                for error in respuesta['errores']:
+                    print(f"{ruta}: {error}", file=sys.stderr)
+        if opciones.estado:
+            print(json.dumps(cliente.estado(), indent=2))
+        if opciones.apagar:
+            cliente.apagar()
+    return 1 if fallidos else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#API de biblioteca del compilador: compilar sin menu, sin pantalla y sin archivos.
+#    resultado = compilar(codigo, Opciones(motor='ll1', optimizar=True))
+#    resultado.exito, resultado.errores, resultado.cuadruplos, resultado.tabla_simbolos
+#    for pagina in resultado.paginas_cuadruplos(100): ...
+#El texto para la consola (tokens, cuadruplos, tabla de simbolos) solo se arma
+#cuando se pide y por paginas o recortado, asi un servicio que solo quiere los
+#cuadruplos no paga por formatearlos
+from proyFinal import LIMITE_PANTALLA, compilar_fuente, texto_tokens
+
+class Opciones:
+    """Opciones de compilacion. verificar_tipos hace el analisis semantico
+    (variables no declaradas, reales asignados a enteras). metricas=True mide
+    cada fase (ver instrumentacion.Metricas); memoria y perfil agregan la memoria
+    pico por fase y el perfil por produccion, que cuestan tiempo. procesos distinto
+    de 1 reparte un programa grande entre procesos (ver paralelo.py; None es uno
+    por CPU); con metricas se compila en secuencia"""
+
+    def __init__(self, motor='descendente', reutilizar_temporales=False, optimizar=False,
+                 recuperar_errores=True, verificar_tipos=True, metricas=False, memoria=False, perfil=False,
+                 procesos=1):
+        self.motor = motor
+        self.reutilizar_temporales = reutilizar_temporales
+        self.optimizar = optimizar
+        self.recuperar_errores = recuperar_errores
+        self.verificar_tipos = verificar_tipos
+        self.metricas = metricas or memoria or perfil
+        self.memoria = memoria
+        self.perfil = perfil
+        self.procesos = procesos
+
+    def __repr__(self):
+        return f"Opciones({', '.join(f'{nombre}={valor!r}' for nombre, valor in vars(self).items())})"
+
+class Resultado:
+    """Lo que produce una compilacion. Los mostrar_* escriben en pantalla (como
+    el menu) y los texto_* solo regresan la cadena"""
+
+    def __init__(self, codigo_fuente, opciones, tokens, parser, exito, errores, metricas=None):
+        self.codigo_fuente = codigo_fuente
+        self.opciones = opciones
+        self.tokens = tokens  #None si el lexer rechazo el codigo
+        self.parser = parser
+        self.exito = exito
+        self.errores = errores
+        self.metricas = metricas  #instrumentacion.Metricas o None
+
+    def __repr__(self):
+        estado = "correcto" if self.exito else f"{len(self.errores)} errores"
+        return f"<Resultado {estado}, {len(self.cuadruplos)} cuadruplos>"
+
+    @property
+    def cuadruplos(self):
+        """TablaCuadruplos (secuencia de tuplas (op, arg1, arg2, resultado))"""
+        return self.parser.cuadruplos if self.parser is not None else ()
+
+    @property
+    def tabla_simbolos(self):
+        """Nombre de variable -> Simbolo"""
+        return self.parser.tabla_simbolos if self.parser is not None else {}
+
+    def temporales(self):
+        return self.parser.temporales() if self.parser is not None else []
+
+    def codigo_tipado(self):
+        """Cuadruplos con operaciones tipadas (semantica.CodigoTipado); solo si
+        la compilacion fue correcta"""
+        return self.parser.tipar() if self.exito else None
+
+    def codigo_registros(self, registros=8):
+        """Asignacion de registros (registros.AsignacionRegistros) del codigo
+        tipado; solo si la compilacion fue correcta"""
+        return self.parser.asignar_registros(registros) if self.exito else None
+
+    def texto_tokens(self, limite=LIMITE_PANTALLA):
+        return texto_tokens(self.tokens, limite) if self.tokens is not None else "[]"
+
+    def texto_cuadruplos(self, inicio=0, fin=None):
+        """Renglones de los cuadruplos de inicio a fin (todos por defecto)"""
+        return self.parser.texto_cuadruplos(inicio, fin) if self.parser is not None else ""
+
+    def paginas_cuadruplos(self, tamano=LIMITE_PANTALLA):
+        """Texto de los cuadruplos en paginas de tamano renglones; cada pagina se
+        formatea hasta que se pide"""
+        for inicio in range(0, len(self.cuadruplos), tamano):
+            yield self.texto_cuadruplos(inicio, inicio + tamano)
+
+    def texto_tabla_simbolos(self, limite=LIMITE_PANTALLA):
+        return self.parser.texto_tabla_simbolos(limite) if self.parser is not None else ""
+
+    def texto_errores(self):
+        return "".join(f"   • {error}\n" for error in self.errores)
+
+    def mostrar_codigo_intermedio(self, limite=LIMITE_PANTALLA):
+        if self.parser is not None:
+            self.parser.mostrar_codigo_intermedio(limite)
+
+    def mostrar_tabla_simbolos(self, limite=LIMITE_PANTALLA):
+        if self.parser is not None:
+            self.parser.mostrar_tabla_simbolos(limite)
+
+    def mostrar_errores(self):
+        if self.errores:
+            print("\n\033[31mSE ENCONTRARON ERRORES:\033[0m")
+            print(self.texto_errores(), end="")
+
+    def guardar(self, nombre_archivo):
+        """Escribe el codigo (texto, o binario si termina en .3db); True si se pudo"""
+        return self.exito and self.parser.guardar_codigo_archivo(nombre_archivo)
+
+    def como_diccionario(self, cuadruplos=True):
+        """Resultado con tipos basicos (para JSON); sin cuadruplos solo van los contadores"""
+        diccionario = {
+            'exito': self.exito,
+            'errores': list(self.errores),
+            'tokens': len(self.tokens) if self.tokens is not None else 0,
+            'n_cuadruplos': len(self.cuadruplos),
+            'simbolos': {nombre: simbolo.tipo for nombre, simbolo in self.tabla_simbolos.items()},
+            'temporales': self.parser.contador_temp if self.parser is not None else 0,
+        }
+        if cuadruplos:
+            diccionario['cuadruplos'] = [list(cuadruplo) for cuadruplo in self.cuadruplos]
+        if self.metricas is not None:
+            diccionario['metricas'] = self.metricas.como_diccionario()
+        return diccionario
+
+def compilar(codigo_fuente, opciones=None, **ajustes):
+    """Compila codigo_fuente sin escribir nada en pantalla ni en disco. Las
+    opciones pueden darse como Opciones o como argumentos con los mismos nombres
+    (los argumentos cambian lo que diga opciones)"""
+    if opciones is None:
+        opciones = Opciones(**ajustes)
+    elif ajustes:
+        opciones = Opciones(**{**vars(opciones), **ajustes})
+    if opciones.procesos != 1 and not opciones.metricas:
+        from paralelo import compilar_paralelo
+        tokens, parser, exito, errores = compilar_paralelo(
+            codigo_fuente, opciones.procesos, opciones.motor, opciones.reutilizar_temporales,
+            opciones.optimizar, opciones.recuperar_errores, opciones.verificar_tipos)
+        return Resultado(codigo_fuente, opciones, tokens, parser, exito, errores)
+    metricas = None
+    if opciones.metricas:
+        from instrumentacion import Metricas
+        metricas = Metricas(memoria=opciones.memoria, perfil=opciones.perfil)
+    tokens, parser, exito, errores = compilar_fuente(
+        codigo_fuente, opciones.motor, opciones.reutilizar_temporales, opciones.optimizar,
+        metricas, opciones.recuperar_errores, opciones.verificar_tipos)
+    return Resultado(codigo_fuente, opciones, tokens, parser, exito, errores, metricas)
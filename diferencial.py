@@ -0,0 +1,395 @@
+#Pruebas diferenciales del compilador contra un interprete de referencia.
+#Uso: python diferencial.py --programas 200 --semilla 0
+#Cada programa generado (enteros y reales, if/while anidados y condiciones con
+#and/or/not) se ejecuta directamente desde sus tokens con interpretar(), sin
+#cuadruplos, y se compila con cada motor, con y sin reutilizar temporales y con
+#y sin optimizar; cada backend (maquina virtual, Python compilado y registros)
+#debe dar el mismo estado final, con los mismos tipos. Ademas el programa con
+#tokens despues del end debe ser rechazado por ambos motores con los mismos
+#errores. La referencia solo comparte el lexer con el compilador. Regresa 1 si
+#algo no coincide
+import argparse
+import contextlib
+import io
+import math
+import random
+import sys
+
+from proyFinal import MOTORES, compilar_fuente, crear_parser, lexer, lexer_compacto
+
+MAX_PASOS = 1_000_000
+REGISTROS = (3, 8)
+#Lo que se agrega despues del end del programa
+SOBRANTES = ("x := 1", ";", "end", "else y := 2; end", ") + 1", "end; y := ; z := 2 + end")
+COMPARADORES = ('=', '<=', '>=', '<>', '<', '>')
+
+class _Programa:
+    """Arbol del programa a partir de sus tokens; un programa invalido lanza SyntaxError"""
+
+    def __init__(self, codigo_fuente):
+        self.tokens = lexer(codigo_fuente) + [(None, None)]
+        self.pos = 0
+        self.tipos = {}  #Variable -> 'entero' o 'real'
+        self.esperar('being')
+        while self.tipo() in ('entero', 'real'):
+            tipo = self.siguiente()
+            self.tipos[self.esperar('IDENTIFICADOR')] = tipo
+            while self.tipo() == ',':
+                self.siguiente()
+                self.tipos[self.esperar('IDENTIFICADOR')] = tipo
+            self.esperar(';')
+        self.ordenes = self.lista_ordenes()
+        self.esperar('end')
+        self.esperar(None)
+
+    def tipo(self):
+        return self.tokens[self.pos][0]
+
+    def siguiente(self):
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def esperar(self, tipo):
+        if self.tipo() != tipo:
+            raise SyntaxError(f"Se esperaba {tipo!r} en el token {self.pos}")
+        return self.siguiente()
+
+    def lista_ordenes(self):
+        ordenes = [self.orden()]
+        while self.tipo() == ';':
+            self.siguiente()
+            ordenes.append(self.orden())
+        return ordenes
+
+    def orden(self):
+        if self.tipo() == 'if':
+            self.siguiente()
+            condicion = self.condicion_entre_parentesis()
+            entonces = self.lista_ordenes()
+            sino = []
+            if self.tipo() == 'else':
+                self.siguiente()
+                sino = self.lista_ordenes()
+            self.esperar('end')
+            return ('if', condicion, entonces, sino)
+        if self.tipo() == 'while':
+            self.siguiente()
+            condicion = self.condicion_entre_parentesis()
+            cuerpo = self.lista_ordenes()
+            self.esperar('endwhile')
+            return ('while', condicion, cuerpo)
+        destino = self.esperar('IDENTIFICADOR')
+        if destino not in self.tipos:
+            raise SyntaxError(f"Variable {destino!r} no declarada")
+        self.esperar(':=')
+        return (':=', destino, self.expresion())
+
+    def condicion_entre_parentesis(self):
+        self.esperar('(')
+        condicion = self.condicion()
+        self.esperar(')')
+        return condicion
+
+    def condicion(self):
+        condicion = self.termino_logico()
+        while self.tipo() == 'or':
+            self.siguiente()
+            condicion = ('or', condicion, self.termino_logico())
+        return condicion
+
+    def termino_logico(self):
+        condicion = self.factor_logico()
+        while self.tipo() == 'and':
+            self.siguiente()
+            condicion = ('and', condicion, self.factor_logico())
+        return condicion
+
+    def factor_logico(self):
+        if self.tipo() == 'not':
+            self.siguiente()
+            return ('not', self.factor_logico())
+        if self.tipo() == '(':
+            return self.condicion_entre_parentesis()
+        izquierda = self.operando()
+        if self.tipo() not in COMPARADORES:
+            raise SyntaxError(f"Se esperaba una comparacion en el token {self.pos}")
+        comparador = self.siguiente()
+        return (comparador, izquierda, self.operando())
+
+    def operando(self):
+        tipo = self.tipo()
+        if tipo == 'ENTERO':
+            return ('valor', int(self.siguiente()))
+        if tipo == 'REAL':
+            return ('valor', float(self.siguiente()))
+        nombre = self.esperar('IDENTIFICADOR')
+        if nombre not in self.tipos:
+            raise SyntaxError(f"Variable {nombre!r} no declarada")
+        return ('variable', nombre)
+
+    def expresion(self):
+        expresion = self.termino()
+        while self.tipo() in ('+', '-'):
+            expresion = (self.siguiente(), expresion, self.termino())
+        return expresion
+
+    def termino(self):
+        expresion = self.factor()
+        while self.tipo() in ('*', '/'):
+            expresion = (self.siguiente(), expresion, self.factor())
+        return expresion
+
+    def factor(self):
+        if self.tipo() == '(':
+            self.siguiente()
+            expresion = self.expresion()
+            self.esperar(')')
+            return expresion
+        return self.operando()
+
+class _Limite(Exception):
+    pass
+
+def _dividir(a, b):
+    if b == 0:
+        raise ZeroDivisionError("Division entre cero")
+    if isinstance(a, int) and isinstance(b, int):
+        cociente = abs(a) // abs(b)
+        return cociente if (a < 0) == (b < 0) else -cociente
+    return a / b
+
+_ARITMETICA = {'+': lambda a, b: a + b, '-': lambda a, b: a - b,
+               '*': lambda a, b: a * b, '/': _dividir}
+_COMPARACION = {'=': lambda a, b: a == b, '<=': lambda a, b: a <= b, '>=': lambda a, b: a >= b,
+                '<>': lambda a, b: a != b, '<': lambda a, b: a < b, '>': lambda a, b: a > b}
+
+def interpretar(codigo_fuente, valores=None, max_pasos=MAX_PASOS):
+    """Ejecuta el programa directamente desde su arbol con la semantica del
+    lenguaje: entre enteros la division trunca hacia cero, si un operando es
+    real la operacion es real y una variable real guarda su valor como real.
+    Regresa el estado final de las variables declaradas. Lanza SyntaxError si
+    el programa es invalido, ZeroDivisionError al dividir entre cero y
+    RuntimeError si pasa de max_pasos ordenes y vueltas"""
+    programa = _Programa(codigo_fuente)
+    tipos = programa.tipos
+    memoria = {nombre: 0.0 if tipo == 'real' else 0 for nombre, tipo in tipos.items()}
+    memoria.update(valores or {})
+    pasos = [0]
+
+    def contar():
+        pasos[0] += 1
+        if pasos[0] > max_pasos:
+            raise _Limite()
+
+    def valor(expresion):
+        if expresion[0] == 'valor':
+            return expresion[1]
+        if expresion[0] == 'variable':
+            return memoria[expresion[1]]
+        return _ARITMETICA[expresion[0]](valor(expresion[1]), valor(expresion[2]))
+
+    def cierta(condicion):
+        operador = condicion[0]
+        if operador == 'not':
+            return not cierta(condicion[1])
+        if operador == 'and':
+            return cierta(condicion[1]) and cierta(condicion[2])
+        if operador == 'or':
+            return cierta(condicion[1]) or cierta(condicion[2])
+        return _COMPARACION[operador](valor(condicion[1]), valor(condicion[2]))
+
+    def ejecutar(ordenes):
+        for orden in ordenes:
+            contar()
+            if orden[0] == ':=':
+                resultado = valor(orden[2])
+                if tipos[orden[1]] == 'real':
+                    resultado = float(resultado)
+                elif not isinstance(resultado, int):
+                    raise SyntaxError(f"Valor real en la variable entera {orden[1]!r}")
+                memoria[orden[1]] = resultado
+            elif orden[0] == 'if':
+                ejecutar(orden[2] if cierta(orden[1]) else orden[3])
+            else:
+                while cierta(orden[1]):
+                    ejecutar(orden[2])
+                    contar()
+
+    try:
+        ejecutar(programa.ordenes)
+    except _Limite:
+        raise RuntimeError(f"Se excedio el limite de {max_pasos} pasos") from None
+    return {nombre: memoria[nombre] for nombre in tipos}
+
+def generar_caso(azar, sentencias=8, anidamiento=2):
+    """Programa valido que siempre termina: cada while lleva un contador entero
+    propio (k0, k1...) que nadie mas asigna y que lo limita a pocas vueltas.
+    Regresa el codigo y valores iniciales al azar para sus variables"""
+    enteras = [f"e{i}" for i in range(azar.randint(1, 4))]
+    reales = [f"r{i}" for i in range(azar.randint(1, 4))]
+    contadores = [f"k{i}" for i in range(anidamiento)]
+
+    def operando(entero):
+        eleccion = azar.random()
+        if eleccion < 0.55:
+            return azar.choice(enteras if entero else enteras + reales)
+        if entero or eleccion < 0.8:
+            return str(azar.randint(0, 9))
+        return f"{azar.randint(0, 9)}.{azar.choice((0, 25, 5, 75))}"
+
+    def expresion(entero, largo):
+        texto = operando(entero)
+        for _ in range(largo):
+            siguiente = operando(entero)
+            if azar.random() < 0.25:
+                siguiente = f"({siguiente} {azar.choice('+-*/')} {operando(entero)})"
+            texto = f"{texto} {azar.choice('+-*/')} {siguiente}"
+        return texto
+
+    def condicion(profundidad=0):
+        eleccion = azar.random()
+        if profundidad < 2 and eleccion < 0.3:
+            conector = azar.choice(('and', 'or'))
+            return f"{condicion(profundidad + 1)} {conector} {condicion(profundidad + 1)}"
+        if profundidad < 2 and eleccion < 0.45:
+            return f"not ({condicion(profundidad + 1)} {azar.choice(('and', 'or'))} {condicion(profundidad + 1)})"
+        if profundidad < 2 and eleccion < 0.55:
+            return f"not {condicion(profundidad + 1)}"
+        return f"{operando(False)} {azar.choice(COMPARADORES)} {operando(False)}"
+
+    def asignacion():
+        #Una variable real recibe a veces una expresion entera: se convierte al guardarla
+        destino = azar.choice(enteras + reales)
+        entera = destino in enteras or azar.random() < 0.3
+        return f"{destino} := {expresion(entera, azar.randint(0, 4))}"
+
+    def bloque(cantidad, nivel):
+        ordenes = []
+        for _ in range(cantidad):
+            eleccion = azar.random()
+            if nivel < anidamiento and eleccion < 0.2:
+                contador = contadores[nivel]
+                cuerpo = bloque(azar.randint(1, 3), nivel + 1)
+                ordenes.append(f"{contador} := 0; while ({contador} < {azar.randint(1, 4)} and "
+                               f"({condicion()})) {cuerpo}; {contador} := {contador} + 1 endwhile")
+            elif nivel < anidamiento and eleccion < 0.4:
+                entonces = bloque(azar.randint(1, 3), nivel + 1)
+                if azar.random() < 0.5:
+                    ordenes.append(f"if ({condicion()}) {entonces} else {bloque(azar.randint(1, 2), nivel + 1)} end")
+                else:
+                    ordenes.append(f"if ({condicion()}) {entonces} end")
+            else:
+                ordenes.append(asignacion())
+        return "; ".join(ordenes)
+
+    declaraciones = f"entero {', '.join(enteras + contadores)}; real {', '.join(reales)};"
+    codigo_fuente = f"being {declaraciones} {bloque(sentencias, 0)} end"
+    valores = {nombre: azar.randint(-5, 5) for nombre in enteras}
+    valores.update((nombre, azar.randint(-20, 20) / 4) for nombre in reales)
+    return codigo_fuente, valores
+
+def _resultado(funcion):
+    """('ok', estado) o ('error', tipo de error) de una ejecucion"""
+    try:
+        return ('ok', funcion())
+    except ZeroDivisionError:
+        return ('error', 'division entre cero')
+    except RuntimeError:
+        return ('error', 'limite de pasos')
+
+def _iguales(obtenido, esperado):
+    if obtenido[0] != esperado[0]:
+        return False
+    if obtenido[0] == 'error':
+        return obtenido[1] == esperado[1]
+    for nombre, valor in esperado[1].items():
+        otro = obtenido[1].get(nombre)
+        if type(otro) is not type(valor):
+            return False
+        if otro != valor and not (isinstance(valor, float) and math.isnan(valor) and math.isnan(otro)):
+            return False
+    return True
+
+def backends(parser, valores):
+    """Ejecucion de cada backend sobre el codigo ya compilado: {nombre: resultado}"""
+    resultados = {
+        'maquina': _resultado(lambda: parser.ejecutar(dict(valores), MAX_PASOS * 10).estado()),
+        'python': _resultado(lambda: parser.compilar_python().ejecutar(dict(valores))),
+        'python sin estructura': _resultado(
+            lambda: parser.compilar_python(estructurado=False).ejecutar(dict(valores))),
+    }
+    for registros in REGISTROS:
+        resultados[f'registros ({registros})'] = _resultado(
+            lambda: parser.asignar_registros(registros).ejecutar(dict(valores), MAX_PASOS * 10))
+    return resultados
+
+def revisar(codigo_fuente, valores):
+    """Diferencias de un programa contra el interprete de referencia:
+    [(configuracion, esperado, obtenido)]"""
+    esperado = _resultado(lambda: interpretar(codigo_fuente, valores))
+    diferencias = []
+    for motor in MOTORES:
+        for reutilizar in (False, True):
+            for optimizar in (False, True):
+                configuracion = f"{motor}, reutilizar={reutilizar}, optimizar={optimizar}"
+                with contextlib.redirect_stdout(io.StringIO()):
+                    _, parser, exito, errores = compilar_fuente(codigo_fuente, motor, reutilizar, optimizar)
+                if not exito:
+                    diferencias.append((configuracion, esperado, ('errores', errores)))
+                    continue
+                for backend, obtenido in backends(parser, valores).items():
+                    if not _iguales(obtenido, esperado):
+                        diferencias.append((f"{configuracion}, {backend}", esperado, obtenido))
+    return diferencias
+
+def revisar_sobrantes(codigo_fuente):
+    """El programa con tokens despues del end debe tener errores, los mismos en
+    ambos motores y con o sin recuperacion: [(sobrante, {motor: errores})]"""
+    diferencias = []
+    for sobrante in SOBRANTES:
+        codigo = f"{codigo_fuente} {sobrante}"
+        errores = {}
+        for motor in MOTORES:
+            for recuperar in (True, False):
+                parser = crear_parser(lexer_compacto(codigo), motor=motor, recuperar_errores=recuperar)
+                errores[motor, recuperar] = parser.programa()[1]
+        primeros = errores[MOTORES[0], True]
+        if (not primeros or any(not lista for lista in errores.values())
+                or any(lista != errores[MOTORES[0], recuperar]
+                       for (_, recuperar), lista in errores.items())):
+            diferencias.append((sobrante, errores))
+    return diferencias
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        prog='diferencial.py',
+        description="Compara motores, optimizacion y backends contra un interprete de referencia")
+    parser.add_argument('--programas', type=int, default=200)
+    parser.add_argument('--sentencias', type=int, default=8, help="ordenes de nivel superior por programa")
+    parser.add_argument('--anidamiento', type=int, default=2, help="profundidad maxima de if/while")
+    parser.add_argument('--semilla', type=int, default=0)
+    opciones = parser.parse_args(argumentos)
+
+    azar = random.Random(opciones.semilla)
+    fallidos = 0
+    for k in range(opciones.programas):
+        codigo_fuente, valores = generar_caso(azar, azar.randint(1, opciones.sentencias), opciones.anidamiento)
+        diferencias = revisar(codigo_fuente, valores)
+        sobrantes = revisar_sobrantes(codigo_fuente)
+        if not diferencias and not sobrantes:
+            continue
+        fallidos += 1
+        if fallidos <= 3:
+            print(codigo_fuente)
+            print(f"  valores iniciales: {valores}")
+            for configuracion, esperado, obtenido in diferencias[:4]:
+                print(f"  {configuracion}:\n    esperado {esperado}\n    obtenido {obtenido}")
+            for sobrante, errores in sobrantes[:2]:
+                print(f"  con '{sobrante}' despues del end:")
+                for (motor, recuperar), lista in errores.items():
+                    print(f"    {motor} (recuperar={recuperar}): {lista}")
+    print(f"Programas con diferencias: {fallidos} de {opciones.programas}")
+    return 1 if fallidos else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+#Formato binario del codigo de 3 direcciones (.3db), pensado para volver a
+#cargarse sin analizar texto. Todos los enteros son little-endian:
+#  encabezado   MAGIA, version, cuadruplos, cadenas, simbolos, temporales y los
+#               desplazamientos de cada seccion (ver ENCABEZADO)
+#  cadenas      cadenas + 1 desplazamientos u32 y luego los bytes UTF-8 de todas;
+#               la cadena 0 es el operando vacio (None)
+#  cuadruplos   registros fijos de 13 bytes: codigo de operacion u8 y los indices
+#               u32 de arg1, arg2 y resultado en la tabla de cadenas
+#  simbolos     registros de 5 bytes: indice u32 del nombre y tipo u8
+#CodigoBinario mapea el archivo con mmap y decodifica cada cuadruplo o cadena
+#solo cuando se pide, asi abrir un archivo enorme no cuesta nada
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+from proyFinal import OPERACIONES, Simbolo, TablaCuadruplos
+
+MAGIA = b'C3DB'
+VERSION = 1
+ENCABEZADO = struct.Struct('<4sHHIIIIQQQ')
+REGISTRO = struct.Struct('<BIII')
+SIMBOLO = struct.Struct('<IB')
+DESPLAZAMIENTO = struct.Struct('<II')
+TIPOS = ('entero', 'real')
+
+def _columna_u32(columna):
+    """Bytes little-endian de una columna de indices"""
+    columna = array('I', columna)
+    if sys.byteorder == 'big':
+        columna.byteswap()
+    return columna.tobytes()
+
+def _registros(tabla):
+    """Intercala las columnas de la tabla en registros de 13 bytes: cada byte de
+    cada columna va a su lugar con una asignacion por rebanada (en C)"""
+    n = len(tabla)
+    registros = bytearray(n * REGISTRO.size)
+    registros[0::REGISTRO.size] = tabla.ops.tobytes()
+    for desplazamiento, columna in ((1, tabla.args1), (5, tabla.args2), (9, tabla.resultados)):
+        datos = _columna_u32(columna)
+        for byte in range(4):
+            registros[desplazamiento + byte::REGISTRO.size] = datos[byte::4]
+    return registros
+
+def guardar_binario(ruta, cuadruplos, tabla_simbolos=None, temporales=0):
+    """Escribe cuadruplos (TablaCuadruplos o secuencia de tuplas) y la tabla de
+    simbolos en ruta"""
+    tabla = cuadruplos if isinstance(cuadruplos, TablaCuadruplos) else TablaCuadruplos(cuadruplos)
+    tabla_simbolos = tabla_simbolos or {}
+    #Los nombres de variables que no aparecen en el codigo tambien van a la tabla de cadenas
+    operandos = list(tabla.operandos)
+    indices = dict(tabla.indices_operando)
+    for nombre in tabla_simbolos:
+        if nombre not in indices:
+            indices[nombre] = len(operandos)
+            operandos.append(nombre)
+
+    codificadas = [b''] + [operando.encode('utf-8') for operando in operandos[1:]]
+    limites = array('I', [0])
+    total = 0
+    for cadena in codificadas:
+        total += len(cadena)
+        limites.append(total)
+    if sys.byteorder == 'big':
+        limites.byteswap()
+    seccion_cadenas = limites.tobytes() + b''.join(codificadas)
+
+    seccion_simbolos = b''.join(SIMBOLO.pack(indices[nombre], TIPOS.index(simbolo.tipo))
+                                for nombre, simbolo in tabla_simbolos.items())
+    inicio_cadenas = ENCABEZADO.size
+    inicio_cuadruplos = inicio_cadenas + len(seccion_cadenas)
+    inicio_simbolos = inicio_cuadruplos + len(tabla) * REGISTRO.size
+    encabezado = ENCABEZADO.pack(MAGIA, VERSION, 0, len(tabla), len(operandos), len(tabla_simbolos),
+                                 temporales, inicio_cadenas, inicio_cuadruplos, inicio_simbolos)
+    with open(ruta, 'wb') as f:
+        f.write(b''.join((encabezado, seccion_cadenas, _registros(tabla), seccion_simbolos)))
+
+class CodigoBinario(Sequence):
+    """Vista perezosa de un archivo .3db: se lee como una secuencia de tuplas
+    (op, arg1, arg2, resultado), igual que TablaCuadruplos. Cerrar (o usar con
+    with) libera el mapeo"""
+
+    def __init__(self, ruta):
+        with open(ruta, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._buffer) < ENCABEZADO.size:
+            self.close()
+            raise ValueError(f"{ruta} no es un archivo de codigo binario")
+        (magia, version, _, self.n_cuadruplos, self.n_cadenas, self.n_simbolos, self.temporales,
+         self._inicio_cadenas, self._inicio_cuadruplos, self._inicio_simbolos) = \
+            ENCABEZADO.unpack_from(self._buffer)
+        if magia != MAGIA or version != VERSION:
+            self.close()
+            raise ValueError(f"{ruta} no es un archivo de codigo binario (version {VERSION})")
+        self._bytes_cadenas = self._inicio_cadenas + (self.n_cadenas + 1) * 4
+        self._cadenas = {0: None}  #Indice -> cadena ya decodificada
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.close()
+
+    def cadena(self, indice):
+        """Operando con ese indice en la tabla de cadenas (None para el 0)"""
+        try:
+            return self._cadenas[indice]
+        except KeyError:
+            pass
+        inicio, fin = DESPLAZAMIENTO.unpack_from(self._buffer, self._inicio_cadenas + indice * 4)
+        cadena = self._cadenas[indice] = str(self._buffer[self._bytes_cadenas + inicio:
+                                                          self._bytes_cadenas + fin], 'utf-8')
+        return cadena
+
+    def cadenas(self):
+        """Toda la tabla de cadenas de una vez. Si es ASCII (lo normal) los
+        desplazamientos en bytes sirven para rebanar el texto ya decodificado"""
+        limites = array('I', self._buffer[self._inicio_cadenas:self._bytes_cadenas])
+        if sys.byteorder == 'big':
+            limites.byteswap()
+        datos = self._buffer[self._bytes_cadenas:self._bytes_cadenas + limites[-1]]
+        if datos.isascii():
+            texto = datos.decode('ascii')
+        else:
+            texto = datos
+        cadenas = list(map(texto.__getitem__, map(slice, limites[:-1], limites[1:])))
+        if texto is datos:
+            cadenas = [str(cadena, 'utf-8') for cadena in cadenas]
+        cadenas[0] = None
+        self._cadenas = dict(enumerate(cadenas))
+        return cadenas
+
+    def __len__(self):
+        return self.n_cuadruplos
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.n_cuadruplos))]
+        if i < 0:
+            i += self.n_cuadruplos
+        if not 0 <= i < self.n_cuadruplos:
+            raise IndexError("cuadruplo fuera de rango")
+        op, arg1, arg2, resultado = REGISTRO.unpack_from(self._buffer, self._inicio_cuadruplos
+                                                         + i * REGISTRO.size)
+        cadena = self.cadena
+        return (OPERACIONES[op], cadena(arg1), cadena(arg2), cadena(resultado))
+
+    def __iter__(self):
+        #Por tramos: nunca se copia a memoria mas que un pedazo del archivo
+        cadena = self.cadena
+        fin = self._inicio_cuadruplos + self.n_cuadruplos * REGISTRO.size
+        tramo = REGISTRO.size * 65536
+        for inicio in range(self._inicio_cuadruplos, fin, tramo):
+            registros = self._buffer[inicio:min(inicio + tramo, fin)]
+            for op, arg1, arg2, resultado in REGISTRO.iter_unpack(registros):
+                yield (OPERACIONES[op], cadena(arg1), cadena(arg2), cadena(resultado))
+
+    def tabla_simbolos(self):
+        """Nombre de variable -> Simbolo"""
+        tabla = {}
+        for i in range(self.n_simbolos):
+            nombre, tipo = SIMBOLO.unpack_from(self._buffer, self._inicio_simbolos + i * SIMBOLO.size)
+            nombre = self.cadena(nombre)
+            tabla[nombre] = Simbolo(nombre, TIPOS[tipo])
+        return tabla
+
+    def tabla_cuadruplos(self):
+        """Carga todo a una TablaCuadruplos separando las columnas por rebanadas,
+        sin decodificar registro por registro"""
+        n = self.n_cuadruplos
+        registros = self._buffer[self._inicio_cuadruplos:self._inicio_cuadruplos + n * REGISTRO.size]
+        tabla = TablaCuadruplos()
+        tabla.ops = array('B', registros[0::REGISTRO.size])
+        for desplazamiento, nombre in ((1, 'args1'), (5, 'args2'), (9, 'resultados')):
+            datos = bytearray(n * 4)
+            for byte in range(4):
+                datos[byte::4] = registros[desplazamiento + byte::REGISTRO.size]
+            columna = array('I', bytes(datos))
+            if sys.byteorder == 'big':
+                columna.byteswap()
+            setattr(tabla, nombre, columna)
+        #La tabla de cadenas puede traer al final nombres que solo estan en los simbolos
+        tabla.operandos = self.cadenas()
+        tabla.indices_operando = {operando: i for i, operando in enumerate(tabla.operandos)}
+        return tabla
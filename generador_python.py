@@ -0,0 +1,347 @@
+#Traduce los cuadruplos (el codigo tipado, ver semantica.py) a una funcion de
+#Python y la compila con compile()/exec(). Las variables y temporales son locales
+#de la funcion (con prefijo v_ para no chocar con palabras de Python). Si el grafo
+#de flujo se deja, las etiquetas y saltos se vuelven while/if/break/continue; si
+#no, se usa una maquina de estados
+import time
+from functools import lru_cache
+
+from grafo_flujo import Bloque, GrafoFlujo
+from optimizador import dividir, es_constante, es_temporal, valor_constante
+
+#Comparacion verdadera de cada if<op> (el if<op> salta cuando es falsa), tambien
+#con el sufijo de tipo del codigo tipado (if<e, if<r...; ver semantica.py)
+_COMPARACION_PYTHON = {'if=': '==', 'if<=': '<=', 'if>=': '>=', 'if<>': '!=', 'if<': '<', 'if>': '>'}
+_COMPARACION_PYTHON.update({op + sufijo: comparacion for op, comparacion in _COMPARACION_PYTHON.items()
+                            for sufijo in 'er'})
+_MAX_CICLOS_ANIDADOS = 18  #Python no compila mas de 20 bloques anidados
+_MAX_SANGRIA = 90  #Ni mas de 100 niveles de sangria
+_RETORNO = "return locals()"
+
+class _NoEstructurable(Exception):
+    """El grafo no se puede escribir con while/if sin duplicar codigo"""
+
+@lru_cache(maxsize=64)
+def _compilar(fuente):
+    """Compila la fuente una sola vez; fuentes iguales comparten la funcion"""
+    espacio = {'_dividir': dividir}
+    exec(compile(fuente, '<cuadruplos>', 'exec'), espacio)
+    return espacio['programa']
+
+def _operando(operando):
+    if es_constante(operando):
+        return repr(valor_constante(operando))
+    return 'v_' + operando
+
+def _instruccion(cuadruplo):
+    op, arg1, arg2, resultado = cuadruplo
+    if op[:2] == ':=':
+        return f"v_{resultado} = {_operando(arg1)}"
+    if op == 'real':
+        return f"v_{resultado} = float({_operando(arg1)})"
+    if op == '/' or op == '/e':
+        return f"v_{resultado} = _dividir({_operando(arg1)}, {_operando(arg2)})"
+    #Las operaciones reales y las demas enteras son las de Python
+    return f"v_{resultado} = {_operando(arg1)} {op[0]} {_operando(arg2)}"
+
+def _condicion(salto):
+    op, arg1, arg2 = salto
+    return f"{_operando(arg1)} {_COMPARACION_PYTHON[op]} {_operando(arg2)}"
+
+class ProgramaPython:
+    """Programa de cuadruplos compilado a una funcion de Python"""
+
+    def __init__(self, cuadruplos, tabla_simbolos=None, estructurado=True):
+        self.tabla_simbolos = tabla_simbolos or {}
+        cuadruplos = list(cuadruplos)
+        self.grafo = GrafoFlujo(cuadruplos).simplificar()
+        self._fin = Bloque(-1)  #Salir del programa
+        encabezado = self._encabezado(cuadruplos)
+        self.modo = None
+        self.funcion = None
+        if estructurado:
+            try:
+                self.fuente = encabezado + self._estructurado()
+                self.funcion = _compilar(self.fuente)
+                self.modo = 'estructurado'
+            except (_NoEstructurable, SyntaxError, RecursionError):
+                pass
+        if self.funcion is None:
+            self.fuente = encabezado + self._maquina_estados()
+            self.funcion = _compilar(self.fuente)
+            self.modo = 'maquina de estados'
+        self.tiempo = 0.0
+
+    def _encabezado(self, cuadruplos):
+        #Las declaradas son parametros; lo que no se declaro (salvo temporales,
+        #que siempre se asignan antes de usarse) empieza en 0
+        parametros = [f"v_{nombre}={0.0 if simbolo.tipo == 'real' else 0}"
+                      for nombre, simbolo in self.tabla_simbolos.items()]
+        otros = {}
+        for op, arg1, arg2, resultado in cuadruplos:
+            if op == 'label' or op == 'goto':
+                continue
+            for nombre in (arg1, arg2) if op in _COMPARACION_PYTHON else (arg1, arg2, resultado):
+                if (nombre is not None and not es_constante(nombre) and nombre not in self.tabla_simbolos
+                        and not es_temporal(nombre)):
+                    otros[nombre] = None
+        lineas = [f"def programa({', '.join(parametros)}):"]
+        lineas.extend(f"    v_{nombre} = 0" for nombre in otros)
+        return "\n".join(lineas) + "\n"
+
+    #Traduccion estructurada
+    def _estructurado(self):
+        self._lineas = []
+        self._emitidos = set()
+        self._ciclos = dict(self.grafo.ciclos_naturales())
+        self._postdominadores = {}
+        self._salidas = {}
+        if self.grafo.bloques:
+            self._region(self.grafo.bloques[0], self._fin, None, 1, 0)
+        self._lineas.append("    " + _RETORNO)
+        return "\n".join(self._lineas) + "\n"
+
+    def _emitir(self, sangria, texto):
+        self._lineas.append("    " * sangria + texto)
+
+    def _siguiente(self, bloque):
+        return bloque.siguiente if bloque.siguiente is not None else self._fin
+
+    def _salida(self, cabecera):
+        """Unico bloque fuera del ciclo al que se sale (None si no se sale nunca)"""
+        if cabecera not in self._salidas:
+            cuerpo = self._ciclos[cabecera]
+            salidas = set()
+            for bloque in cuerpo:
+                sucesores = [bloque.destino] if bloque.salto is not None else []
+                if bloque.salto is None or bloque.salto[0] != 'goto':
+                    sucesores.append(self._siguiente(bloque))
+                salidas.update(sucesor for sucesor in sucesores if sucesor not in cuerpo)
+            if len(salidas) > 1:
+                raise _NoEstructurable()
+            self._salidas[cabecera] = salidas.pop() if salidas else None
+        return self._salidas[cabecera]
+
+    def _union(self, bloque, ciclo):
+        """Donde se juntan las dos ramas del if<op> de bloque: su posdominador
+        inmediato dentro del ciclo, contando los saltos a la cabecera o fuera
+        del ciclo como salidas (None si las ramas no se juntan)"""
+        clave = ciclo[0] if ciclo else None
+        if clave not in self._postdominadores:
+            cuerpo = self._ciclos[clave] if ciclo else set(self.grafo.postorden())
+            self._postdominadores[clave] = self._calcular_postdominadores(cuerpo, clave)
+        union = self._postdominadores[clave].get(bloque)
+        return None if union is self._fin else union
+
+    def _calcular_postdominadores(self, cuerpo, cabecera):
+        fin = self._fin
+
+        def sucesores(bloque):
+            resultado = [bloque.destino] if bloque.salto is not None else []
+            if bloque.salto is None or bloque.salto[0] != 'goto':
+                resultado.append(self._siguiente(bloque))
+            return [sucesor if sucesor in cuerpo and sucesor is not cabecera else fin
+                    for sucesor in resultado]
+
+        #Dominadores del grafo invertido, desde la salida (Cooper, Harvey y Kennedy)
+        predecesores = {fin: []}
+        for bloque in cuerpo:
+            for sucesor in sucesores(bloque):
+                predecesores.setdefault(sucesor, []).append(bloque)
+        orden = []
+        vistos = {fin}
+        pila = [(fin, iter(predecesores[fin]))]
+        while pila:
+            nodo, pendientes = pila[-1]
+            for anterior in pendientes:
+                if anterior not in vistos:
+                    vistos.add(anterior)
+                    pila.append((anterior, iter(predecesores.get(anterior, ()))))
+                    break
+            else:
+                pila.pop()
+                orden.append(nodo)
+        inverso = orden[::-1]
+        indice = {nodo: i for i, nodo in enumerate(inverso)}
+        ipdom = {fin: fin}
+
+        def interseccion(a, b):
+            while a is not b:
+                while indice[a] > indice[b]:
+                    a = ipdom[a]
+                while indice[b] > indice[a]:
+                    b = ipdom[b]
+            return a
+
+        cambios = True
+        while cambios:
+            cambios = False
+            for nodo in inverso[1:]:
+                nuevo = None
+                for sucesor in sucesores(nodo):
+                    if sucesor in ipdom:
+                        nuevo = sucesor if nuevo is None else interseccion(sucesor, nuevo)
+                if ipdom.get(nodo) is not nuevo:
+                    ipdom[nodo] = nuevo
+                    cambios = True
+        return ipdom
+
+    def _salto(self, destino, fin, ciclo):
+        """Sentencia que lleva a destino si es un salto directo fuera de la region"""
+        if destino is fin:
+            return None
+        if destino is self._fin:
+            return _RETORNO
+        if ciclo is not None:
+            if destino is ciclo[0]:
+                return "continue"
+            if destino is ciclo[1]:
+                return "break"
+        return None
+
+    def _region(self, bloque, fin, ciclo, sangria, anidados, cabecera=False):
+        """Escribe el codigo desde bloque hasta llegar a fin. ciclo es
+        (cabecera, salida) del while mas interno que se esta escribiendo"""
+        if sangria > _MAX_SANGRIA:
+            raise _NoEstructurable()
+        inicio = len(self._lineas)
+        while True:
+            if not cabecera:
+                if bloque is fin:
+                    break
+                salto = self._salto(bloque, fin, ciclo)
+                if salto is not None:
+                    self._emitir(sangria, salto)
+                    break
+                if bloque in self._ciclos:
+                    if anidados >= _MAX_CICLOS_ANIDADOS:
+                        raise _NoEstructurable()
+                    salida = self._salida(bloque)
+                    self._ciclo(bloque, salida, sangria, anidados)
+                    if salida is None:
+                        break  #Ciclo sin salida: lo que sigue no se alcanza
+                    bloque = salida
+                    continue
+            cabecera = False
+            if bloque in self._emitidos:
+                raise _NoEstructurable()
+            self._emitidos.add(bloque)
+            for cuadruplo in bloque.instrucciones:
+                self._emitir(sangria, _instruccion(cuadruplo))
+            if bloque.salto is None:
+                bloque = self._siguiente(bloque)
+                continue
+            if bloque.salto[0] == 'goto':
+                bloque = bloque.destino
+                continue
+
+            verdadero, falso = self._siguiente(bloque), bloque.destino
+            condicion = _condicion(bloque.salto)
+            salto = self._salto(falso, fin, ciclo)
+            if salto is not None:
+                self._emitir(sangria, f"if not ({condicion}):")
+                self._emitir(sangria + 1, salto)
+                bloque = verdadero
+                continue
+            salto = self._salto(verdadero, fin, ciclo)
+            if salto is not None:
+                self._emitir(sangria, f"if {condicion}:")
+                self._emitir(sangria + 1, salto)
+                bloque = falso
+                continue
+            union = self._union(bloque, ciclo)
+            destino = union if union is not None else fin
+            if verdadero is destino:
+                self._emitir(sangria, f"if not ({condicion}):")
+                self._region(falso, destino, ciclo, sangria + 1, anidados)
+            else:
+                self._emitir(sangria, f"if {condicion}:")
+                self._region(verdadero, destino, ciclo, sangria + 1, anidados)
+                if falso is not destino:
+                    self._emitir(sangria, "else:")
+                    self._region(falso, destino, ciclo, sangria + 1, anidados)
+            if union is None:
+                break
+            bloque = union
+        if len(self._lineas) == inicio:
+            self._emitir(sangria, "pass")
+
+    def _ciclo(self, cabecera, salida, sangria, anidados):
+        #Si la cabecera solo evalua la condicion y sale cuando es falsa, es un
+        #while con condicion; si no, while True con break
+        if (not cabecera.instrucciones and cabecera.salto is not None
+                and cabecera.salto[0] != 'goto' and cabecera.destino is salida
+                and cabecera.siguiente is not None and cabecera not in self._emitidos):
+            self._emitidos.add(cabecera)
+            self._emitir(sangria, f"while {_condicion(cabecera.salto)}:")
+            self._region(cabecera.siguiente, None, (cabecera, salida), sangria + 1, anidados + 1)
+        else:
+            self._emitir(sangria, "while True:")
+            self._region(cabecera, None, (cabecera, salida), sangria + 1, anidados + 1, True)
+        #Al final del cuerpo el continue sobra
+        ultima = "    " * (sangria + 1) + "continue"
+        if self._lineas[-1] == ultima:
+            if self._lineas[-2].endswith(":"):  #El cuerpo era solo el continue
+                self._lineas[-1] = "    " * (sangria + 1) + "pass"
+            else:
+                self._lineas.pop()
+
+    #Traduccion con maquina de estados: un estado por bloque y un arbol de if
+    #sobre el numero de estado para llegar al bloque en log2(bloques) comparaciones
+    def _maquina_estados(self):
+        bloques = self.grafo.bloques
+        if not bloques:
+            return "    " + _RETORNO + "\n"
+        numero = {bloque: i for i, bloque in enumerate(bloques)}
+        numero[self._fin] = None
+        lineas = ["    _estado = 0", "    while True:"]
+
+        def transicion(destino, sangria):
+            if numero[destino] is None:
+                lineas.append("    " * sangria + _RETORNO)
+            else:
+                lineas.append("    " * sangria + f"_estado = {numero[destino]}")
+
+        def arbol(inicio, fin, sangria):
+            if fin - inicio == 1:
+                bloque = bloques[inicio]
+                for cuadruplo in bloque.instrucciones:
+                    lineas.append("    " * sangria + _instruccion(cuadruplo))
+                if bloque.salto is None:
+                    transicion(self._siguiente(bloque), sangria)
+                elif bloque.salto[0] == 'goto':
+                    transicion(bloque.destino, sangria)
+                else:
+                    lineas.append("    " * sangria + f"if {_condicion(bloque.salto)}:")
+                    transicion(self._siguiente(bloque), sangria + 1)
+                    lineas.append("    " * sangria + "else:")
+                    transicion(bloque.destino, sangria + 1)
+                return
+            medio = (inicio + fin) // 2
+            lineas.append("    " * sangria + f"if _estado < {medio}:")
+            arbol(inicio, medio, sangria + 1)
+            lineas.append("    " * sangria + "else:")
+            arbol(medio, fin, sangria + 1)
+
+        arbol(0, len(bloques), 2)
+        return "\n".join(lineas) + "\n"
+
+    def ejecutar(self, valores=None):
+        """Ejecuta la funcion compilada y devuelve el estado final de las variables"""
+        argumentos = {'v_' + nombre: valor for nombre, valor in (valores or {}).items()
+                      if nombre in self.tabla_simbolos}
+        inicio = time.perf_counter()
+        locales = self.funcion(**argumentos)
+        self.tiempo = time.perf_counter() - inicio
+        estado = {nombre: locales['v_' + nombre] for nombre in self.tabla_simbolos}
+        for local, valor in locales.items():
+            nombre = local[2:]
+            if local.startswith('v_') and nombre not in estado and nombre[0] != '_' and not es_temporal(nombre):
+                estado[nombre] = valor
+        return estado
+
+    def mostrar_reporte(self):
+        print("\n" + "\033[95mCODIGO PYTHON GENERADO\033[0m" + f" ({self.modo})")
+        print("=" * 60)
+        print(self.fuente)
+        print(f"Tiempo de ejecucion: {self.tiempo * 1000:.3f} ms")
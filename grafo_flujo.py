@@ -0,0 +1,316 @@
+#Grafo de flujo de control sobre los cuadruplos generados por Parser3Direcciones.
+#Cada bloque guarda sus instrucciones sin la etiqueta inicial ni el salto final;
+#las aristas son referencias a bloques, asi que las etiquetas se renumeran al final
+from optimizador import SALTOS, bloques_basicos
+
+def formatear(cuadruplo):
+    """Representacion legible de un cuadruplo"""
+    op, arg1, arg2, resultado = cuadruplo
+    if op == ':=':
+        return f"{resultado} := {arg1}"
+    if op == 'goto' or op == 'label':
+        return f"{op} {resultado}"
+    if op.startswith('if'):
+        return f"ifFalse {arg1} {op[2:]} {arg2} goto {resultado}"
+    return f"{resultado} := {arg1} {op} {arg2}"
+
+class Bloque:
+    """Bloque basico: instrucciones en linea recta y, opcionalmente, un salto al final"""
+    __slots__ = ('numero', 'etiqueta', 'instrucciones', 'salto', 'destino', 'siguiente')
+
+    def __init__(self, numero, etiqueta=None, instrucciones=None, salto=None):
+        self.numero = numero
+        self.etiqueta = etiqueta
+        self.instrucciones = instrucciones if instrucciones is not None else []
+        self.salto = salto  #(op, arg1, arg2) de goto/if<op>, o None
+        self.destino = None  #Bloque al que salta
+        self.siguiente = None  #Bloque que sigue en el orden del codigo
+
+    def sucesores(self):
+        """Un if<op> sigue de largo si la comparacion es verdadera y salta si es falsa"""
+        if self.salto is None:
+            return [self.siguiente] if self.siguiente is not None else []
+        if self.salto[0] == 'goto':
+            return [self.destino]
+        if self.siguiente is None:
+            return [self.destino]
+        return [self.siguiente, self.destino]
+
+    def __repr__(self):
+        return f"Bloque(B{self.numero}, {len(self.instrucciones)} instrucciones)"
+
+class GrafoFlujo:
+    def __init__(self, cuadruplos):
+        cuadruplos = list(cuadruplos)
+        self.cuadruplos_originales = len(cuadruplos)
+        self.bloques = []
+        por_etiqueta = {}
+        for inicio, fin in bloques_basicos(cuadruplos):
+            segmento = cuadruplos[inicio:fin]
+            bloque = Bloque(len(self.bloques))
+            if segmento[0][0] == 'label':
+                bloque.etiqueta = segmento[0][3]
+                por_etiqueta[bloque.etiqueta] = bloque
+                segmento = segmento[1:]
+            if segmento and segmento[-1][0] in SALTOS:
+                bloque.salto = segmento[-1]
+                segmento = segmento[:-1]
+            bloque.instrucciones = segmento
+            self.bloques.append(bloque)
+        for bloque in self.bloques:
+            if bloque.salto is not None:
+                bloque.destino = por_etiqueta[bloque.salto[3]]
+                bloque.salto = bloque.salto[:3]
+        self._enlazar()
+        self.bloques_originales = len(self.bloques)
+        self.estadisticas = dict.fromkeys(('saltos_encadenados', 'saltos_eliminados',
+                                           'bloques_inalcanzables', 'bloques_fusionados'), 0)
+
+    def _enlazar(self):
+        """Recalcula el bloque siguiente de cada uno segun el orden de la lista"""
+        for bloque, siguiente in zip(self.bloques, self.bloques[1:] + [None]):
+            bloque.siguiente = siguiente
+
+    def predecesores(self):
+        """Bloque -> lista de bloques que llegan a el"""
+        predecesores = {bloque: [] for bloque in self.bloques}
+        for bloque in self.bloques:
+            for sucesor in bloque.sucesores():
+                predecesores[sucesor].append(bloque)
+        return predecesores
+
+    def postorden(self):
+        """Bloques alcanzables desde la entrada en postorden (recorrido iterativo)"""
+        if not self.bloques:
+            return []
+        orden = []
+        vistos = {self.bloques[0]}
+        pila = [(self.bloques[0], iter(self.bloques[0].sucesores()))]
+        while pila:
+            bloque, sucesores = pila[-1]
+            for sucesor in sucesores:
+                if sucesor not in vistos:
+                    vistos.add(sucesor)
+                    pila.append((sucesor, iter(sucesor.sucesores())))
+                    break
+            else:
+                pila.pop()
+                orden.append(bloque)
+        return orden
+
+    def dominadores_inmediatos(self):
+        """Bloque -> su dominador inmediato (la entrada se domina a si misma),
+        con el algoritmo iterativo de Cooper, Harvey y Kennedy"""
+        inverso = self.postorden()[::-1]
+        if not inverso:
+            return {}
+        indice = {bloque: i for i, bloque in enumerate(inverso)}
+        predecesores = self.predecesores()
+        entrada = inverso[0]
+        idom = {entrada: entrada}
+
+        def interseccion(a, b):
+            while a is not b:
+                while indice[a] > indice[b]:
+                    a = idom[a]
+                while indice[b] > indice[a]:
+                    b = idom[b]
+            return a
+
+        cambios = True
+        while cambios:
+            cambios = False
+            for bloque in inverso[1:]:
+                nuevo = None
+                for predecesor in predecesores[bloque]:
+                    if predecesor in idom:
+                        nuevo = predecesor if nuevo is None else interseccion(predecesor, nuevo)
+                if idom.get(bloque) is not nuevo:
+                    idom[bloque] = nuevo
+                    cambios = True
+        return idom
+
+    def ciclos_naturales(self):
+        """Lista de (cabecera, cuerpo) de los ciclos naturales, de los internos a
+        los externos. Una arista B -> H es de regreso si H domina a B; el cuerpo
+        son H y los bloques que llegan a B sin pasar por H"""
+        idom = self.dominadores_inmediatos()
+        predecesores = self.predecesores()
+
+        def domina(a, b):
+            while b is not a:
+                if idom[b] is b:
+                    return False
+                b = idom[b]
+            return True
+
+        cuerpos = {}
+        for bloque in idom:
+            for sucesor in bloque.sucesores():
+                if domina(sucesor, bloque):
+                    cuerpo = cuerpos.setdefault(sucesor, {sucesor})
+                    pendientes = [bloque] if bloque not in cuerpo else []
+                    cuerpo.update(pendientes)
+                    while pendientes:
+                        for predecesor in predecesores[pendientes.pop()]:
+                            if predecesor not in cuerpo and predecesor in idom:
+                                cuerpo.add(predecesor)
+                                pendientes.append(predecesor)
+        return sorted(cuerpos.items(), key=lambda ciclo: len(ciclo[1]))
+
+    def _resolver(self, bloque):
+        """Primer bloque con trabajo al que se llega desde bloque pasando por
+        bloques vacios (solo etiqueta o solo goto)"""
+        vistos = set()
+        while not bloque.instrucciones and bloque not in vistos:
+            vistos.add(bloque)
+            if bloque.salto is None:
+                if bloque.siguiente is None:
+                    break  #Fin del programa: se conserva como destino
+                bloque = bloque.siguiente
+            elif bloque.salto[0] == 'goto':
+                bloque = bloque.destino
+            else:
+                break
+        return bloque
+
+    def simplificar(self):
+        """Aplica las transformaciones hasta que ninguna cambie el grafo"""
+        cambios = True
+        while cambios:
+            cambios = (self._encadenar_saltos() + self._eliminar_saltos_redundantes()
+                       + self._eliminar_inalcanzables() + self._fusionar_bloques())
+        self.renumerar_etiquetas()
+        return self
+
+    def _encadenar_saltos(self):
+        #Un salto a una cadena de gotos/etiquetas va directo al final de la cadena
+        cambios = 0
+        for bloque in self.bloques:
+            if bloque.salto is not None:
+                destino = self._resolver(bloque.destino)
+                if destino is not bloque.destino:
+                    bloque.destino = destino
+                    cambios += 1
+        self.estadisticas['saltos_encadenados'] += cambios
+        return cambios
+
+    def _eliminar_saltos_redundantes(self):
+        #Un goto (o un if<op>, que no tiene efectos) cuyo destino es a donde de todos
+        #modos se llega siguiendo de largo sobra
+        cambios = 0
+        for bloque in self.bloques:
+            if (bloque.salto is not None and bloque.siguiente is not None
+                    and self._resolver(bloque.destino) is self._resolver(bloque.siguiente)):
+                bloque.salto = bloque.destino = None
+                cambios += 1
+        self.estadisticas['saltos_eliminados'] += cambios
+        return cambios
+
+    def _eliminar_inalcanzables(self):
+        if not self.bloques:
+            return 0
+        alcanzables = {self.bloques[0]}
+        pendientes = [self.bloques[0]]
+        while pendientes:
+            for sucesor in pendientes.pop().sucesores():
+                if sucesor not in alcanzables:
+                    alcanzables.add(sucesor)
+                    pendientes.append(sucesor)
+        cambios = len(self.bloques) - len(alcanzables)
+        if cambios:
+            #Un bloque alcanzable nunca cae de largo en uno inalcanzable,
+            #asi que quitarlos no cambia a donde sigue ningun otro
+            self.bloques = [bloque for bloque in self.bloques if bloque in alcanzables]
+            self._enlazar()
+        self.estadisticas['bloques_inalcanzables'] += cambios
+        return cambios
+
+    def _fusionar_bloques(self):
+        #B se une al bloque anterior si solo se llega a B siguiendo de largo desde el
+        predecesores = self.predecesores()
+        nuevos = []
+        cambios = 0
+        for bloque in self.bloques:
+            anterior = nuevos[-1] if nuevos else None
+            if (anterior is not None and anterior.salto is None
+                    and predecesores[bloque] == [anterior]):
+                anterior.instrucciones.extend(bloque.instrucciones)
+                anterior.salto, anterior.destino = bloque.salto, bloque.destino
+                cambios += 1
+            else:
+                nuevos.append(bloque)
+        if cambios:
+            self.bloques = nuevos
+            self._enlazar()
+        self.estadisticas['bloques_fusionados'] += cambios
+        return cambios
+
+    def renumerar_etiquetas(self):
+        """Solo los bloques destino de algun salto conservan etiqueta: L0, L1... en orden"""
+        destinos = {bloque.destino for bloque in self.bloques if bloque.salto is not None}
+        numero = 0
+        for i, bloque in enumerate(self.bloques):
+            bloque.numero = i
+            if bloque in destinos:
+                bloque.etiqueta = f"L{numero}"
+                numero += 1
+            else:
+                bloque.etiqueta = None
+        return numero
+
+    def cuadruplos(self):
+        """Vuelve a aplanar el grafo en una lista de cuadruplos"""
+        resultado = []
+        for bloque in self.bloques:
+            if bloque.etiqueta is not None:
+                resultado.append(('label', None, None, bloque.etiqueta))
+            resultado.extend(bloque.instrucciones)
+            if bloque.salto is not None:
+                resultado.append(bloque.salto + (bloque.destino.etiqueta,))
+        return resultado
+
+    def texto(self):
+        """Volcado del grafo en texto: un bloque por parrafo con sus sucesores"""
+        lineas = []
+        for bloque in self.bloques:
+            encabezado = f"B{bloque.numero}" + (f" ({bloque.etiqueta})" if bloque.etiqueta else "")
+            lineas.append(encabezado + ":")
+            for cuadruplo in bloque.instrucciones:
+                lineas.append("    " + formatear(cuadruplo))
+            if bloque.salto is not None:
+                lineas.append("    " + formatear(bloque.salto + (bloque.destino.etiqueta,)))
+            sucesores = ", ".join(f"B{sucesor.numero}" for sucesor in bloque.sucesores())
+            lineas.append(f"    -> {sucesores or 'fin'}")
+        return "\n".join(lineas)
+
+    def dot(self):
+        """Volcado del grafo en formato DOT de Graphviz"""
+        lineas = ["digraph flujo {", '    node [shape=box, fontname="monospace"];']
+        for bloque in self.bloques:
+            contenido = [f"B{bloque.numero}" + (f" ({bloque.etiqueta})" if bloque.etiqueta else "")]
+            contenido.extend(formatear(cuadruplo) for cuadruplo in bloque.instrucciones)
+            if bloque.salto is not None:
+                contenido.append(formatear(bloque.salto + (bloque.destino.etiqueta,)))
+            etiqueta = "".join(linea.replace('\\', '\\\\').replace('"', '\\"') + "\\l"
+                               for linea in contenido)
+            lineas.append(f'    B{bloque.numero} [label="{etiqueta}"];')
+            if bloque.salto is not None and bloque.salto[0] != 'goto':
+                if bloque.siguiente is not None:
+                    lineas.append(f'    B{bloque.numero} -> B{bloque.siguiente.numero} [label="si"];')
+                lineas.append(f'    B{bloque.numero} -> B{bloque.destino.numero} [label="no"];')
+            else:
+                for sucesor in bloque.sucesores():
+                    lineas.append(f"    B{bloque.numero} -> B{sucesor.numero};")
+        lineas.append("}")
+        return "\n".join(lineas)
+
+    def mostrar_reporte(self):
+        """Muestra los cambios hechos al grafo"""
+        print("\n" + "\033[95mGRAFO DE FLUJO\033[0m")
+        print("=" * 60)
+        for nombre, cantidad in self.estadisticas.items():
+            print(f"{nombre:<24} | {cantidad:>8}")
+        print("-" * 60)
+        print(f"Bloques: {self.bloques_originales} -> {len(self.bloques)}")
+        print(f"Cuadruplos: {self.cuadruplos_originales} -> {len(self.cuadruplos())}")
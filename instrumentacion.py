@@ -0,0 +1,198 @@
+#Instrumentacion de una compilacion: tiempo de cada fase (lexer, parser,
+#optimizacion, salida...), contadores del resultado (tokens, cuadruplos,
+#temporales, etiquetas, anidamiento) y, si se pide, memoria pico por fase y un
+#perfil por produccion que se engancha al parser con agregar_gancho().
+#Uso:
+#    metricas = Metricas(memoria=True, perfil=True)
+#    procesar_codigo(codigo, metricas=metricas)   (o compilar_fuente)
+#    metricas.mostrar_resumen(); metricas.guardar_json('metricas.json')
+#Sin metricas el compilador no mide nada ni envuelve ningun metodo
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  #Windows
+    resource = None
+
+class PerfilProducciones:
+    """Gancho de parser (ver Parser3Direcciones.agregar_gancho) que cuenta las
+    llamadas a cada produccion y su tiempo total (con las producciones que llama)
+    y propio (sin ellas). En una produccion recursiva el total solo cuenta la
+    llamada mas externa, para no sumar el mismo tiempo varias veces"""
+
+    def __init__(self):
+        self.llamadas = {}
+        self.tiempo_total = {}
+        self.tiempo_propio = {}
+        self._abiertas = []  #[produccion, inicio, tiempo de las producciones internas]
+        self._activas = {}  #Produccion -> llamadas abiertas
+        self._reloj = time.perf_counter
+
+    def entrada(self, produccion):
+        self._activas[produccion] = self._activas.get(produccion, 0) + 1
+        self._abiertas.append([produccion, self._reloj(), 0.0])
+
+    def salida(self, produccion):
+        fin = self._reloj()
+        abiertas = self._abiertas
+        #Se cierra hasta la produccion que sale: si algun aviso de salida se perdio
+        #(p. ej. tras un error) las que quedaron abiertas terminan aqui tambien
+        while abiertas:
+            nombre, inicio, internas = abiertas.pop()
+            tiempo = fin - inicio
+            self.llamadas[nombre] = self.llamadas.get(nombre, 0) + 1
+            self.tiempo_propio[nombre] = self.tiempo_propio.get(nombre, 0.0) + tiempo - internas
+            self._activas[nombre] -= 1
+            if not self._activas[nombre]:
+                self.tiempo_total[nombre] = self.tiempo_total.get(nombre, 0.0) + tiempo
+            if abiertas:
+                abiertas[-1][2] += tiempo
+            if nombre == produccion:
+                break
+
+    def cerrar(self):
+        """Termina las producciones que quedaron abiertas (salidas no avisadas)"""
+        if self._abiertas:
+            self.salida(None)
+
+    def resultados(self):
+        """Lista de {produccion, llamadas, total, propio}, de mas a menos tiempo propio"""
+        return sorted(({'produccion': nombre, 'llamadas': llamadas,
+                        'total': self.tiempo_total.get(nombre, 0.0),
+                        'propio': self.tiempo_propio[nombre]}
+                       for nombre, llamadas in self.llamadas.items()),
+                      key=lambda fila: fila['propio'], reverse=True)
+
+class Metricas:
+    """Tiempos por fase (segundos, en el orden en que corrieron), contadores y
+    memoria de una compilacion. Con memoria=True se sigue la memoria de Python
+    con tracemalloc (mas lento); con perfil=True se perfilan las producciones"""
+
+    def __init__(self, memoria=False, perfil=False):
+        self.fases = {}
+        self.contadores = {}
+        self.memoria = memoria
+        self.memoria_fases = {}  #Fase -> bytes pico de Python durante la fase
+        self.perfil = PerfilProducciones() if perfil else None
+        self.total = 0.0
+        self._inicio = None
+        self._inicio_tracemalloc = False
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._inicio_tracemalloc = True
+
+    def terminar(self):
+        if self._inicio is not None:
+            self.total += time.perf_counter() - self._inicio
+            self._inicio = None
+        if self.perfil is not None:
+            self.perfil.cerrar()
+        if self._inicio_tracemalloc:
+            tracemalloc.stop()
+            self._inicio_tracemalloc = False
+
+    @contextlib.contextmanager
+    def fase(self, nombre):
+        """Mide el bloque with y lo suma al tiempo de la fase"""
+        medir_memoria = self.memoria and tracemalloc.is_tracing()
+        if medir_memoria:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nombre] = self.fases.get(nombre, 0.0) + time.perf_counter() - inicio
+            if medir_memoria:
+                pico = tracemalloc.get_traced_memory()[1] - base
+                self.memoria_fases[nombre] = max(self.memoria_fases.get(nombre, 0), pico)
+
+    def preparar(self, parser):
+        """Engancha el perfil de producciones al parser (si se pidio)"""
+        if self.perfil is not None:
+            parser.agregar_gancho(self.perfil)
+
+    def registrar(self, tokens=None, parser=None):
+        """Toma los contadores de los tokens y del parser ya terminado"""
+        contadores = self.contadores
+        if tokens is not None:
+            contadores['tokens'] = len(tokens)
+        if parser is not None:
+            contadores['cuadruplos'] = len(parser.cuadruplos)
+            contadores['temporales'] = parser.contador_temp
+            contadores['temporales_pedidas'] = parser.temporales_pedidas
+            contadores['max_temporales_vivas'] = parser.max_temporales_vivas
+            contadores['etiquetas'] = parser.contador_etiqueta
+            contadores['max_anidamiento'] = parser.max_anidamiento
+            contadores['simbolos'] = len(parser.tabla_simbolos)
+            contadores['errores'] = len(parser.errores)
+
+    def memoria_pico(self):
+        """Bytes pico de Python en cualquier fase medida (None si no se midio)"""
+        return max(self.memoria_fases.values()) if self.memoria_fases else None
+
+    @staticmethod
+    def memoria_proceso():
+        """Memoria residente maxima del proceso en bytes (None si no se puede saber)"""
+        if resource is None:
+            return None
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        #Linux la da en KB y macOS en bytes
+        return pico if sys.platform == 'darwin' else pico * 1024
+
+    def como_diccionario(self):
+        return {
+            'total': self.total,
+            'fases': dict(self.fases),
+            'contadores': dict(self.contadores),
+            'memoria': {
+                'fases': dict(self.memoria_fases),
+                'pico': self.memoria_pico(),
+                'proceso': self.memoria_proceso(),
+            },
+            'producciones': self.perfil.resultados() if self.perfil is not None else None,
+        }
+
+    def a_json(self, indent=2):
+        return json.dumps(self.como_diccionario(), indent=indent)
+
+    def guardar_json(self, ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(self.a_json())
+
+    def mostrar_resumen(self, producciones=15):
+        """Tabla de fases, contadores, memoria y las producciones mas costosas"""
+        print("\n" + "\033[95mMETRICAS DE COMPILACION\033[0m")
+        print("=" * 60)
+        print(f"{'Fase':<20} | {'Tiempo (ms)':>12} | {'%':>6} | {'Memoria (KB)':>12}")
+        print("-" * 60)
+        medido = sum(self.fases.values())
+        total = self.total or medido
+        for nombre, tiempo in self.fases.items():
+            memoria = self.memoria_fases.get(nombre)
+            memoria = f"{memoria / 1024:>12.1f}" if memoria is not None else f"{'-':>12}"
+            porcentaje = tiempo / total * 100 if total else 0.0
+            print(f"{nombre:<20} | {tiempo * 1000:>12.3f} | {porcentaje:>6.1f} | {memoria}")
+        print("-" * 60)
+        print(f"{'total':<20} | {total * 1000:>12.3f} |")
+        if self.contadores:
+            print("\n" + f"{'Contador':<24} | {'Valor':>10}")
+            print("-" * 60)
+            for nombre, valor in self.contadores.items():
+                print(f"{nombre:<24} | {valor:>10}")
+        proceso = self.memoria_proceso()
+        if proceso is not None:
+            print(f"\nMemoria residente maxima del proceso: {proceso / 1024 / 1024:.1f} MB")
+        if self.perfil is not None and self.perfil.llamadas:
+            print("\n" + f"{'Produccion':<20} | {'Llamadas':>9} | {'Total (ms)':>11} | {'Propio (ms)':>11}")
+            print("-" * 60)
+            for fila in self.perfil.resultados()[:producciones]:
+                print(f"{fila['produccion']:<20} | {fila['llamadas']:>9} | "
+                      f"{fila['total'] * 1000:>11.3f} | {fila['propio'] * 1000:>11.3f}")
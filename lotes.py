@@ -0,0 +1,155 @@
+#Compilacion por lotes desde la linea de comandos, sin menu interactivo.
+#Uso: python lotes.py programas/ otros/*.txt uno.txt -j 8 --optimizar
+#Cada fuente deja junto a si su codigo de 3 direcciones y tabla de simbolos
+#en <fuente>.3d (o en binario, <fuente>.3db); el codigo de salida es 1 si algun archivo tuvo errores.
+#Con --cache DIR las fuentes que no cambiaron no se vuelven a compilar
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cache_compilacion import CacheCompilacion
+from proyFinal import EXTENSION_BINARIA, MOTORES, compilar_fuente
+
+EXTENSION_SALIDA = '.3d'
+EXTENSIONES = {'texto': EXTENSION_SALIDA, 'binario': EXTENSION_BINARIA}
+ORIGENES = ('memoria', 'disco', 'compilado')
+
+_caches = {}  #(directorio, max_bytes) -> CacheCompilacion de este proceso
+
+def _cache(directorio, max_bytes):
+    cache = _caches.get((directorio, max_bytes))
+    if cache is None:
+        cache = _caches[(directorio, max_bytes)] = CacheCompilacion(directorio, max_bytes)
+    return cache
+
+def buscar_fuentes(entradas, patron='*.txt'):
+    """Expande archivos, directorios (recursivo, con patron) y globs a una
+    lista de rutas sin repetir, en orden"""
+    rutas = {}
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = sorted(glob.glob(os.path.join(entrada, '**', patron), recursive=True))
+        elif glob.has_magic(entrada):
+            candidatos = sorted(glob.glob(entrada, recursive=True))
+        else:
+            candidatos = [entrada]
+        for ruta in candidatos:
+            if not ruta.endswith((EXTENSION_SALIDA, EXTENSION_BINARIA)) and (os.path.isfile(ruta) or ruta == entrada):
+                rutas[ruta] = None
+    return list(rutas)
+
+def compilar_archivo(ruta, motor='descendente', reutilizar_temporales=False, optimizar=False,
+                     cache=None, cache_max_bytes=64 * 1024 * 1024, formato='texto'):
+    """Compila un archivo y escribe su salida; devuelve (ruta, exito, tokens,
+    cuadruplos, errores, origen), con origen 'memoria', 'disco' o 'compilado'
+    segun de donde salio el resultado. Corre en los procesos del pool"""
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            codigo_fuente = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return ruta, False, 0, 0, [str(e)], 'compilado'
+    if cache is None:
+        tokens, parser, exito, errores = compilar_fuente(codigo_fuente, motor, reutilizar_temporales,
+                                                         optimizar)
+        origen = 'compilado'
+    else:
+        tokens, parser, exito, errores, origen = _cache(cache, cache_max_bytes).compilar(
+            codigo_fuente, motor, reutilizar_temporales, optimizar)
+    if exito:
+        salida = ruta + EXTENSIONES[formato]
+        with contextlib.redirect_stdout(io.StringIO()):  #guardar_codigo_archivo() avisa en pantalla
+            exito = parser.guardar_codigo_archivo(salida)
+        if not exito:
+            errores = [f"No se pudo escribir {salida}"]
+    return (ruta, exito, len(tokens) if tokens is not None else 0,
+            len(parser.cuadruplos) if parser is not None else 0, errores, origen)
+
+def _compilar_en_proceso(argumentos):
+    return compilar_archivo(*argumentos)
+
+def compilar_lote(rutas, procesos=None, motor='descendente', reutilizar_temporales=False,
+                  optimizar=False, cache=None, cache_max_bytes=64 * 1024 * 1024, formato='texto'):
+    """Compila las rutas en un ProcessPoolExecutor (o en este proceso si
+    procesos es 1) y va entregando los resultados en el orden de las rutas"""
+    trabajos = [(ruta, motor, reutilizar_temporales, optimizar, cache, cache_max_bytes, formato)
+                for ruta in rutas]
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1 or len(trabajos) <= 1:
+        yield from map(_compilar_en_proceso, trabajos)
+        return
+    #Lotes grandes por tarea: miles de archivos chicos no pagan un viaje entre procesos cada uno
+    tamano = max(1, len(trabajos) // (procesos * 8))
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        yield from pool.map(_compilar_en_proceso, trabajos, chunksize=tamano)
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        prog='lotes.py',
+        description="Compila programas a codigo de 3 direcciones por lotes")
+    parser.add_argument('entradas', nargs='+', help="archivos, directorios o globs")
+    parser.add_argument('-j', '--procesos', type=int, default=None,
+                        help="procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument('--patron', default='*.txt',
+                        help="patron de archivos al recorrer directorios (por defecto *.txt)")
+    parser.add_argument('--motor', choices=MOTORES, default='descendente')
+    parser.add_argument('--reutilizar-temporales', action='store_true')
+    parser.add_argument('--optimizar', action='store_true',
+                        help="optimizacion local, de ciclos y del grafo de flujo")
+    parser.add_argument('--formato', choices=tuple(EXTENSIONES), default='texto',
+                        help="texto (.3d, tabla legible) o binario (.3db, ver formato_binario.py)")
+    parser.add_argument('-q', '--silencioso', action='store_true',
+                        help="solo mostrar errores y el resumen")
+    parser.add_argument('--cache', metavar='DIR', default=None,
+                        help="directorio del cache de compilacion (por defecto no se usa)")
+    parser.add_argument('--cache-max-mb', type=float, default=64,
+                        help="tamano maximo del cache en disco, en MB (por defecto 64)")
+    opciones = parser.parse_args(argumentos)
+    if opciones.procesos is not None and opciones.procesos < 1:
+        parser.error("el numero de procesos debe ser al menos 1")
+
+    rutas = buscar_fuentes(opciones.entradas, opciones.patron)
+    if not rutas:
+        print("No se encontraron archivos para compilar", file=sys.stderr)
+        return 2
+
+    fallidos = 0
+    tokens = 0
+    cuadruplos = 0
+    origenes = dict.fromkeys(ORIGENES, 0)
+    inicio = time.perf_counter()
+    for ruta, exito, n_tokens, n_cuadruplos, errores, origen in compilar_lote(
+            rutas, opciones.procesos, opciones.motor, opciones.reutilizar_temporales,
+            opciones.optimizar, opciones.cache, int(opciones.cache_max_mb * 1024 * 1024),
+            opciones.formato):
+        tokens += n_tokens
+        origenes[origen] += 1
+        if exito:
+            cuadruplos += n_cuadruplos
+            if not opciones.silencioso:
+                print(f"{ruta}: {n_cuadruplos} cuadruplos -> {ruta + EXTENSIONES[opciones.formato]}")
+        else:
+            fallidos += 1
+            for error in errores:
+                print(f"{ruta}: {error}", file=sys.stderr)
+    tiempo = time.perf_counter() - inicio
+
+    print("-" * 60)
+    print(f"Archivos: {len(rutas)} ({len(rutas) - fallidos} correctos, {fallidos} con errores)")
+    print(f"Tokens: {tokens}  Cuadruplos: {cuadruplos}")
+    if tiempo > 0:
+        print(f"Tiempo: {tiempo:.3f} s ({len(rutas) / tiempo:,.1f} archivos/s, "
+              f"{tokens / tiempo:,.0f} tokens/s)")
+    if opciones.cache is not None:
+        aciertos = origenes['memoria'] + origenes['disco']
+        print(f"Cache: {aciertos} aciertos ({origenes['memoria']} en memoria, "
+              f"{origenes['disco']} en disco), {origenes['compilado']} fallos "
+              f"({aciertos / len(rutas):.1%} de aciertos)")
+    return 1 if fallidos else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+#Maquina virtual para los cuadruplos generados por Parser3Direcciones.
+#Antes de ejecutar, cada etiqueta se resuelve a un indice de instruccion y cada
+#operando (variable, temporal o constante) a una casilla de una lista; la
+#ejecucion solo indexa listas y despacha por codigo de operacion
+import time
+
+from optimizador import dividir, es_constante, es_temporal, valor_constante
+from proyFinal import CODIGO_OPERACION, OPERACIONES, OPERACIONES_TIPADAS
+
+_SALTOS = frozenset(codigo for codigo, op in enumerate(OPERACIONES) if op == 'goto' or op.startswith('if'))
+
+class MaquinaVirtual:
+    def __init__(self, cuadruplos, tabla_simbolos=None):
+        self.tabla_simbolos = tabla_simbolos or {}
+        cuadruplos = list(cuadruplos)
+
+        #Las etiquetas no se ejecutan: apuntan a la siguiente instruccion real
+        self._origen = []  #Indice del cuadruplo original de cada instruccion
+        destinos = {}
+        for i, cuadruplo in enumerate(cuadruplos):
+            if cuadruplo[0] == 'label':
+                destinos[cuadruplo[3]] = len(self._origen)
+            else:
+                self._origen.append(i)
+
+        #Casillas: primero las variables declaradas, luego lo demas segun aparece
+        self.casillas = {}  #Nombre o constante -> indice de casilla
+        self.valores_iniciales = []
+        for nombre, simbolo in self.tabla_simbolos.items():
+            self._casilla(nombre, 0.0 if simbolo.tipo == 'real' else 0)
+        self.programa = []  #(codigo de operacion, casilla 1, casilla 2, casilla o destino)
+        for i in self._origen:
+            op, arg1, arg2, resultado = cuadruplos[i]
+            codigo = CODIGO_OPERACION[op]
+            if codigo in _SALTOS:
+                destino = destinos[resultado]
+            else:
+                destino = self._operando(resultado)
+            self.programa.append((codigo, self._operando(arg1), self._operando(arg2), destino))
+
+        self.pasos = 0
+        self.tiempo = 0.0
+        self.ejecuciones = None  #Veces que se ejecuto cada instruccion (con perfil)
+        self.memoria = None
+
+    def _casilla(self, operando, valor=0):
+        casilla = self.casillas.get(operando)
+        if casilla is None:
+            casilla = self.casillas[operando] = len(self.valores_iniciales)
+            self.valores_iniciales.append(valor)
+        return casilla
+
+    def _operando(self, operando):
+        if operando is None:
+            return 0
+        if es_constante(operando):
+            return self._casilla(operando, valor_constante(operando))
+        return self._casilla(operando)
+
+    def _despacho(self, memoria):
+        """Tabla indexada por codigo de operacion; cada rutina devuelve el
+        indice de la siguiente instruccion"""
+        def asignar(a, b, r, pc):
+            memoria[r] = memoria[a]
+            return pc + 1
+        def sumar(a, b, r, pc):
+            memoria[r] = memoria[a] + memoria[b]
+            return pc + 1
+        def restar(a, b, r, pc):
+            memoria[r] = memoria[a] - memoria[b]
+            return pc + 1
+        def multiplicar(a, b, r, pc):
+            memoria[r] = memoria[a] * memoria[b]
+            return pc + 1
+        def entre(a, b, r, pc):
+            memoria[r] = dividir(memoria[a], memoria[b])
+            return pc + 1
+        def ir(a, b, r, pc):
+            return r
+        #if<op> sigue de largo si la comparacion es verdadera y salta si es falsa
+        def si_igual(a, b, r, pc):
+            return pc + 1 if memoria[a] == memoria[b] else r
+        def si_menor_igual(a, b, r, pc):
+            return pc + 1 if memoria[a] <= memoria[b] else r
+        def si_mayor_igual(a, b, r, pc):
+            return pc + 1 if memoria[a] >= memoria[b] else r
+        def si_diferente(a, b, r, pc):
+            return pc + 1 if memoria[a] != memoria[b] else r
+        def si_menor(a, b, r, pc):
+            return pc + 1 if memoria[a] < memoria[b] else r
+        def si_mayor(a, b, r, pc):
+            return pc + 1 if memoria[a] > memoria[b] else r
+        #Codigo tipado (semantica.py): el tipo ya se conoce, asi la division no
+        #tiene que preguntarlo y la conversion a real es explicita
+        def entre_enteros(a, b, r, pc):
+            divisor = memoria[b]
+            if not divisor:
+                raise ZeroDivisionError("Division entre cero")
+            cociente = memoria[a] // divisor
+            if cociente < 0 and cociente * divisor != memoria[a]:
+                cociente += 1  #Trunca hacia cero
+            memoria[r] = cociente
+            return pc + 1
+        def entre_reales(a, b, r, pc):
+            memoria[r] = memoria[a] / memoria[b]
+            return pc + 1
+        def a_real(a, b, r, pc):
+            memoria[r] = float(memoria[a])
+            return pc + 1
+        rutinas = {':=': asignar, '+': sumar, '-': restar, '*': multiplicar, '/': entre,
+                   'goto': ir, 'label': None, 'if=': si_igual, 'if<=': si_menor_igual,
+                   'if>=': si_mayor_igual, 'if<>': si_diferente, 'if<': si_menor, 'if>': si_mayor}
+        for op in OPERACIONES_TIPADAS:
+            rutinas.setdefault(op, rutinas.get(op[:-1]))
+        rutinas['/e'] = entre_enteros
+        rutinas['/r'] = entre_reales
+        rutinas['real'] = a_real
+        return [rutinas[op] for op in OPERACIONES]
+
+    def ejecutar(self, valores=None, max_pasos=None, perfil=False):
+        """Ejecuta el programa y devuelve el estado final de las variables.
+        valores fija el valor inicial de algunas variables; max_pasos corta los
+        ciclos infinitos; perfil cuenta las ejecuciones de cada instruccion"""
+        memoria = list(self.valores_iniciales)
+        for nombre, valor in (valores or {}).items():
+            casilla = self._casilla(nombre)
+            if casilla < len(memoria):
+                memoria[casilla] = valor
+            else:
+                memoria.append(valor)
+        despacho = self._despacho(memoria)
+        programa = self.programa
+        n = len(programa)
+        limite = max_pasos if max_pasos is not None else 1 << 62
+        pc = 0
+        pasos = 0
+        ejecuciones = [0] * n if perfil else None
+        inicio = time.perf_counter()
+        try:
+            if perfil:
+                for pasos in range(limite):
+                    if pc >= n:
+                        break
+                    ejecuciones[pc] += 1
+                    codigo, a, b, r = programa[pc]
+                    pc = despacho[codigo](a, b, r, pc)
+                else:
+                    pasos = limite
+            else:
+                for pasos in range(limite):
+                    if pc >= n:
+                        break
+                    codigo, a, b, r = programa[pc]
+                    pc = despacho[codigo](a, b, r, pc)
+                else:
+                    pasos = limite
+        except ZeroDivisionError:
+            self.tiempo = time.perf_counter() - inicio
+            raise ZeroDivisionError(f"Division entre cero en el cuadruplo {self._origen[pc]}") from None
+        self.tiempo = time.perf_counter() - inicio
+        self.pasos = pasos
+        self.ejecuciones = ejecuciones
+        self.memoria = memoria
+        if pc < n:
+            raise RuntimeError(f"Se excedio el limite de {limite} instrucciones ejecutadas")
+        return self.estado()
+
+    def estado(self):
+        """Valor final de las variables (sin temporales, constantes ni las
+        variables _c que agrega la optimizacion de ciclos)"""
+        if self.memoria is None:
+            return {}
+        return {nombre: self.memoria[casilla] for nombre, casilla in self.casillas.items()
+                if not (es_constante(nombre) or nombre[0] == '_' or es_temporal(nombre, self.tabla_simbolos))}
+
+    def conteo_operaciones(self):
+        """Instrucciones ejecutadas por codigo de operacion (requiere perfil)"""
+        conteo = dict.fromkeys((op for op in OPERACIONES if op != 'label'), 0)
+        for (codigo, _, _, _), veces in zip(self.programa, self.ejecuciones or ()):
+            conteo[OPERACIONES[codigo]] += veces
+        return conteo
+
+    def mostrar_reporte(self):
+        """Muestra instrucciones ejecutadas, tiempo y estado final"""
+        print("\n" + "\033[95mEJECUCION DEL CODIGO DE 3 DIRECCIONES\033[0m")
+        print("=" * 60)
+        velocidad = self.pasos / self.tiempo if self.tiempo else 0
+        print(f"Instrucciones ejecutadas: {self.pasos}")
+        print(f"Tiempo: {self.tiempo * 1000:.3f} ms ({velocidad:,.0f} instrucciones/s)")
+        if self.ejecuciones is not None:
+            print("-" * 60)
+            for op, veces in self.conteo_operaciones().items():
+                if veces:
+                    print(f"{op:<6} | {veces:>12}")
+        print("-" * 60)
+        print("ESTADO FINAL:")
+        for nombre, valor in self.estado().items():
+            print(f"{nombre:<12} | {valor}")
@@ -0,0 +1,501 @@
+"""Motor de analisis LL(1) dirigido por tabla.
+
+La gramatica se declara como datos (GRAMATICA); a partir de ella se calculan los
+conjuntos PRIMEROS y SIGUIENTES y la tabla de analisis. El motor usa una pila
+explicita de simbolos y las acciones semanticas (simbolos que empiezan con '#')
+generan los mismos cuadruplos que Parser3Direcciones."""
+
+from functools import partial
+
+from proyFinal import (Parser3Direcciones, Simbolo, CODIGO_TIPO, TIPOS_TOKEN, T_FIN, T_BEING,
+                       T_PUNTO_COMA, T_END, T_ENDWHILE, T_PAR_DER,
+                       SINCRONIZACION, SINCRONIZACION_DECLARACION)
+
+#Cada no terminal tiene una lista de alternativas. Los simbolos que son llaves del
+#diccionario son no terminales, los que empiezan con '#' son acciones semanticas y
+#el resto son tipos de token. '#valor' apila el valor del token actual.
+GRAMATICA = {
+    'programa': [['being', 'declaraciones', 'ordenes', 'end']],
+    'declaraciones': [['declaracion', ';', 'declaraciones'], []],
+    'declaracion': [['tipo', 'lista_variables', '#fin_declaracion']],
+    'tipo': [['#valor', 'entero'], ['#valor', 'real']],
+    'lista_variables': [['#valor', 'IDENTIFICADOR', '#declarar', 'lista_variablesR']],
+    'lista_variablesR': [[',', '#valor', 'IDENTIFICADOR', '#declarar', 'lista_variablesR'], []],
+    'ordenes': [['orden', 'ordenesR']],
+    'ordenesR': [[';', 'orden', 'ordenesR'], []],
+    'orden': [['condicion'], ['bucle_while'], ['asignar']],
+    'condicion': [['if', '(', 'condicion_logica', ')', '#if', 'ordenes', 'else_opt', '#fin_if', 'end']],
+    'else_opt': [['else', '#else', 'ordenes'], []],
+    'condicion_logica': [['termino_logico', 'condicion_logicaR']],
+    'condicion_logicaR': [['or', '#antes_or', 'termino_logico', '#combinar', 'condicion_logicaR'], []],
+    'termino_logico': [['factor_logico', 'termino_logicoR']],
+    'termino_logicoR': [['and', '#antes_and', 'factor_logico', '#combinar', 'termino_logicoR'], []],
+    'factor_logico': [['not', 'factor_logico', '#negacion'], ['(', 'condicion_logica', ')'],
+                      ['comparacion', '#comparacion']],
+    'comparacion': [['operador', 'condicion_op', 'operador']],
+    'condicion_op': [['#valor', op] for op in ('=', '<=', '>=', '<>', '<', '>')],
+    'operador': [['#valor', 'IDENTIFICADOR'], ['numeros']],
+    'numeros': [['#valor', 'ENTERO'], ['#valor', 'REAL']],
+    'bucle_while': [['while', '(', '#while', 'condicion_logica', ')', '#condicion_while', 'ordenes', '#fin_while', 'endwhile']],
+    'asignar': [['#valor', 'IDENTIFICADOR', ':=', 'expresion_arit', '#asignar']],
+    'expresion_arit': [['termino', 'expresion_aritR']],
+    'expresion_aritR': [['#valor', '+', 'termino', '#operacion', 'expresion_aritR'],
+                        ['#valor', '-', 'termino', '#operacion', 'expresion_aritR'],
+                        []],
+    'termino': [['factor', 'terminoR']],
+    'terminoR': [['#valor', '*', 'factor', '#operacion', 'terminoR'],
+                 ['#valor', '/', 'factor', '#operacion', 'terminoR'],
+                 []],
+    'factor': [['#valor', 'IDENTIFICADOR'], ['numeros'], ['(', 'expresion_arit', ')']],
+}
+SIMBOLO_INICIAL = 'programa'
+FIN = '$'  #Fin de la entrada
+
+#Mensajes cuando ninguna alternativa de un no terminal acepta el token actual
+MENSAJES_ERROR = {
+    'programa': "Se esperaba 'being' al inicio del programa",
+    'declaracion': "Se esperaba 'entero' o 'real'",
+    'tipo': "Se esperaba 'entero' o 'real'",
+    'lista_variables': "Se esperaba un identificador",
+    'ordenes': "Se esperaba un identificador",
+    'orden': "Se esperaba un identificador",
+    'asignar': "Se esperaba un identificador",
+    'condicion_logica': "Se esperaba número entero o real",
+    'termino_logico': "Se esperaba número entero o real",
+    'factor_logico': "Se esperaba número entero o real",
+    'comparacion': "Se esperaba número entero o real",
+    'condicion_op': "Se esperaba operador de comparacion (=, <=, >=, <>, <, >)",
+    'operador': "Se esperaba número entero o real",
+    'numeros': "Se esperaba número entero o real",
+    'expresion_arit': "Se esperaba identificador, número o expresion entre paréntesis",
+    'termino': "Se esperaba identificador, número o expresion entre paréntesis",
+    'factor': "Se esperaba identificador, número o expresion entre paréntesis",
+}
+#Mensajes cuando el terminal esperado no coincide (por omision: "Se esperaba '<terminal>'")
+MENSAJES_TERMINAL = {
+    'being': "Se esperaba 'being' al inicio del programa",
+    'IDENTIFICADOR': "Se esperaba un identificador",
+    ':=': "Se esperaba ':=' en asignacion",
+    'endwhile': "Se esperaba 'endwhile' al final de while",
+    'end': "Se esperaba 'end' al final de if",
+}
+#Mensajes de un terminal segun el simbolo que le sigue en la pila (None: ninguno),
+#los mismos que da el descenso recursivo en cada lugar
+MENSAJES_CONTEXTO = {
+    (';', 'declaraciones'): "Se esperaba ';' después de declaracion",
+    ('(', 'condicion_logica'): "Se esperaba '(' después de if",
+    ('(', '#while'): "Se esperaba '(' después de while",
+    (')', '#if'): "Se esperaba ')' después de comparacion",
+    (')', '#condicion_while'): "Se esperaba ')' después de comparacion",
+    ('end', None): "Se esperaba 'end' al final del programa",
+}
+
+def es_accion(simbolo):
+    return simbolo.startswith('#')
+
+def calcular_primeros(gramatica):
+    """PRIMEROS de cada no terminal; '' representa ε"""
+    primeros = {nt: set() for nt in gramatica}
+    cambio = True
+    while cambio:
+        cambio = False
+        for nt, alternativas in gramatica.items():
+            for alternativa in alternativas:
+                nuevos = primeros_secuencia(alternativa, primeros, gramatica)
+                if not nuevos <= primeros[nt]:
+                    primeros[nt] |= nuevos
+                    cambio = True
+    return primeros
+
+def primeros_secuencia(simbolos, primeros, gramatica):
+    """PRIMEROS de una secuencia de simbolos (las acciones se ignoran)"""
+    resultado = set()
+    for simbolo in simbolos:
+        if es_accion(simbolo):
+            continue
+        if simbolo not in gramatica:
+            resultado.add(simbolo)
+            return resultado
+        resultado |= primeros[simbolo] - {''}
+        if '' not in primeros[simbolo]:
+            return resultado
+    resultado.add('')
+    return resultado
+
+def calcular_siguientes(gramatica, primeros, inicial=SIMBOLO_INICIAL):
+    """SIGUIENTES de cada no terminal"""
+    siguientes = {nt: set() for nt in gramatica}
+    siguientes[inicial].add(FIN)
+    cambio = True
+    while cambio:
+        cambio = False
+        for nt, alternativas in gramatica.items():
+            for alternativa in alternativas:
+                for i, simbolo in enumerate(alternativa):
+                    if simbolo not in gramatica:
+                        continue
+                    resto = primeros_secuencia(alternativa[i + 1:], primeros, gramatica)
+                    nuevos = resto - {''}
+                    if '' in resto:
+                        nuevos |= siguientes[nt]
+                    if not nuevos <= siguientes[simbolo]:
+                        siguientes[simbolo] |= nuevos
+                        cambio = True
+    return siguientes
+
+def codigo_terminal(terminal):
+    return T_FIN if terminal == FIN else CODIGO_TIPO[terminal]
+
+def construir_tabla(gramatica, inicial=SIMBOLO_INICIAL):
+    """Tabla LL(1): tabla[no_terminal][codigo_token] = lado derecho invertido, listo
+    para apilar, con los terminales ya convertidos a su codigo entero.
+    Lanza ValueError si la gramatica tiene conflictos"""
+    primeros = calcular_primeros(gramatica)
+    siguientes = calcular_siguientes(gramatica, primeros, inicial)
+    tabla = {nt: {} for nt in gramatica}
+    for nt, alternativas in gramatica.items():
+        for alternativa in alternativas:
+            prim = primeros_secuencia(alternativa, primeros, gramatica)
+            terminales = prim - {''}
+            if '' in prim:
+                terminales |= siguientes[nt]
+            lado_derecho = tuple(simbolo if simbolo in gramatica or es_accion(simbolo)
+                                 else codigo_terminal(simbolo)
+                                 for simbolo in reversed(alternativa))
+            for terminal in terminales:
+                codigo = codigo_terminal(terminal)
+                if codigo in tabla[nt]:
+                    raise ValueError(f"La gramatica no es LL(1): conflicto en ({nt}, {terminal})")
+                tabla[nt][codigo] = lado_derecho
+    return tabla, primeros, siguientes
+
+#La tabla se construye una sola vez al importar el modulo
+TABLA, PRIMEROS, SIGUIENTES = construir_tabla(GRAMATICA)
+#Alternativa vacia de los no terminales anulables: se usa cuando ninguna otra aplica,
+#igual que el descenso recursivo, para que el error se reporte en el mismo token
+EPSILON = {nt: () for nt, alternativas in GRAMATICA.items() if [] in alternativas}
+
+#Recuperacion en modo panico con las reglas del descenso recursivo. El contexto
+#de un error es el marcador mas cercano al tope de la pila: la lista de
+#declaraciones pendiente, el encabezado de un if/while o la lista de ordenes
+ENCABEZADOS = frozenset(('#if', '#condicion_while'))
+MARCADORES = ENCABEZADOS | {'declaraciones', 'ordenesR'}
+#Un no terminal con una sola alternativa se expande aunque el token no encaje:
+#el error se reporta en el simbolo mas profundo, en el mismo token
+ALTERNATIVA_UNICA = {nt: next(iter(set(TABLA[nt].values())))
+                     for nt, alternativas in GRAMATICA.items() if len(alternativas) == 1}
+
+def siguiente_en_pila(pila, k):
+    """Simbolo debajo de la posicion k de la pila sin contar los avisos de los
+    ganchos ('#>nt', '#/nt'); None si no hay"""
+    while k > 0:
+        k -= 1
+        simbolo = pila[k]
+        if type(simbolo) is int or simbolo[:2] not in ('#>', '#/'):
+            return simbolo
+    return None
+
+def avisar_entrada(ganchos, produccion):
+    for gancho in ganchos:
+        gancho.entrada(produccion)
+
+def avisar_salida(ganchos, produccion):
+    for gancho in reversed(ganchos):
+        gancho.salida(produccion)
+
+class ParserLL1(Parser3Direcciones):
+    """Analizador dirigido por la tabla LL(1). Reutiliza el manejo de tokens, la
+    generacion de temporales/etiquetas y la presentacion de Parser3Direcciones"""
+    NOMBRE = 'LL(1)'
+
+    def __init__(self, tokens, posiciones=None, reutilizar_temporales=False, recuperar_errores=True):
+        super().__init__(tokens, posiciones, reutilizar_temporales, recuperar_errores)
+        self.pila_semantica = []
+        self.anidamiento = 0  #if/while abiertos
+        #Tabla con la que se expande; con ganchos se cambia por una instrumentada
+        self.tabla = TABLA
+        self.epsilon = EPSILON
+        self.acciones = {
+            '#valor': self.accion_valor,
+            '#fin_declaracion': self.accion_fin_declaracion,
+            '#declarar': self.accion_declarar,
+            '#if': self.accion_if,
+            '#else': self.accion_else,
+            '#fin_if': self.accion_fin_if,
+            '#while': self.accion_while,
+            '#condicion_while': self.accion_condicion_while,
+            '#fin_while': self.accion_fin_while,
+            '#comparacion': self.accion_comparacion,
+            '#antes_and': partial(self.accion_antes_de, 'and'),
+            '#antes_or': partial(self.accion_antes_de, 'or'),
+            '#combinar': self.accion_combinar,
+            '#negacion': self.accion_negacion,
+            '#asignar': self.accion_asignar,
+            '#operacion': self.accion_operacion,
+        }
+
+    def programa(self):
+        try:
+            self.analizar()
+            self.fin_programa()
+
+            if self.errores:
+                return False, self.errores
+            return True, self.errores
+
+        except SyntaxError:
+            return False, self.errores
+
+    def ordenes_sobrantes(self):
+        #Despues del end del programa ya no se genera codigo
+        self.analizar_recuperando(['ordenes'])
+
+    #Ganchos: cada lado derecho de la tabla se rodea con dos acciones, '#>nt' al
+    #principio y '#/nt' al final, que avisan la entrada y salida del no terminal.
+    #El ciclo del motor no cambia. Tras el primer error ya no hay acciones, y las
+    #salidas pendientes no se avisan
+    def _envolver_producciones(self):
+        ganchos = self.ganchos
+        instrumentados = {}  #Lado derecho original -> instrumentado, por no terminal
+        self.tabla = {}
+        self.epsilon = {}
+        for nt, alternativas in TABLA.items():
+            entrada, salida = f'#>{nt}', f'#/{nt}'
+            self.acciones[entrada] = partial(avisar_entrada, ganchos, nt)
+            self.acciones[salida] = partial(avisar_salida, ganchos, nt)
+            instrumentados.clear()
+            self.tabla[nt] = {codigo: instrumentados.setdefault(lado, (salida,) + lado + (entrada,))
+                              for codigo, lado in alternativas.items()}
+            if nt in EPSILON:
+                self.epsilon[nt] = (salida, entrada)
+
+    def _desenvolver_producciones(self):
+        self.tabla = TABLA
+        self.epsilon = EPSILON
+        for nt in GRAMATICA:
+            self.acciones.pop(f'#>{nt}', None)
+            self.acciones.pop(f'#/{nt}', None)
+
+    def analizar(self, inicial=SIMBOLO_INICIAL):
+        """Ciclo del motor: expande no terminales con la tabla, compara terminales
+        y ejecuta acciones semanticas hasta vaciar la pila"""
+        tabla = self.tabla
+        acciones = self.acciones
+        epsilon = self.epsilon
+        pila = [inicial]
+        while pila:
+            simbolo = pila.pop()
+            if type(simbolo) is int:
+                #Terminal
+                if self.tipo_actual != simbolo:
+                    if not self.recuperar_errores:
+                        self.error(self.mensaje_error(simbolo, siguiente_en_pila(pila, len(pila))))
+                    pila.append(simbolo)
+                    return self.analizar_recuperando(pila)
+                self.get_next_token()
+                continue
+
+            accion = acciones.get(simbolo)
+            if accion is not None:
+                accion()
+                continue
+
+            alternativa = tabla[simbolo].get(self.tipo_actual)
+            if alternativa is None:
+                alternativa = epsilon.get(simbolo)
+                if alternativa is None:
+                    if not self.recuperar_errores:
+                        self.error(self.mensaje_error(simbolo))
+                    pila.append(simbolo)
+                    return self.analizar_recuperando(pila)
+            pila.extend(alternativa)
+
+    def mensaje_error(self, simbolo, debajo=None):
+        if type(simbolo) is int:
+            terminal = TIPOS_TOKEN[simbolo]
+            if type(debajo) is int:
+                debajo = TIPOS_TOKEN[debajo]
+            mensaje = MENSAJES_CONTEXTO.get((terminal, debajo))
+            return mensaje or MENSAJES_TERMINAL.get(terminal, f"Se esperaba '{terminal}'")
+        return MENSAJES_ERROR.get(simbolo, f"Token inesperado en <{simbolo}>")
+
+    def analizar_recuperando(self, pila):
+        """Sigue el analisis desde el primer error (el simbolo que fallo quedo en
+        el tope de la pila) solo para reportar todos: sin acciones semanticas ni
+        codigo. Cada error se reporta y se recupera como en el descenso
+        recursivo (ver recuperar), asi ambos motores dan los mismos errores"""
+        tabla = TABLA
+        epsilon = EPSILON
+        unicas = ALTERNATIVA_UNICA
+        while pila:
+            simbolo = pila[-1]
+            if type(simbolo) is int:
+                if self.tipo_actual != simbolo:
+                    self.recuperar(pila)
+                    continue
+                pila.pop()
+                self.get_next_token()
+                continue
+            if es_accion(simbolo):
+                pila.pop()
+                continue
+            alternativa = tabla[simbolo].get(self.tipo_actual)
+            if alternativa is None:
+                alternativa = epsilon.get(simbolo)
+                if alternativa is None:
+                    alternativa = unicas.get(simbolo)
+                    if alternativa is None:
+                        self.recuperar(pila)
+                        continue
+            pila.pop()
+            pila.extend(alternativa)
+
+    def recuperar(self, pila):
+        """Reporta el error del simbolo del tope y deja la pila y la entrada como
+        las dejaria Parser3Direcciones: 'being' y el 'end' del programa faltantes
+        se dan por puestos; un cierre de if/while equivocado se toma como el
+        cierre o se descartan tokens hasta uno de sincronizacion; un error en una
+        declaracion, un encabezado o una orden descarta tokens y recorta la pila
+        hasta su marcador. Lo recortado se recorrio una sola vez, asi que
+        recuperarse sigue siendo lineal"""
+        simbolo = pila[-1]
+        debajo = siguiente_en_pila(pila, len(pila) - 1)
+        self.reportar(self.mensaje_error(simbolo, debajo))
+        if simbolo == T_BEING:
+            pila.pop()
+            return
+        if simbolo == T_END and debajo is None:
+            #Fin del programa: lo que sobra se descarta y, si empieza otra orden, se analiza
+            if self.tipo_actual == T_FIN:
+                pila.clear()
+                return
+            self.get_next_token()
+            self.sincronizar()
+            self.match(T_PUNTO_COMA)
+            if self.tipo_actual not in SINCRONIZACION:
+                pila.append('ordenes')
+            return
+        if simbolo == T_END or simbolo == T_ENDWHILE:
+            pila.pop()
+            if self.tipo_actual == T_END or self.tipo_actual == T_ENDWHILE:
+                self.get_next_token()
+            else:
+                self.sincronizar()
+            return
+
+        #Marcador del contexto; los ')' de en medio son los parentesis abiertos
+        k = len(pila) - 1
+        abiertos = 0
+        while k >= 0 and pila[k] not in MARCADORES:
+            if pila[k] == T_PAR_DER:
+                abiertos += 1
+            k -= 1
+        if k < 0:
+            self.sincronizar()
+            pila.clear()
+            return
+        marcador = pila[k]
+        if marcador == 'declaraciones':
+            self.sincronizar(SINCRONIZACION_DECLARACION)
+            self.match(T_PUNTO_COMA)
+            del pila[k + 1:]
+        elif marcador == 'ordenesR':
+            self.sincronizar()
+            del pila[k + 1:]
+        else:
+            #Encabezado: el ')' que lo cierra no cuenta como abierto
+            self.parentesis_abiertos = abiertos - 1
+            self.sincronizar_encabezado()
+            del pila[k:]
+            if not self.match(T_PAR_DER):
+                #Sin cuerpo: sigue lo que va despues de una orden
+                pila[-1] = 'ordenesR'
+
+    #Acciones semanticas
+    def accion_valor(self):
+        self.pila_semantica.append(self.valor_actual())
+
+    def accion_declarar(self):
+        id_name = self.pila_semantica.pop()
+        #Registrar variable en tabla de simbolos (el tipo queda debajo en la pila)
+        self.tabla_simbolos[id_name] = Simbolo(id_name, self.pila_semantica[-1])
+
+    def accion_fin_declaracion(self):
+        self.pila_semantica.pop()
+
+    def _comparacion(self):
+        op2 = self.pila_semantica.pop()
+        operador_comp = self.pila_semantica.pop()
+        op1 = self.pila_semantica.pop()
+        return op1, operador_comp, op2
+
+    def abrir_construccion(self):
+        self.anidamiento += 1
+        if self.anidamiento > self.max_anidamiento:
+            self.max_anidamiento = self.anidamiento
+
+    #Las condiciones se generan con los mismos metodos de Parser3Direcciones
+    #(condicion_antes_de, combinar_condiciones...); en la pila semantica una
+    #condicion es la tupla (verdaderos, falsos, comparacion)
+    def accion_comparacion(self):
+        self.pila_semantica.append(([], [], self._comparacion()))
+
+    def accion_antes_de(self, conector):
+        self.pila_semantica[-1] = self.condicion_antes_de(conector, self.pila_semantica[-1])
+
+    def accion_combinar(self):
+        derecha = self.pila_semantica.pop()
+        izquierda = self.pila_semantica.pop()
+        self.pila_semantica.append(self.combinar_condiciones(izquierda, derecha))
+
+    def accion_negacion(self):
+        self.pila_semantica[-1] = self.negar_condicion(self.pila_semantica[-1])
+
+    def accion_if(self):
+        falsos = self.saltar_si_falsa(self.pila_semantica.pop())
+        etiqueta_else = self.nueva_etiqueta()
+        self.parchar(falsos, etiqueta_else)
+        self.pila_semantica.append((etiqueta_else, None))
+        self.abrir_construccion()
+
+    def accion_else(self):
+        etiqueta_else, _ = self.pila_semantica[-1]
+        etiqueta_fin = self.nueva_etiqueta()
+        self.agregar_cuadruplo('goto', None, None, etiqueta_fin)
+        self.agregar_cuadruplo('label', None, None, etiqueta_else)
+        self.pila_semantica[-1] = (etiqueta_else, etiqueta_fin)
+
+    def accion_fin_if(self):
+        #Sin else, la etiqueta del else es el final del if
+        etiqueta_else, etiqueta_fin = self.pila_semantica.pop()
+        self.agregar_cuadruplo('label', None, None, etiqueta_fin if etiqueta_fin is not None else etiqueta_else)
+        self.anidamiento -= 1
+
+    def accion_while(self):
+        etiqueta_inicio = self.nueva_etiqueta()
+        self.agregar_cuadruplo('label', None, None, etiqueta_inicio)
+        self.pila_semantica.append((etiqueta_inicio, None))
+        self.abrir_construccion()
+
+    def accion_condicion_while(self):
+        falsos = self.saltar_si_falsa(self.pila_semantica.pop())
+        etiqueta_fin = self.nueva_etiqueta()
+        self.parchar(falsos, etiqueta_fin)
+        self.pila_semantica[-1] = (self.pila_semantica[-1][0], etiqueta_fin)
+
+    def accion_fin_while(self):
+        etiqueta_inicio, etiqueta_fin = self.pila_semantica.pop()
+        self.agregar_cuadruplo('goto', None, None, etiqueta_inicio)
+        self.agregar_cuadruplo('label', None, None, etiqueta_fin)
+        self.anidamiento -= 1
+
+    def accion_asignar(self):
+        temp_resultado = self.pila_semantica.pop()
+        id_destino = self.pila_semantica.pop()
+        self.asignacion(id_destino, temp_resultado)
+
+    def accion_operacion(self):
+        arg2 = self.pila_semantica.pop()
+        operador = self.pila_semantica.pop()
+        arg1 = self.pila_semantica.pop()
+        self.pila_semantica.append(self.operacion(operador, arg1, arg2))
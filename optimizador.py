@@ -0,0 +1,308 @@
+#Optimizacion local sobre los cuadruplos generados por Parser3Direcciones.
+#Cada bloque basico se optimiza por separado: las temporales nacen y mueren
+#dentro de la misma sentencia o condicion, asi que nunca cruzan de un bloque a otro.
+#Los cuadruplos no llevan tipos, pero el codigo tipado (semantica.py) convierte a
+#real lo que se guarda en una variable real: un entero guardado en ella ya no es
+#el mismo valor, asi que no se propaga ni se toma como copia
+import math
+import operator
+import re
+
+ARITMETICAS = frozenset(('+', '-', '*', '/'))
+CONMUTATIVAS = frozenset(('+', '*'))
+
+#Un if<op> salta a su etiqueta cuando la comparacion es FALSA
+COMPARACIONES = {
+    'if=': operator.eq,
+    'if<=': operator.le,
+    'if>=': operator.ge,
+    'if<>': operator.ne,
+    'if<': operator.lt,
+    'if>': operator.gt,
+}
+#Tambien los saltos del codigo tipado ('if<e', 'if=r'...; ver semantica.py), para
+#que todas las pasadas partan el codigo en los mismos bloques
+SALTOS = frozenset(('goto',) + tuple(op + sufijo for op in COMPARACIONES for sufijo in ('', 'e', 'r')))
+
+_PATRON_TEMPORAL = re.compile(r't\d+')
+
+def es_temporal(operando, variables=()):
+    """Las temporales del parser se llaman t0, t1...; una variable declarada con
+    ese nombre (en variables) no es temporal"""
+    return (operando is not None and _PATRON_TEMPORAL.fullmatch(operando) is not None
+            and operando not in variables)
+
+def es_constante(operando):
+    """Las constantes son los operandos que empiezan con digito (o signo, si salen de un plegado)"""
+    return operando is not None and operando[0] in '-0123456789'
+
+def valor_constante(literal):
+    """Convierte el lexema de una constante a int o float"""
+    return float(literal) if '.' in literal or 'e' in literal else int(literal)
+
+def dividir(a, b):
+    """Division del lenguaje: entre enteros trunca hacia cero y entre cero es un error"""
+    if b == 0:
+        raise ZeroDivisionError("Division entre cero")
+    if isinstance(a, int) and isinstance(b, int):
+        cociente = abs(a) // abs(b)
+        return cociente if (a < 0) == (b < 0) else -cociente
+    return a / b
+
+def evaluar(operador, a, b):
+    """Aplica un operador aritmetico con la semantica del lenguaje"""
+    if operador == '+':
+        return a + b
+    if operador == '-':
+        return a - b
+    if operador == '*':
+        return a * b
+    return dividir(a, b)
+
+def bloques_basicos(cuadruplos):
+    """Rangos (inicio, fin) de los bloques basicos: un bloque empieza en la
+    primera instruccion, en cada label y despues de cada salto"""
+    rangos = []
+    inicio = 0
+    for i, cuadruplo in enumerate(cuadruplos):
+        op = cuadruplo[0]
+        if op == 'label' and i > inicio:
+            rangos.append((inicio, i))
+            inicio = i
+        if op in SALTOS:
+            rangos.append((inicio, i + 1))
+            inicio = i + 1
+    if inicio < len(cuadruplos):
+        rangos.append((inicio, len(cuadruplos)))
+    return rangos
+
+class Optimizador:
+    """Tuberia de pasadas locales; cada una se puede desactivar y lleva la
+    cuenta de las instrucciones que elimino y de las que reescribio"""
+    PASADAS = ('constantes', 'copias', 'subexpresiones', 'temporales_muertas')
+
+    def __init__(self, constantes=True, copias=True, subexpresiones=True,
+                 temporales_muertas=True, variables=(), reales=(), max_rondas=10):
+        self.activas = [nombre for nombre, activa in zip(self.PASADAS,
+                        (constantes, copias, subexpresiones, temporales_muertas)) if activa]
+        self.variables = frozenset(variables)  #Declaradas: una variable llamada t0 no es temporal
+        self.reales = frozenset(reales)  #Declaradas reales
+        self.max_rondas = max_rondas
+        self.eliminadas = dict.fromkeys(self.PASADAS, 0)
+        self.reescritas = dict.fromkeys(self.PASADAS, 0)
+        self.originales = 0
+        self.finales = 0
+
+    def es_temporal(self, operando):
+        return es_temporal(operando, self.variables)
+
+    def es_real(self, operando):
+        """El operando es real con seguridad: una variable real o una constante
+        real (una temporal puede ser entera)"""
+        return operando in self.reales or (es_constante(operando) and isinstance(valor_constante(operando), float))
+
+    def convierte(self, resultado, arg1, arg2=None):
+        """Guardar en resultado el valor calculado con arg1 y arg2 puede convertirlo a real"""
+        return resultado in self.reales and not (self.es_real(arg1) or self.es_real(arg2))
+
+    def optimizar(self, cuadruplos):
+        """Devuelve la lista de cuadruplos optimizada"""
+        cuadruplos = list(cuadruplos)
+        self.originales = len(cuadruplos)
+        resultado = []
+        for inicio, fin in bloques_basicos(cuadruplos):
+            bloque = cuadruplos[inicio:fin]
+            #Las pasadas se habilitan entre si (plegar deja copias, las copias dejan
+            #temporales muertas...), asi que se repiten hasta que nada cambie
+            for _ in range(self.max_rondas):
+                cambios = 0
+                for nombre in self.activas:
+                    antes = len(bloque)
+                    bloque, reescritas = getattr(self, '_' + nombre)(bloque)
+                    self.eliminadas[nombre] += antes - len(bloque)
+                    self.reescritas[nombre] += reescritas
+                    cambios += antes - len(bloque) + reescritas
+                if not cambios:
+                    break
+            resultado.extend(bloque)
+        self.finales = len(resultado)
+        return resultado
+
+    #Plegado y propagacion de constantes
+    def _constantes(self, bloque):
+        valores = {}  #Variable o temporal -> constante que contiene
+        nuevo = []
+        reescritas = 0
+        for cuadruplo in bloque:
+            op, arg1, arg2, resultado = cuadruplo
+            if op in SALTOS or op == 'label':
+                if op in COMPARACIONES:
+                    arg1 = valores.get(arg1, arg1)
+                    arg2 = valores.get(arg2, arg2)
+                    if es_constante(arg1) and es_constante(arg2):
+                        reescritas += 1
+                        if COMPARACIONES[op](valor_constante(arg1), valor_constante(arg2)):
+                            continue  #Nunca salta
+                        cuadruplo = ('goto', None, None, resultado)
+                    elif (arg1, arg2) != cuadruplo[1:3]:
+                        reescritas += 1
+                        cuadruplo = (op, arg1, arg2, resultado)
+                nuevo.append(cuadruplo)
+                continue
+
+            arg1 = valores.get(arg1, arg1)
+            arg2 = valores.get(arg2, arg2)
+            if op in ARITMETICAS and es_constante(arg1) and es_constante(arg2):
+                try:
+                    valor = evaluar(op, valor_constante(arg1), valor_constante(arg2))
+                except ZeroDivisionError:
+                    valor = None  #Se deja para que falle en ejecucion
+                if valor is not None and math.isfinite(valor):
+                    op, arg1, arg2 = ':=', repr(valor), None
+            if (op, arg1, arg2) != cuadruplo[:3]:
+                reescritas += 1
+                cuadruplo = (op, arg1, arg2, resultado)
+            if op == ':=' and es_constante(arg1):
+                valores[resultado] = repr(float(valor_constante(arg1))) if self.convierte(resultado, arg1) else arg1
+            else:
+                valores.pop(resultado, None)
+            nuevo.append(cuadruplo)
+        return nuevo, reescritas
+
+    #Propagacion de copias hacia adelante y fusion de 't := a op b; x := t'
+    def _copias(self, bloque):
+        copias = {}  #Destino -> operando del que es copia
+        copiados = {}  #Operando -> destinos que son copia suya
+        nuevo = []
+        reescritas = 0
+        for cuadruplo in bloque:
+            op, arg1, arg2, resultado = cuadruplo
+            if op == 'label' or op == 'goto':
+                nuevo.append(cuadruplo)
+                continue
+            arg1 = copias.get(arg1, arg1)
+            arg2 = copias.get(arg2, arg2)
+            if (arg1, arg2) != cuadruplo[1:3]:
+                reescritas += 1
+                cuadruplo = (op, arg1, arg2, resultado)
+            if op in COMPARACIONES:
+                nuevo.append(cuadruplo)
+                continue
+            if op == ':=' and arg1 == resultado:
+                continue  #x := x
+            #resultado cambia de valor: deja de ser copia y nadie sigue copiandolo
+            fuente = copias.pop(resultado, None)
+            if fuente is not None:
+                copiados[fuente].discard(resultado)
+            for destino in copiados.pop(resultado, ()):
+                del copias[destino]
+            if op == ':=' and not self.convierte(resultado, arg1):
+                copias[resultado] = arg1
+                copiados.setdefault(arg1, set()).add(resultado)
+            nuevo.append(cuadruplo)
+
+        #De atras hacia adelante: vivas son las temporales que se leen mas adelante
+        fusionado = []
+        vivas = set()
+        i = len(nuevo) - 1
+        while i >= 0:
+            op, arg1, arg2, resultado = cuadruplo = nuevo[i]
+            if (op == ':=' and i and self.es_temporal(arg1) and arg1 not in vivas
+                    and nuevo[i - 1][0] in ARITMETICAS and nuevo[i - 1][3] == arg1):
+                op, arg1, arg2, _ = nuevo[i - 1]
+                cuadruplo = (op, arg1, arg2, resultado)
+                i -= 1
+            if op != 'label' and op != 'goto':
+                if op not in COMPARACIONES:
+                    vivas.discard(resultado)
+                if self.es_temporal(arg1):
+                    vivas.add(arg1)
+                if self.es_temporal(arg2):
+                    vivas.add(arg2)
+            fusionado.append(cuadruplo)
+            i -= 1
+        fusionado.reverse()
+        return fusionado, reescritas
+
+    #Numeracion local de valores: una subexpresion ya calculada se copia en vez de recalcularse
+    def _subexpresiones(self, bloque):
+        numeros = {}  #Operando -> numero de valor
+        expresiones = {}  #(op, valor1, valor2) -> numero de valor
+        portadores = {}  #Numero de valor -> nombres que lo han contenido
+        nuevo = []
+        reescritas = 0
+
+        def numero(operando):
+            valor = numeros.get(operando)
+            if valor is None:
+                valor = numeros[operando] = len(portadores)
+                portadores[valor] = [operando]
+            return valor
+
+        for cuadruplo in bloque:
+            op, arg1, arg2, resultado = cuadruplo
+            if op in ARITMETICAS:
+                valor1, valor2 = numero(arg1), numero(arg2)
+                if op in CONMUTATIVAS and valor2 < valor1:
+                    valor1, valor2 = valor2, valor1
+                clave = (op, valor1, valor2)
+                valor = expresiones.get(clave)
+                if valor is None:
+                    valor = expresiones[clave] = len(portadores)
+                    portadores[valor] = []
+                else:
+                    portador = next((nombre for nombre in portadores[valor]
+                                     if numeros.get(nombre) == valor), None)
+                    if portador == resultado:
+                        continue  #Ya contiene ese valor
+                    if portador is not None:
+                        reescritas += 1
+                        cuadruplo = (':=', portador, None, resultado)
+            elif op == ':=':
+                valor = numero(arg1)
+            else:
+                nuevo.append(cuadruplo)
+                continue
+            if self.convierte(resultado, arg1, arg2):
+                #Convertido a real es otro valor
+                valor = len(portadores)
+                portadores[valor] = []
+            numeros[resultado] = valor
+            portadores[valor].append(resultado)
+            nuevo.append(cuadruplo)
+        return nuevo, reescritas
+
+    #Eliminacion de temporales que se asignan y nunca se leen
+    def _temporales_muertas(self, bloque):
+        vivas = set()
+        nuevo = []
+        for cuadruplo in reversed(bloque):
+            op, arg1, arg2, resultado = cuadruplo
+            if op == 'label' or op == 'goto':
+                nuevo.append(cuadruplo)
+                continue
+            if op not in COMPARACIONES:
+                if self.es_temporal(resultado) and resultado not in vivas:
+                    continue
+                vivas.discard(resultado)
+            if self.es_temporal(arg1):
+                vivas.add(arg1)
+            if self.es_temporal(arg2):
+                vivas.add(arg2)
+            nuevo.append(cuadruplo)
+        nuevo.reverse()
+        return nuevo, 0
+
+    def mostrar_reporte(self):
+        """Muestra cuantas instrucciones elimino y reescribio cada pasada"""
+        print("\n" + "\033[95mOPTIMIZACION LOCAL\033[0m")
+        print("=" * 60)
+        print(f"{'Pasada':<20} | {'Eliminadas':>10} | {'Reescritas':>10}")
+        print("-" * 60)
+        for nombre in self.PASADAS:
+            if nombre in self.activas:
+                print(f"{nombre:<20} | {self.eliminadas[nombre]:>10} | {self.reescritas[nombre]:>10}")
+            else:
+                print(f"{nombre:<20} | {'desactivada':>23}")
+        print("-" * 60)
+        print(f"Cuadruplos: {self.originales} -> {self.finales}")
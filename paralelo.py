@@ -0,0 +1,290 @@
+#Compilacion en paralelo de un solo programa grande.
+#    tokens, parser, exito, errores = compilar_paralelo(codigo, procesos=8)
+#El codigo se corta en pedazos en espacios en blanco (ningun token queda partido)
+#y cada proceso analiza lexicamente el suyo; al unir los tokens se buscan los ';'
+#de nivel superior (fuera de todo if/while) que reparten las ordenes en tramos
+#de tamano parecido. Cada proceso analiza su tramo como un programa completo
+#(being, las declaraciones, el tramo y end) con temporales y etiquetas desde 0,
+#y al unir los cuadruplos se les suma lo que usaron los tramos anteriores.
+#Entre dos ordenes de nivel superior no queda ninguna temporal viva, asi que el
+#resultado es el mismo que el de compilar_fuente (con reutilizar_temporales cada
+#tramo vuelve a empezar en t0, como lo haria el parser secuencial).
+#Si algun tramo tiene errores se compila todo en secuencia: los mensajes y sus
+#posiciones son los de siempre y el caso con errores no necesita ser rapido.
+#Uso: python paralelo.py programa.txt -j 8 [--optimizar] [--comparar]
+import argparse
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+
+from proyFinal import (MOTORES, T_BEING, T_END, T_ENDWHILE, T_IF, T_PUNTO_COMA,
+                       T_TIPO_ENTERO, T_TIPO_REAL, T_WHILE, TablaCuadruplos, TokensCompactos,
+                       compilar_fuente, crear_parser, lexer_compacto)
+
+MINIMO_CARACTERES = 1 << 20  #Programas mas chicos se compilan en secuencia
+
+_PATRON_TEMPORAL = re.compile(r't(\d+)')
+_PATRON_ETIQUETA = re.compile(r'L(\d+)')
+_PATRON_ESPACIO = re.compile(r'\s')
+#Tokens que abren o cierran bloques y el separador de ordenes
+_PATRON_ESTRUCTURA = re.compile(b'[' + re.escape(bytes((T_IF, T_WHILE, T_END, T_ENDWHILE, T_PUNTO_COMA)))
+                                + b']')
+
+def partir_codigo(codigo_fuente, partes):
+    """Limites (inicio, fin) de hasta partes pedazos del codigo de tamano
+    parecido, cortados en un espacio en blanco"""
+    cortes = [0]
+    for k in range(1, partes):
+        m = _PATRON_ESPACIO.search(codigo_fuente, max(len(codigo_fuente) * k // partes, cortes[-1] + 1))
+        if m is None:
+            break
+        cortes.append(m.start())
+    cortes.append(len(codigo_fuente))
+    return list(zip(cortes, cortes[1:]))
+
+def _lexer_pedazo(pedazo):
+    """Tokens de un pedazo en columnas (tipos, ids_lexema, lexemas), o None si
+    tiene un caracter que no pertenece a ningun token"""
+    try:
+        tokens = lexer_compacto(pedazo)
+    except ValueError:
+        return None
+    return tokens.tipos, tokens.ids_lexema, tokens.lexemas
+
+def unir_tokens(codigo_fuente, pedazos):
+    """TokensCompactos del codigo completo a partir de los de sus pedazos: los
+    lexemas se vuelven a internar en orden de aparicion, como en lexer_compacto"""
+    tipos = array('B')
+    ids_lexema = array('I')
+    indices = {}
+    for tipos_pedazo, ids_pedazo, lexemas in pedazos:
+        mapa = [indices.setdefault(lexema, len(indices)) for lexema in lexemas]
+        tipos.extend(tipos_pedazo)
+        ids_lexema.extend(map(mapa.__getitem__, ids_pedazo))
+    return TokensCompactos(codigo_fuente, tipos, ids_lexema, list(indices))
+
+def fin_declaraciones(tipos):
+    """Indice del primer token despues de las declaraciones (0 si el programa
+    no empieza como se espera)"""
+    datos = tipos.tobytes()
+    if datos[:1] != bytes((T_BEING,)):
+        return 0
+    ultimo_tipo = max(datos.rfind(bytes((T_TIPO_ENTERO,))), datos.rfind(bytes((T_TIPO_REAL,))))
+    if ultimo_tipo < 0:
+        return 1
+    return datos.find(bytes((T_PUNTO_COMA,)), ultimo_tipo) + 1
+
+def cortes_nivel_superior(tipos, inicio, tramos):
+    """Indices de hasta tramos - 1 ';' fuera de todo if/while, despues de inicio,
+    que reparten los tokens en tramos de tamano parecido. Solo se recorren los
+    tokens de bloque y los ';'"""
+    datos = tipos.tobytes()
+    cortes = []
+    siguiente = inicio + (len(datos) - inicio) // tramos
+    profundidad = 0
+    for m in _PATRON_ESTRUCTURA.finditer(datos, inicio):
+        i = m.start()
+        codigo = datos[i]
+        if codigo == T_PUNTO_COMA:
+            if not profundidad and i >= siguiente:
+                cortes.append(i)
+                if len(cortes) == tramos - 1:
+                    break
+                siguiente = i + (len(datos) - i) // (tramos - len(cortes))
+        elif codigo == T_IF or codigo == T_WHILE:
+            profundidad += 1
+        else:
+            profundidad -= 1
+    return cortes
+
+def _compilar_tramo(tipos, ids_lexema, lexemas, motor, reutilizar_temporales, verificar_tipos, simbolos):
+    """Analiza un tramo ya armado como programa completo. Regresa None si tiene
+    errores; si no, las columnas de sus cuadruplos, sus contadores y (si se
+    piden) sus simbolos"""
+    tokens = TokensCompactos('', tipos, ids_lexema, lexemas)
+    parser = crear_parser(tokens, motor=motor, reutilizar_temporales=reutilizar_temporales,
+                          recuperar_errores=False)
+    exito, _ = parser.programa()
+    if exito and verificar_tipos:
+        exito = parser.verificar_tipos()
+    if not exito:
+        return None
+    cuadruplos = parser.cuadruplos
+    return ((cuadruplos.ops, cuadruplos.args1, cuadruplos.args2, cuadruplos.resultados, cuadruplos.operandos),
+            (parser.contador_temp, parser.contador_etiqueta, parser.temporales_pedidas,
+             parser.max_temporales_vivas, parser.max_anidamiento),
+            parser.tabla_simbolos if simbolos else None)
+
+def _compilar_tramo_en_proceso(argumentos):
+    return _compilar_tramo(*argumentos)
+
+def _nombres(letra, cantidad, base):
+    """Nombre viejo -> nombre desplazado de las temporales o etiquetas de un tramo"""
+    if not base:
+        return {}
+    formato = f"{letra}{{}}".format
+    return dict(zip(map(formato, range(cantidad)), map(formato, range(base, base + cantidad))))
+
+def unir_cuadruplos(resultados, reutilizar_temporales=False):
+    """Une los cuadruplos de los tramos renumerando temporales y etiquetas.
+    Regresa la TablaCuadruplos y los contadores del programa completo. Todo el
+    trabajo por operando y por cuadruplo se hace con map y dict, sin ciclos en Python"""
+    cuadruplos = TablaCuadruplos()
+    operandos = cuadruplos.operandos
+    indices = cuadruplos.indices_operando
+    temporales = etiquetas = pedidas = max_vivas = anidamiento = 0
+    for columnas, (n_temporales, n_etiquetas, n_pedidas, n_vivas, n_anidamiento), _ in resultados:
+        ops, args1, args2, resultados_tramo, operandos_tramo = columnas
+        nombres = _nombres('t', n_temporales, 0 if reutilizar_temporales else temporales)
+        nombres.update(_nombres('L', n_etiquetas, etiquetas))
+        if nombres:
+            operandos_tramo = list(map(nombres.get, operandos_tramo, operandos_tramo))
+        #Los operandos del tramo estan en orden de aparicion: los nuevos se internan
+        #en el mismo orden que les daria el parser secuencial
+        nuevos = dict.fromkeys(operandos_tramo)
+        for repetido in nuevos.keys() & indices.keys():
+            del nuevos[repetido]
+        indices.update(zip(nuevos, count(len(operandos))))
+        operandos.extend(nuevos)
+        mapa = array('I', map(indices.__getitem__, operandos_tramo))
+        cuadruplos.ops.extend(ops)
+        cuadruplos.args1.extend(map(mapa.__getitem__, args1))
+        cuadruplos.args2.extend(map(mapa.__getitem__, args2))
+        cuadruplos.resultados.extend(map(mapa.__getitem__, resultados_tramo))
+        temporales = max(temporales, n_temporales) if reutilizar_temporales else temporales + n_temporales
+        etiquetas += n_etiquetas
+        pedidas += n_pedidas
+        max_vivas = max(max_vivas, n_vivas)
+        anidamiento = max(anidamiento, n_anidamiento)
+    return cuadruplos, (temporales, etiquetas, pedidas, max_vivas, anidamiento)
+
+def _tramos(tokens, inicio_ordenes, cortes):
+    """(tipos, ids_lexema) de cada tramo como programa completo: el primero ya
+    trae being y las declaraciones y el ultimo ya trae end"""
+    tipos = tokens.tipos
+    ids_lexema = tokens.ids_lexema
+    fin = array('B', (T_END,)), array('I', (tokens.lexemas.index('end'),))
+    limites = [0] + [corte + 1 for corte in cortes] + [len(tipos)]
+    for k in range(len(limites) - 1):
+        inicio, final = limites[k], limites[k + 1] - (k < len(cortes))
+        partes_tipos = [tipos[inicio:final]]
+        partes_ids = [ids_lexema[inicio:final]]
+        if k:
+            partes_tipos.insert(0, tipos[:inicio_ordenes])
+            partes_ids.insert(0, ids_lexema[:inicio_ordenes])
+        if k < len(cortes):
+            partes_tipos.append(fin[0])
+            partes_ids.append(fin[1])
+        yield sum(partes_tipos, array('B')), sum(partes_ids, array('I'))
+
+def compilar_paralelo(codigo_fuente, procesos=None, motor='descendente', reutilizar_temporales=False,
+                      optimizar=False, recuperar_errores=True, verificar_tipos=True,
+                      minimo=MINIMO_CARACTERES, ejecutor=None):
+    """Como compilar_fuente (mismo resultado), repartiendo el analisis lexico y
+    sintactico de un programa grande entre procesos. ejecutor es un
+    ProcessPoolExecutor ya creado (si no, se crea uno de procesos procesos). Con
+    un solo proceso, un programa de menos de minimo caracteres o sin ';' de
+    nivel superior donde cortar se compila en secuencia; la optimizacion
+    siempre es secuencial, sobre el programa ya unido"""
+    procesos = procesos or os.cpu_count() or 1
+    secuencial = (codigo_fuente, motor, reutilizar_temporales, optimizar, None, recuperar_errores,
+                  verificar_tipos)
+    if procesos == 1 or len(codigo_fuente) < minimo:
+        return compilar_fuente(*secuencial)
+    with contextlib.ExitStack() as pila:
+        if ejecutor is None:
+            ejecutor = pila.enter_context(ProcessPoolExecutor(max_workers=procesos))
+
+        pedazos = list(ejecutor.map(_lexer_pedazo, [codigo_fuente[inicio:fin] for inicio, fin
+                                                    in partir_codigo(codigo_fuente, procesos)]))
+        if None in pedazos:
+            return compilar_fuente(*secuencial)
+        tokens = unir_tokens(codigo_fuente, pedazos)
+        inicio_ordenes = fin_declaraciones(tokens.tipos)
+        cortes = cortes_nivel_superior(tokens.tipos, inicio_ordenes, procesos) if inicio_ordenes else []
+        if not cortes or 'end' not in tokens.lexemas:
+            return compilar_fuente(*secuencial)
+
+        trabajos = [(tipos, ids_lexema, tokens.lexemas, motor, reutilizar_temporales, verificar_tipos, not k)
+                    for k, (tipos, ids_lexema) in enumerate(_tramos(tokens, inicio_ordenes, cortes))]
+        resultados = list(ejecutor.map(_compilar_tramo_en_proceso, trabajos))
+    if None in resultados:
+        return compilar_fuente(*secuencial)
+    tabla_simbolos = resultados[0][2]
+    #Los nombres tN y LN de los tramos son temporales y etiquetas: una variable
+    #con uno de esos nombres no se podria renumerar
+    if any(_PATRON_TEMPORAL.fullmatch(nombre) or _PATRON_ETIQUETA.fullmatch(nombre) for nombre in tabla_simbolos):
+        return compilar_fuente(*secuencial)
+
+    cuadruplos, contadores = unir_cuadruplos(resultados, reutilizar_temporales)
+    parser = crear_parser(tokens, motor=motor, reutilizar_temporales=reutilizar_temporales,
+                          recuperar_errores=recuperar_errores)
+    parser.cuadruplos = cuadruplos
+    parser.tabla_simbolos = tabla_simbolos
+    (parser.contador_temp, parser.contador_etiqueta, parser.temporales_pedidas,
+     parser.max_temporales_vivas, parser.max_anidamiento) = contadores
+    if reutilizar_temporales:
+        #Al terminar el programa todas las temporales quedan libres
+        parser.temporales_libres = list(range(parser.contador_temp))
+    if optimizar:
+        parser.optimizar()
+        parser.optimizar_ciclos()
+        parser.optimizar()
+        parser.simplificar_flujo()
+    return tokens, parser, True, []
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        prog='paralelo.py',
+        description="Compila un programa grande repartiendo sus ordenes entre procesos")
+    parser.add_argument('archivo')
+    parser.add_argument('-j', '--procesos', type=int, default=None,
+                        help="procesos (por defecto, uno por CPU)")
+    parser.add_argument('--motor', choices=MOTORES, default='descendente')
+    parser.add_argument('--reutilizar-temporales', action='store_true')
+    parser.add_argument('--optimizar', action='store_true')
+    parser.add_argument('-o', '--salida', help="archivo de salida (.3d o .3db); por defecto no se escribe")
+    parser.add_argument('--comparar', action='store_true',
+                        help="compila tambien en secuencia y revisa que el resultado sea el mismo")
+    opciones = parser.parse_args(argumentos)
+    if opciones.procesos is not None and opciones.procesos < 1:
+        parser.error("el numero de procesos debe ser al menos 1")
+
+    with open(opciones.archivo, encoding='utf-8') as f:
+        codigo_fuente = f.read()
+    ajustes = (opciones.motor, opciones.reutilizar_temporales, opciones.optimizar)
+    inicio = time.perf_counter()
+    tokens, resultado, exito, errores = compilar_paralelo(codigo_fuente, opciones.procesos, *ajustes, minimo=0)
+    tiempo = time.perf_counter() - inicio
+    if not exito:
+        for error in errores:
+            print(f"{opciones.archivo}: {error}", file=sys.stderr)
+        return 1
+    print(f"{opciones.archivo}: {len(tokens)} tokens, {len(resultado.cuadruplos)} cuadruplos "
+          f"en {tiempo:.3f} s")
+    if opciones.comparar:
+        inicio = time.perf_counter()
+        _, secuencial, _, _ = compilar_fuente(codigo_fuente, *ajustes)
+        tiempo_secuencial = time.perf_counter() - inicio
+        iguales = (list(secuencial.cuadruplos) == list(resultado.cuadruplos)
+                   and secuencial.tabla_simbolos == resultado.tabla_simbolos
+                   and secuencial.contador_temp == resultado.contador_temp)
+        print(f"En secuencia: {tiempo_secuencial:.3f} s ({tiempo_secuencial / tiempo:.2f}x); "
+              f"{'mismo resultado' if iguales else 'RESULTADO DISTINTO'}")
+        if not iguales:
+            return 1
+    if opciones.salida:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if not resultado.guardar_codigo_archivo(opciones.salida):
+                print(f"No se pudo escribir {opciones.salida}", file=sys.stderr)
+                return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,57 +1,438 @@
+import contextlib
+import mmap
+import os
 import re
+import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from heapq import heappop, heappush
+from itertools import accumulate, chain, islice
+from operator import itemgetter
+
+#Codigos enteros de los tipos de token: el parser compara enteros, no cadenas
+TIPOS_TOKEN = ('IDENTIFICADOR', 'ENTERO', 'REAL',
+               'being', 'end', 'entero', 'real', 'if', 'else', 'while', 'endwhile',
+               '(', ')', ',', ';', ':=', '=', '<=', '>=', '<>', '<', '>', '+', '-', '*', '/',
+               'and', 'or', 'not')
+CODIGO_TIPO = {tipo: codigo for codigo, tipo in enumerate(TIPOS_TOKEN)}
+(T_IDENTIFICADOR, T_ENTERO, T_REAL,
+ T_BEING, T_END, T_TIPO_ENTERO, T_TIPO_REAL, T_IF, T_ELSE, T_WHILE, T_ENDWHILE,
+ T_PAR_IZQ, T_PAR_DER, T_COMA, T_PUNTO_COMA, T_ASIGNACION, T_IGUAL, T_MENOR_IGUAL,
+ T_MAYOR_IGUAL, T_DIFERENTE, T_MENOR, T_MAYOR, T_MAS, T_MENOS, T_POR, T_ENTRE,
+ T_AND, T_OR, T_NOT) = range(len(TIPOS_TOKEN))
+T_FIN = len(TIPOS_TOKEN)  #Ya no quedan tokens
+
+#Despacho en un paso del token actual a su operador
+OPERADORES_COMPARACION = {T_IGUAL: '=', T_MENOR_IGUAL: '<=', T_MAYOR_IGUAL: '>=',
+                          T_DIFERENTE: '<>', T_MENOR: '<', T_MAYOR: '>'}
+#Comparacion contraria: if<op> salta cuando op es falsa, asi que para saltar
+#cuando es verdadera se emite if<contraria>
+COMPARACION_CONTRARIA = {'=': '<>', '<>': '=', '<': '>=', '>=': '<', '>': '<=', '<=': '>'}
+#Conectores de las condiciones: token -> (conector, potencia); not liga mas que
+#and y and mas que or
+CONECTORES_LOGICOS = {T_OR: ('or', 10), T_AND: ('and', 20)}
+
+#Operadores de las expresiones aritmeticas: token -> (operador, potencia). El de
+#mayor potencia liga mas fuerte y todos asocian a la izquierda. Un operador nuevo
+#es un renglon mas (con su token en el lexer y su operacion en los cuadruplos)
+OPERADORES_BINARIOS = {T_MAS: ('+', 10), T_MENOS: ('-', 10), T_POR: ('*', 20), T_ENTRE: ('/', 20)}
+#Prefijos: token -> (operador, potencia, neutro); 'op x' se genera como (op, neutro, x),
+#asi no hace falta otra operacion. Ninguno por defecto; el menos unario seria
+#{T_MENOS: ('-', 30, '0')}
+OPERADORES_PREFIJOS = {}
+
+#Recuperacion en modo panico: tras un error se descartan tokens hasta uno de estos
+SINCRONIZACION = frozenset((T_PUNTO_COMA, T_END, T_ENDWHILE, T_ELSE, T_FIN))
+SINCRONIZACION_DECLARACION = frozenset((T_PUNTO_COMA, T_TIPO_ENTERO, T_TIPO_REAL, T_FIN))
+SINCRONIZACION_ENCABEZADO = SINCRONIZACION | {T_PAR_DER}
+#Tokens con los que empieza una orden (o que la separan de la anterior)
+INICIO_ORDEN = frozenset((T_IDENTIFICADOR, T_IF, T_WHILE, T_PUNTO_COMA))
+
+EXTENSION_BINARIA = '.3db'
+
+#Codigos de operacion de los cuadruplos
+OPERACIONES = (':=', '+', '-', '*', '/', 'goto', 'label',
+               'if=', 'if<=', 'if>=', 'if<>', 'if<', 'if>')
+#Las del codigo tipado (ver semantica.py): cada una con sufijo e (entero) o r
+#(real), y la conversion ('real', a, None, r)
+OPERACIONES_TIPADAS = tuple(op + sufijo for op in OPERACIONES if op != 'goto' and op != 'label'
+                            for sufijo in 'er') + ('real',)
+OPERACIONES += OPERACIONES_TIPADAS
+CODIGO_OPERACION = {op: codigo for codigo, op in enumerate(OPERACIONES)}
+
+class TablaCuadruplos(Sequence):
+    """Cuadruplos guardados en columnas paralelas de array: codigo de operacion
+    (1 byte) y tres indices (4 bytes cada uno) a la tabla de operandos, donde cada
+    nombre, temporal o constante se guarda una sola vez (el indice 0 es None).
+    Desde fuera se lee como una secuencia de solo lectura de tuplas
+    (op, arg1, arg2, resultado)"""
+    def __init__(self, cuadruplos=()):
+        self.ops = array('B')
+        self.args1 = array('I')
+        self.args2 = array('I')
+        self.resultados = array('I')
+        self.operandos = [None]
+        self.indices_operando = {None: 0}
+        for cuadruplo in cuadruplos:
+            self.agregar(*cuadruplo)
+    
+    def indice_operando(self, operando):
+        """Indice del operando en la tabla de operandos (lo agrega si es nuevo)"""
+        indice = self.indices_operando.get(operando)
+        if indice is None:
+            indice = self.indices_operando[operando] = len(self.operandos)
+            self.operandos.append(operando)
+        return indice
+    
+    def agregar(self, op, arg1, arg2, resultado):
+        self.ops.append(CODIGO_OPERACION[op])
+        self.args1.append(self.indice_operando(arg1))
+        self.args2.append(self.indice_operando(arg2))
+        self.resultados.append(self.indice_operando(resultado))
+    
+    def completar(self, indices, resultado):
+        """Pone resultado (una etiqueta) como destino de los saltos en indices"""
+        indice = self.indice_operando(resultado)
+        for i in indices:
+            self.resultados[i] = indice
+    
+    def __len__(self):
+        return len(self.ops)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self.ops)))]
+        operandos = self.operandos
+        return (OPERACIONES[self.ops[i]], operandos[self.args1[i]],
+                operandos[self.args2[i]], operandos[self.resultados[i]])
+    
+    def __iter__(self):
+        operandos = self.operandos
+        for op, arg1, arg2, resultado in zip(self.ops, self.args1, self.args2, self.resultados):
+            yield (OPERACIONES[op], operandos[arg1], operandos[arg2], operandos[resultado])
+    
+    def __repr__(self):
+        return f"TablaCuadruplos({list(self)!r})"
+    
+    def texto(self, inicio=0, fin=None):
+        """Renglones 'i: (op, arg1, arg2, resultado)' en una sola cadena, de inicio
+        a fin (todos por defecto). Cada operando se formatea una vez, no una vez por
+        cuadruplo que lo usa; para una pagina solo se formatean los que aparecen"""
+        inicio, fin, _ = slice(inicio, fin).indices(len(self.ops))
+        if inicio >= fin:
+            return ""
+        if fin - inicio == len(self.ops):
+            columnas = (self.ops, self.args1, self.args2, self.resultados)
+            citados = [f"'{operando}'" if operando is not None else "None" for operando in self.operandos]
+            ancho8 = [f"{citado:8}" for citado in citados]
+            ancho10 = [f"{citado:10}" for citado in citados]
+        else:
+            columnas = (self.ops[inicio:fin], self.args1[inicio:fin], self.args2[inicio:fin],
+                        self.resultados[inicio:fin])
+            ancho8 = {}
+            ancho10 = {}
+            for indice in set(columnas[1]) | set(columnas[2]) | set(columnas[3]):
+                operando = self.operandos[indice]
+                citado = f"'{operando}'" if operando is not None else "None"
+                ancho8[indice] = f"{citado:8}"
+                ancho10[indice] = f"{citado:10}"
+        nombres = [f"{op:4}" for op in OPERACIONES]
+        return "\n".join([f"{i:3d}: ({nombres[op]}, {ancho8[arg1]}, {ancho8[arg2]}, {ancho10[resultado]})"
+                          for i, (op, arg1, arg2, resultado)
+                          in enumerate(zip(*columnas), inicio)]) + "\n"
+
+class Simbolo:
+    """Entrada de la tabla de simbolos"""
+    __slots__ = ('nombre', 'tipo')
+    
+    def __init__(self, nombre, tipo):
+        self.nombre = nombre
+        self.tipo = tipo
+    
+    def __eq__(self, otro):
+        return isinstance(otro, Simbolo) and (self.nombre, self.tipo) == (otro.nombre, otro.tipo)
+    
+    def __repr__(self):
+        return f"Simbolo({self.nombre!r}, {self.tipo!r})"
 
 class Parser3Direcciones:
-    def __init__(self, tokens):
+    NOMBRE = None  #Motor que se nombra en los mensajes del menu
+    
+    def __init__(self, tokens, posiciones=None, reutilizar_temporales=False, recuperar_errores=True):
+        #tokens puede ser TokensCompactos, una lista de tuplas o cualquier iterable de
+        #tuplas (p. ej. LexerArchivo); el parser solo conserva el token actual
         self.tokens = tokens
-        self.pos = 0
-        self.current_token = tokens[0] if tokens else None
+        self.posiciones = posiciones  #Lista paralela (linea, columna_inicio, columna_fin) opcional
+        if isinstance(tokens, TokensCompactos):
+            self._compactos = tokens
+            self._tipos = iter(tokens.tipos)
+            self._ids_lexema = tokens.ids_lexema
+            self._lexemas = tokens.lexemas
+        else:
+            self._compactos = None
+            self._token = None
+            self._tipos = self._codigos(tokens)
+        self.pos = -1
+        self.get_next_token()
         self.errores = []
+        #Con recuperacion, un error se anota y el analisis sigue desde el siguiente
+        #token de sincronizacion; sin ella, el primer error termina el analisis.
+        #En ambos casos no se genera codigo despues del primer error
+        self.recuperar_errores = recuperar_errores
         
         #Para generacion de codigo de 3 direcciones
-        self.cuadruplos = []  #Lista de cuadruplos: (op, arg1, arg2, resultado)
-        self.contador_temp = 0
+        self.cuadruplos = TablaCuadruplos()  #Cuadruplos: (op, arg1, arg2, resultado)
+        self.contador_temp = 0  #Las temporales t0..tN-1 solo se cuentan, no van en la tabla
+        #Una temporal muere al consumirse su valor; si se reutilizan, la siguiente
+        #temporal toma la libre de numero mas bajo
+        self.reutilizar_temporales = reutilizar_temporales
+        self.temporales_vivas = {}  #Nombre -> numero
+        self.temporales_libres = []  #Heap de numeros libres
+        self.temporales_pedidas = 0
+        self.max_temporales_vivas = 0
         self.contador_etiqueta = 0
-        self.tabla_simbolos = {}  #Para almacenar informacion de variables
+        self.max_anidamiento = 0  #Mayor numero de if/while abiertos a la vez
+        self.tabla_simbolos = {}  #Nombre de variable -> Simbolo
+        self.ganchos = []  #Ver agregar_gancho
+        self.parentesis_abiertos = 0  #De la condicion que se analiza (para recuperarse)
+    
+    def _codigos(self, tokens):
+        """Convierte tokens (tipo, valor) a codigos enteros conforme se consumen"""
+        codigo_tipo = CODIGO_TIPO
+        for token in tokens:
+            self._token = token
+            yield codigo_tipo[token[0]]
     
     def get_next_token(self):
         self.pos += 1
-        if self.pos < len(self.tokens):
-            self.current_token = self.tokens[self.pos]
-        else:
-            self.current_token = None
+        self.tipo_actual = next(self._tipos, T_FIN)
+    
+    def valor_actual(self):
+        """Lexema del token actual"""
+        if self._compactos is None:
+            return self._token[1]
+        return self._lexemas[self._ids_lexema[self.pos]]
+    
+    @property
+    def current_token(self):
+        """Token actual como tupla (tipo, valor), o None al terminar la entrada"""
+        if self.tipo_actual == T_FIN:
+            return None
+        return (TIPOS_TOKEN[self.tipo_actual], self.valor_actual())
     
     def match(self, expected_type):
-        if self.current_token and self.current_token[0] == expected_type:
+        if self.tipo_actual == expected_type:
             self.get_next_token()
             return True
         return False
     
     def error(self, message):
-        error_msg = f"Error en posicion {self.pos}: {message}"
+        raise SyntaxError(self.reportar(message))
+    
+    def reportar(self, message, pos=None):
+        """Anota un error con su linea y columna y regresa el mensaje. El error es
+        en el token actual o en el de posicion pos"""
+        if pos is None:
+            pos = self.pos
+        if self.posiciones is None and self._compactos is not None:
+            #Las posiciones de los tokens compactos se calculan hasta que hay un error
+            self.posiciones = self._compactos.posiciones
+        if self.posiciones:
+            #Al final de la entrada el error se ubica en el ultimo token
+            linea, columna, _ = self.posiciones[min(pos, len(self.posiciones) - 1)]
+            error_msg = f"Error en posicion {pos} (linea {linea}, columna {columna}): {message}"
+        else:
+            error_msg = f"Error en posicion {pos}: {message}"
         self.errores.append(error_msg)
-        raise SyntaxError(error_msg)
+        return error_msg
+    
+    def sincronizar(self, tipos=SINCRONIZACION):
+        """Modo panico: descarta tokens hasta uno de tipos (o el fin de la entrada).
+        Cada token se descarta una sola vez, asi que recuperarse es lineal"""
+        while self.tipo_actual not in tipos:
+            self.get_next_token()
     
     def nueva_temporal(self):
         """Genera un nuevo nombre de variable temporal"""
-        temp = f"t{self.contador_temp}"
-        self.contador_temp += 1
-        #Registrar la temporal en tabla de simbolos
-        self.tabla_simbolos[temp] = {'tipo': 'temporal'}
+        self.temporales_pedidas += 1
+        if self.temporales_libres:
+            numero = heappop(self.temporales_libres)
+        else:
+            numero = self.contador_temp
+            self.contador_temp += 1
+        temp = f"t{numero}"
+        self.temporales_vivas[temp] = numero
+        if len(self.temporales_vivas) > self.max_temporales_vivas:
+            self.max_temporales_vivas = len(self.temporales_vivas)
         return temp
     
+    def liberar_temporal(self, operando):
+        """Marca como muerta la temporal cuyo valor se acaba de consumir"""
+        numero = self.temporales_vivas.pop(operando, None)
+        if numero is not None and self.reutilizar_temporales:
+            heappush(self.temporales_libres, numero)
+    
+    def temporales(self):
+        """Nombres de las temporales generadas"""
+        return [f"t{i}" for i in range(self.contador_temp)]
+    
     def nueva_etiqueta(self):
         """Genera una nueva etiqueta"""
         etiqueta = f"L{self.contador_etiqueta}"
         self.contador_etiqueta += 1
         return etiqueta
     
+    #Metodos que avisan a los ganchos al entrar y salir
+    PRODUCCIONES = ('programa', 'declaraciones', 'declaracion', 'tipo', 'lista_variables',
+                    'lista_variablesR', 'identificador', 'ordenes', 'condicion', 'else_opt',
+                    'fin_condicion', 'condicion_logica', 'comparacion', 'condicion_op', 'operador',
+                    'numeros', 'bucle_while', 'fin_bucle_while', 'asignar', 'expresion_arit', 'factor')
+    
+    def agregar_gancho(self, gancho):
+        """Registra un objeto con metodos entrada(produccion) y salida(produccion)
+        que se llaman al entrar y salir de cada produccion (la salida tambien si hay
+        error). Los metodos solo se envuelven mientras haya ganchos, asi que sin
+        ellos el parser no paga nada"""
+        if not self.ganchos:
+            self._envolver_producciones()
+        self.ganchos.append(gancho)
+    
+    def quitar_gancho(self, gancho):
+        self.ganchos.remove(gancho)
+        if not self.ganchos:
+            self._desenvolver_producciones()
+    
+    def _envolver_producciones(self):
+        #Atributos de la instancia que tapan a los metodos de la clase
+        ganchos = self.ganchos
+        for nombre in self.PRODUCCIONES:
+            setattr(self, nombre, self._envolver(nombre, getattr(self, nombre), ganchos))
+    
+    def _desenvolver_producciones(self):
+        for nombre in self.PRODUCCIONES:
+            self.__dict__.pop(nombre, None)
+    
+    @staticmethod
+    def _envolver(nombre, metodo, ganchos):
+        def envuelto(*argumentos):
+            for gancho in ganchos:
+                gancho.entrada(nombre)
+            try:
+                return metodo(*argumentos)
+            finally:
+                for gancho in reversed(ganchos):
+                    gancho.salida(nombre)
+        return envuelto
+    
     def agregar_cuadruplo(self, op, arg1, arg2, resultado):
-        """Agrega un cuadruplo al codigo intermedio"""
-        cuadruplo = (op, arg1, arg2, resultado)
-        self.cuadruplos.append(cuadruplo)
+        """Agrega un cuadruplo al codigo intermedio (si aun no hay errores)"""
+        if not self.errores:
+            self.cuadruplos.agregar(op, arg1, arg2, resultado)
+    
+    def optimizar(self, **pasadas):
+        """Optimiza localmente los cuadruplos ya generados (ver optimizador.py);
+        las pasadas se desactivan por nombre, p. ej. optimizar(copias=False)"""
+        from optimizador import Optimizador
+        reales = [nombre for nombre, simbolo in self.tabla_simbolos.items() if simbolo.tipo == 'real']
+        optimizador = Optimizador(variables=self.tabla_simbolos, reales=reales, **pasadas)
+        self.cuadruplos = TablaCuadruplos(optimizador.optimizar(self.cuadruplos))
+        return optimizador
+    
+    def optimizar_ciclos(self, **opciones):
+        """Saca el codigo invariante de los while y reduce la fuerza de sus
+        variables de induccion (ver ciclos.py); conviene volver a optimizar
+        localmente despues para limpiar las copias que quedan"""
+        from ciclos import OptimizadorCiclos
+        optimizador = OptimizadorCiclos(tabla_simbolos=self.tabla_simbolos, **opciones)
+        self.cuadruplos = TablaCuadruplos(optimizador.optimizar(self.cuadruplos))
+        return optimizador
+    
+    def verificar_tipos(self):
+        """Analisis semantico de los cuadruplos sin optimizar (ver semantica.py):
+        anota como errores las variables no declaradas, las declaradas con nombre
+        de temporal (t0, t1...) y las asignaciones de un real a una variable
+        entera. Regresa True si no hay errores"""
+        from semantica import verificar
+        temporales = set(self.temporales()).difference(self._identificadores_temporales())
+        for mensaje, nombre, asignacion in verificar(self.cuadruplos, self.tabla_simbolos, temporales):
+            pos = self.ubicar(nombre, asignacion)
+            if pos is None:
+                self.errores.append(f"Error semantico: {mensaje}")
+            else:
+                self.reportar(mensaje, pos)
+        return not self.errores
+    
+    def _identificadores_temporales(self):
+        """Identificadores del programa con forma de temporal (t0, t1...): no son
+        temporales aunque el parser haya generado una con el mismo nombre. Con
+        tokens compactos basta revisar los lexemas distintos; con tokens de flujo
+        ya no se puede (vacio)"""
+        from optimizador import es_temporal
+        if self._compactos is not None:
+            return {lexema for lexema in self._compactos.lexemas if es_temporal(lexema)}
+        if not isinstance(self.tokens, (list, tuple)):
+            return set()
+        return {valor for tipo, valor in self.tokens if tipo == 'IDENTIFICADOR' and es_temporal(valor)}
+    
+    def ubicar(self, nombre, asignacion=None):
+        """Posicion del token del identificador nombre: su primera aparicion o, si
+        se da asignacion, la de su asignacion numero asignacion. Solo se busca al
+        reportar un error; con tokens de flujo ya no se puede (None)"""
+        tokens = self._compactos if self._compactos is not None else self.tokens
+        if not isinstance(tokens, (TokensCompactos, list, tuple)):
+            return None
+        cuenta = 0
+        for i in range(len(tokens)):
+            tipo, valor = tokens[i]
+            if tipo == 'IDENTIFICADOR' and valor == nombre:
+                if asignacion is None:
+                    return i
+                if i + 1 < len(tokens) and tokens[i + 1][0] == ':=':
+                    cuenta += 1
+                    if cuenta == asignacion:
+                        return i
+        return None
+    
+    def tipar(self):
+        """Codigo con operaciones tipadas de los cuadruplos actuales (ver
+        semantica.CodigoTipado), ya verificados con verificar_tipos()"""
+        from semantica import CodigoTipado
+        return CodigoTipado(self.cuadruplos, self.tabla_simbolos)
+    
+    def ejecutar(self, valores=None, max_pasos=None, perfil=False):
+        """Ejecuta el codigo tipado en la maquina virtual (ver maquina.py) y la
+        devuelve con el estado final, las instrucciones ejecutadas y el tiempo.
+        Todos los backends ejecutan el codigo tipado: una sola semantica"""
+        from maquina import MaquinaVirtual
+        maquina = MaquinaVirtual(self.tipar().cuadruplos, self.tabla_simbolos)
+        maquina.ejecutar(valores, max_pasos, perfil)
+        return maquina
     
-    def mostrar_codigo_intermedio(self):
-        """Muestra el codigo de 3 direcciones generado de forma organizada"""
+    def compilar_python(self, estructurado=True):
+        """Traduce el codigo tipado a una funcion de Python compilada (ver
+        generador_python.py); se ejecuta con .ejecutar(valores)"""
+        from generador_python import ProgramaPython
+        return ProgramaPython(self.tipar().cuadruplos, self.tabla_simbolos, estructurado)
+    
+    def asignar_registros(self, registros=8):
+        """Asigna registros a temporales y variables del codigo tipado con barrido
+        lineal (ver registros.py); los que no caben se derraman a memoria"""
+        from registros import AsignacionRegistros
+        return AsignacionRegistros(self.tipar().cuadruplos, self.tabla_simbolos, registros)
+    
+    def simplificar_flujo(self):
+        """Reconstruye los cuadruplos desde su grafo de flujo (ver grafo_flujo.py):
+        encadena saltos, quita gotos al siguiente, fusiona bloques, elimina
+        bloques inalcanzables y renumera las etiquetas"""
+        from grafo_flujo import GrafoFlujo
+        grafo = GrafoFlujo(self.cuadruplos).simplificar()
+        self.cuadruplos = TablaCuadruplos(grafo.cuadruplos())
+        return grafo
+    
+    def mostrar_codigo_intermedio(self, limite=None):
+        """Muestra el codigo de 3 direcciones generado de forma organizada
+        (solo los primeros limite cuadruplos, si se da)"""
         print("\n" + "\033[95mCODIGO DE 3 DIRECCIONES GENERADO\033[0m")
         print("=" * 60)
         
@@ -59,70 +440,76 @@ class Parser3Direcciones:
             print("No se genero codigo de 3 direcciones")
             return
         
-        for i, cuadruplo in enumerate(self.cuadruplos):
-            op, arg1, arg2, resultado = cuadruplo
-            
-            #Formatear para mejor visualizacion
-            arg1_str = f"'{arg1}'" if arg1 is not None else "None"
-            arg2_str = f"'{arg2}'" if arg2 is not None else "None"
-            resultado_str = f"'{resultado}'" if resultado is not None else "None"
-            
-            print(f"{i:3d}: ({op:4}, {arg1_str:8}, {arg2_str:8}, {resultado_str:10})")
+        total = len(self.cuadruplos)
+        if limite is None or total <= limite:
+            print(self.texto_cuadruplos(), end="")
+        else:
+            print(self.texto_cuadruplos(0, limite), end="")
+            print(f"... ({total - limite} cuadruplos mas)")
     
-    def mostrar_tabla_simbolos(self):
+    def texto_cuadruplos(self, inicio=0, fin=None):
+        """Cuadruplos formateados, un renglon por cuadruplo (de inicio a fin)"""
+        cuadruplos = self.cuadruplos
+        if not isinstance(cuadruplos, TablaCuadruplos):
+            cuadruplos = TablaCuadruplos(cuadruplos)
+        return cuadruplos.texto(inicio, fin)
+    
+    def mostrar_tabla_simbolos(self, limite=None):
         """Muestra la tabla de simbolos"""
-        print("-" * 60)
-        print("\n\033[95mTABLA DE SIMBOLOS\033[0m")
-        print("=" * 60)
-        print(f"{'Variable':<12} | {'Tipo':<10}")
-        print("-" * 60)
+        print(self.texto_tabla_simbolos(limite), end="")
+    
+    def texto_tabla_simbolos(self, limite=None):
+        """Tabla de simbolos como se muestra en pantalla; con limite solo salen
+        las primeras limite variables y temporales"""
+        renglones = ["-" * 60, "\n\033[95mTABLA DE SIMBOLOS\033[0m", "=" * 60,
+                     f"{'Variable':<12} | {'Tipo':<10}", "-" * 60]
         
         #Mostrar variables primero, luego temporales
-        variables = {k: v for k, v in self.tabla_simbolos.items() if v['tipo'] != 'temporal'}
-        temporales = {k: v for k, v in self.tabla_simbolos.items() if v['tipo'] == 'temporal'}
-        
-        for simbolo, info in variables.items():
-            print(f"{simbolo:<12} | {info['tipo']:<10}")
+        simbolos = self.tabla_simbolos.items()
+        if limite is not None and len(simbolos) > limite:
+            simbolos = islice(simbolos, limite)
+        renglones.extend(f"{simbolo:<12} | {info.tipo:<10}" for simbolo, info in simbolos)
+        if limite is not None and len(self.tabla_simbolos) > limite:
+            renglones.append(f"... ({len(self.tabla_simbolos) - limite} variables mas)")
         
-        if temporales:
-            print("-" * 60)
-            print("TEMPORALES:")
-            for temp, info in temporales.items():
-                print(f"{temp:<12} | {info['tipo']:<10}")
+        if self.contador_temp:
+            renglones.append("-" * 60)
+            renglones.append("TEMPORALES:")
+            mostradas = self.contador_temp if limite is None else min(limite, self.contador_temp)
+            renglones.extend(f"{f't{i}':<12} | {'temporal':<10}" for i in range(mostradas))
+            if mostradas < self.contador_temp:
+                renglones.append(f"... ({self.contador_temp - mostradas} temporales mas)")
+            renglones.append("-" * 60)
+            renglones.append(f"Temporales: {self.temporales_pedidas} generadas, {self.contador_temp} nombres distintos, "
+                             f"maximo {self.max_temporales_vivas} vivas a la vez")
+        return "\n".join(renglones) + "\n"
     
     def guardar_codigo_archivo(self, nombre_archivo="codigo_3direcciones.txt"):
-        """Guarda el codigo de 3 direcciones en un archivo"""
+        """Guarda el codigo de 3 direcciones en un archivo. Todo el texto se arma
+        en memoria y se escribe de una vez; si el nombre termina en .3db se guarda
+        en el formato binario de formato_binario.py"""
+        if nombre_archivo.endswith(EXTENSION_BINARIA):
+            return self.guardar_codigo_binario(nombre_archivo)
+        partes = ["CODIGO DE 3 DIRECCIONES GENERADO\n", "=" * 60 + "\n\n", self.texto_cuadruplos()]
+        
+        #Agregar tabla de simbolos al archivo
+        partes.append("\n" + "=" * 60 + "\n")
+        partes.append("TABLA DE SIMBOLOS\n")
+        partes.append("=" * 60 + "\n")
+        partes.append(f"{'Variable':<12} | {'Tipo':<10}\n")
+        partes.append("-" * 60 + "\n")
+        partes.extend([f"{simbolo:<12} | {info.tipo:<10}\n" for simbolo, info in self.tabla_simbolos.items()])
+        
+        if self.contador_temp:
+            partes.append("-" * 60 + "\n")
+            partes.append("TEMPORALES:\n")
+            partes.extend([f"{temp:<12} | {'temporal':<10}\n" for temp in self.temporales()])
+            partes.append("-" * 60 + "\n")
+            partes.append(f"Temporales: {self.temporales_pedidas} generadas, {self.contador_temp} nombres distintos, "
+                          f"maximo {self.max_temporales_vivas} vivas a la vez\n")
         try:
             with open(nombre_archivo, 'w', encoding='utf-8') as f:
-                f.write("CODIGO DE 3 DIRECCIONES GENERADO\n")
-                f.write("=" * 60 + "\n\n")
-                
-                for i, cuadruplo in enumerate(self.cuadruplos):
-                    op, arg1, arg2, resultado = cuadruplo
-                    arg1_str = f"'{arg1}'" if arg1 is not None else "None"
-                    arg2_str = f"'{arg2}'" if arg2 is not None else "None"
-                    resultado_str = f"'{resultado}'" if resultado is not None else "None"
-                    
-                    f.write(f"{i:3d}: ({op:4}, {arg1_str:8}, {arg2_str:8}, {resultado_str:10})\n")
-                
-                #Agregar tabla de simbolos al archivo
-                f.write("\n" + "=" * 60 + "\n")
-                f.write("TABLA DE SIMBOLOS\n")
-                f.write("=" * 60 + "\n")
-                f.write(f"{'Variable':<12} | {'Tipo':<10}\n")
-                f.write("-" * 60 + "\n")
-                
-                variables = {k: v for k, v in self.tabla_simbolos.items() if v['tipo'] != 'temporal'}
-                temporales = {k: v for k, v in self.tabla_simbolos.items() if v['tipo'] == 'temporal'}
-                
-                for simbolo, info in variables.items():
-                    f.write(f"{simbolo:<12} | {info['tipo']:<10}\n")
-                
-                if temporales:
-                    f.write("-" * 60 + "\n")
-                    f.write("TEMPORALES:\n")
-                    for temp, info in temporales.items():
-                        f.write(f"{temp:<12} | {info['tipo']:<10}\n")
+                f.write("".join(partes))
             
             print(f"Codigo guardado en: {nombre_archivo}")
             return True
@@ -130,34 +517,84 @@ class Parser3Direcciones:
             print(f"Error al guardar archivo: {e}")
             return False
 
+    def guardar_codigo_binario(self, nombre_archivo="codigo_3direcciones.3db"):
+        """Guarda cuadruplos y tabla de simbolos en el formato binario que
+        CodigoBinario (formato_binario.py) carga con mmap"""
+        from formato_binario import guardar_binario
+        try:
+            guardar_binario(nombre_archivo, self.cuadruplos, self.tabla_simbolos, self.contador_temp)
+            print(f"Codigo guardado en: {nombre_archivo}")
+            return True
+        except OSError as e:
+            print(f"Error al guardar archivo: {e}")
+            return False
+    
     #<programa> → being <declaraciones><ordenes> end
+    #No escribe nada: los mensajes del menu los pone analizar_con_mensajes()
     def programa(self):
         try:
-            print("-" * 60)
-            print("\n\033[93mIniciando analisis sintactico...\033[0m\n")
-            
-            if not self.match('being'):
-                self.error("Se esperaba 'being' al inicio del programa")
+            if not self.match(T_BEING):
+                self.falta("Se esperaba 'being' al inicio del programa")
             
             self.declaraciones()
             self.ordenes()
             
-            if not self.match('end'):
-                self.error("Se esperaba 'end' al final del programa")
+            while not self.match(T_END):
+                self.falta("Se esperaba 'end' al final del programa")
+                if self.tipo_actual == T_FIN:
+                    break
+                #Un cierre o separador que no corresponde a nada: se descarta y se sigue
+                self.get_next_token()
+                self.sincronizar()
+                self.match(T_PUNTO_COMA)
+                if self.tipo_actual not in SINCRONIZACION:
+                    self.ordenes()
+            self.fin_programa()
             
-            print("\033[36mAnalisis sintactico completado exitosamente\033[0m\n")
+            if self.errores:
+                return False, self.errores
             return True, self.errores
             
         except SyntaxError:
             return False, self.errores
     
+    def fin_programa(self):
+        """Tras el end del programa solo puede seguir el fin de la entrada. Lo que
+        sobre se reporta una vez y se analiza como mas ordenes para reportar sus
+        errores; los cierres y separadores sueltos se descartan"""
+        if self.tipo_actual == T_FIN:
+            return
+        self.falta("Se esperaba el fin del programa después de 'end'")
+        while self.tipo_actual != T_FIN:
+            if self.tipo_actual not in INICIO_ORDEN:
+                self.get_next_token()
+                self.sincronizar()
+            self.match(T_PUNTO_COMA)
+            if self.tipo_actual not in SINCRONIZACION:
+                self.ordenes_sobrantes()
+    
+    def ordenes_sobrantes(self):
+        self.ordenes()
+    
+    def falta(self, message):
+        """Error sin token que descartar: con recuperacion solo se anota"""
+        if not self.recuperar_errores:
+            self.error(message)
+        self.reportar(message)
+    
     #<declaraciones> → <declaracion>;<declaraciones> | ε
+    #La recursion por la derecha se recorre como ciclo: una vuelta por declaracion
     def declaraciones(self):
-        if self.current_token and self.current_token[0] in ['entero', 'real']:
-            self.declaracion()
-            if not self.match(';'):
-                self.error("Se esperaba ';' después de declaracion")
-            self.declaraciones()
+        while self.tipo_actual == T_TIPO_ENTERO or self.tipo_actual == T_TIPO_REAL:
+            try:
+                self.declaracion()
+                if not self.match(T_PUNTO_COMA):
+                    self.error("Se esperaba ';' después de declaracion")
+            except SyntaxError:
+                if not self.recuperar_errores:
+                    raise
+                self.sincronizar(SINCRONIZACION_DECLARACION)
+                self.match(T_PUNTO_COMA)
     
     #<declaracion> → <tipo><lista_variables>
     def declaracion(self):
@@ -166,9 +603,9 @@ class Parser3Direcciones:
     
     #<tipo> → entero | real
     def tipo(self):
-        if self.match('entero'):
+        if self.match(T_TIPO_ENTERO):
             return 'entero'
-        elif self.match('real'):
+        elif self.match(T_TIPO_REAL):
             return 'real'
         else:
             self.error("Se esperaba 'entero' o 'real'")
@@ -177,89 +614,253 @@ class Parser3Direcciones:
     def lista_variables(self, tipo):
         id_name = self.identificador()
         #Registrar variable en tabla de simbolos
-        self.tabla_simbolos[id_name] = {'tipo': tipo}
+        self.tabla_simbolos[id_name] = Simbolo(id_name, tipo)
         self.lista_variablesR(tipo)
     
     #<lista_variablesR> → ,<identificador><lista_variablesR> | ε
     def lista_variablesR(self, tipo):
-        if self.match(','):
+        while self.match(T_COMA):
             id_name = self.identificador()
             #Registrar variable en tabla de simbolos
-            self.tabla_simbolos[id_name] = {'tipo': tipo}
-            self.lista_variablesR(tipo)
+            self.tabla_simbolos[id_name] = Simbolo(id_name, tipo)
     
     #<identificador> → <letra><resto_letras>
     def identificador(self):
-        if self.current_token and self.current_token[0] == 'IDENTIFICADOR':
-            id_name = self.current_token[1]
-            self.match('IDENTIFICADOR')
+        if self.tipo_actual == T_IDENTIFICADOR:
+            id_name = self.valor_actual()
+            self.get_next_token()
             return id_name
         else:
             self.error("Se esperaba un identificador")
     
     #<ordenes> → <orden><ordenesR>
-    def ordenes(self):
-        self.orden()
-        self.ordenesR()  # Esta es la única llamada a ordenesR necesaria
-
-    def ordenesR(self):
-        # Si hay ; entonces otra orden
-        if self.match(';'):
-            self.orden()
-            self.ordenesR()
-        # Si no hay ; pero viene otra orden, el método orden() se encargará de ello
-        # cuando sea llamado desde ordenes()
-        # ε producción - no hacer nada
-    
+    #<ordenesR> → ;<orden><ordenesR> | ε
     #<orden> → <condicion> | <bucle_while> | <asignar>
-    def orden(self):
-        if self.current_token and self.current_token[0] == 'if':
-            self.condicion()
-        elif self.current_token and self.current_token[0] == 'while':
-            self.bucle_while()
-        else:
-            self.asignar()
+    #Sin recursion: cada if/while que se abre se apila y se cierra cuando su bloque
+    #termina, asi la profundidad de anidamiento solo esta limitada por la memoria
+    #Con recuperacion de errores, un encabezado roto abre su construccion de todos
+    #modos (para que su end/endwhile cierre lo correcto), una orden rota se salta
+    #hasta ';', end, endwhile o else, y un cierre equivocado se toma como el cierre
+    #de la construccion abierta. Cada error descarta tokens o cierra una construccion
+    def ordenes(self):
+        pila = []  #Construcciones abiertas: ('if', etiqueta_else) | ('else', etiqueta_fin) | ('while', etiqueta_inicio, etiqueta_fin)
+        while True:
+            inicio = self.tipo_actual
+            try:
+                if inicio == T_IF or inicio == T_WHILE:
+                    if inicio == T_IF:
+                        pila.append(('if', self.condicion()))
+                    else:
+                        pila.append(('while',) + self.bucle_while())
+                    if len(pila) > self.max_anidamiento:
+                        self.max_anidamiento = len(pila)
+                    continue
+                self.asignar()
+            except SyntaxError:
+                if not self.recuperar_errores:
+                    raise
+                if inicio == T_IF or inicio == T_WHILE:
+                    if inicio == T_IF:
+                        pila.append(('if', self.nueva_etiqueta()))
+                    else:
+                        pila.append(('while', self.nueva_etiqueta(), self.nueva_etiqueta()))
+                    if len(pila) > self.max_anidamiento:
+                        self.max_anidamiento = len(pila)
+                    self.sincronizar_encabezado()
+                    if self.match(T_PAR_DER):
+                        continue
+                else:
+                    self.sincronizar()
+            
+            #Sin ';' el bloque actual termina: se cierra la construccion que lo contiene
+            while not self.match(T_PUNTO_COMA):
+                if not pila:
+                    return
+                abierta = pila.pop()
+                try:
+                    if abierta[0] == 'if':
+                        etiqueta_fin = self.else_opt(abierta[1])
+                        if etiqueta_fin is not None:
+                            pila.append(('else', etiqueta_fin))
+                            break
+                        self.fin_condicion(None)
+                    elif abierta[0] == 'else':
+                        self.fin_condicion(abierta[1])
+                    else:
+                        self.fin_bucle_while(abierta[1], abierta[2])
+                except SyntaxError:
+                    if not self.recuperar_errores:
+                        raise
+                    if self.tipo_actual == T_END or self.tipo_actual == T_ENDWHILE:
+                        self.get_next_token()
+                    else:
+                        self.sincronizar()
     
-    #<condicion> → if(<comparacion>)<ordenes><else_opt>end
+    #<condicion> → if(<condicion_logica>)<ordenes><else_opt>end
+    #Analiza el encabezado y regresa etiqueta_else; ordenes() analiza el resto
     def condicion(self):
-        if not self.match('if'):
+        if not self.match(T_IF):
             self.error("Se esperaba 'if'")
         
-        if not self.match('('):
+        if not self.match(T_PAR_IZQ):
             self.error("Se esperaba '(' después de if")
         
-        #Generar codigo para comparacion
-        op1, operador_comp, op2 = self.comparacion()
+        condicion = self.condicion_logica()
         
-        if not self.match(')'):
+        if not self.match(T_PAR_DER):
             self.error("Se esperaba ')' después de comparacion")
         
-        #Generar etiquetas para el flujo de control
+        #Si la condicion es falsa se salta al else (o al final si no hay else)
+        falsos = self.saltar_si_falsa(condicion)
         etiqueta_else = self.nueva_etiqueta()
-        etiqueta_fin = self.nueva_etiqueta()
-        
-        #Generar salto condicional (si la condicion es falsa, saltar a else)
-        self.agregar_cuadruplo(f'if{operador_comp}', op1, op2, etiqueta_else)
-        
-        #Codigo para el then
-        self.ordenes()
+        self.parchar(falsos, etiqueta_else)
+        return etiqueta_else
+    
+    #<else_opt> → else <ordenes> | ε
+    #Se llama al terminar el then. Sin else, la etiqueta del else es el final del
+    #if y no hace falta saltar; con else regresa la etiqueta de fin (sus ordenes siguen)
+    def else_opt(self, etiqueta_else):
+        if not self.match(T_ELSE):
+            self.agregar_cuadruplo('label', None, None, etiqueta_else)
+            return None
         
-        #Salto al final después del then
+        #Salto al final después del then y etiqueta para el else
+        etiqueta_fin = self.nueva_etiqueta()
         self.agregar_cuadruplo('goto', None, None, etiqueta_fin)
-        
-        #Etiqueta para el else
         self.agregar_cuadruplo('label', None, None, etiqueta_else)
+        return etiqueta_fin
+    
+    def fin_condicion(self, etiqueta_fin):
+        #Etiqueta de fin (solo si hubo else)
+        if etiqueta_fin is not None:
+            self.agregar_cuadruplo('label', None, None, etiqueta_fin)
         
-        #Codigo para el else (si existe)
-        self.else_opt()
-        
-        #Etiqueta de fin
-        self.agregar_cuadruplo('label', None, None, etiqueta_fin)
+        if not self.match(T_END):
+            self.error("Se esperaba 'end' al final de if")
     
-    #<else_opt> → else <ordenes> | ε
-    def else_opt(self):
-        if self.match('else'):
-            self.ordenes()
+    def sincronizar_encabezado(self):
+        """Modo panico en un encabezado roto: hasta la ')' que cierra la condicion
+        (contando los parentesis que quedaron abiertos en ella) o un token de
+        sincronizacion de ordenes"""
+        abiertos = self.parentesis_abiertos
+        self.parentesis_abiertos = 0
+        while self.tipo_actual not in SINCRONIZACION_ENCABEZADO or self.tipo_actual == T_PAR_DER and abiertos:
+            if self.tipo_actual == T_PAR_IZQ:
+                abiertos += 1
+            elif self.tipo_actual == T_PAR_DER:
+                abiertos -= 1
+            self.get_next_token()
+    
+    #<condicion_logica> → <termino_logico><condicion_logicaR>
+    #<condicion_logicaR> → or <termino_logico><condicion_logicaR> | ε
+    #<termino_logico> → <factor_logico><termino_logicoR>
+    #<termino_logicoR> → and <factor_logico><termino_logicoR> | ε
+    #<factor_logico> → not <factor_logico> | (<condicion_logica>) | <comparacion>
+    #Por precedencia, como expresion_arit(): la pila guarda los conectores que
+    #esperan su lado derecho, (izquierda, conector, potencia), None por cada '('
+    #y NEGACION por cada not. Regresa la condicion a medio generar (ver saltar_si_falsa)
+    NEGACION = 'not'
+    
+    def condicion_logica(self):
+        pila = []
+        self.parentesis_abiertos = 0
+        while True:
+            while self.tipo_actual == T_PAR_IZQ or self.tipo_actual == T_NOT:
+                if self.tipo_actual == T_PAR_IZQ:
+                    pila.append(None)
+                    self.parentesis_abiertos += 1
+                else:
+                    pila.append(self.NEGACION)
+                self.get_next_token()
+            op1, operador_comp, op2 = self.comparacion()
+            condicion = ([], [], (op1, operador_comp, op2))
+            
+            while True:
+                conector = CONECTORES_LOGICOS.get(self.tipo_actual)
+                potencia = conector[1] if conector is not None else 0
+                while pila:
+                    pendiente = pila[-1]
+                    if pendiente is self.NEGACION:
+                        condicion = self.negar_condicion(condicion)
+                    elif pendiente is None or pendiente[2] < potencia:
+                        break
+                    else:
+                        condicion = self.combinar_condiciones(pendiente[0], condicion)
+                    pila.pop()
+                if conector is not None:
+                    pila.append((self.condicion_antes_de(conector[0], condicion), conector[0], potencia))
+                    self.get_next_token()
+                    break
+                
+                #Termina la condicion (la ')' del if o while la revisa quien llama)
+                if not pila:
+                    return condicion
+                if not self.match(T_PAR_DER):
+                    self.error("Se esperaba ')'")
+                self.parentesis_abiertos -= 1
+                pila.pop()
+    
+    #Generacion de las condiciones con listas de parches (backpatching). Una
+    #condicion a medio generar es (verdaderos, falsos, comparacion): los indices de
+    #los saltos ya emitidos hacia donde la condicion es verdadera o falsa, que aun
+    #no tienen etiqueta, y la ultima comparacion (op1, operador, op2), que no se
+    #emite hasta saber que sigue: antes de 'and' salta si es falsa, antes de 'or'
+    #salta si es verdadera y al final salta si es falsa y cae de largo al cuerpo.
+    #Asi cada comparacion cuesta un solo salto y ninguno va a la instruccion siguiente
+    def saltar_si(self, verdadera, comparacion):
+        """Emite el salto de la comparacion (si es verdadera o si es falsa) sin
+        destino y regresa la lista con su indice para parcharlo"""
+        op1, operador_comp, op2 = comparacion
+        if verdadera:
+            operador_comp = COMPARACION_CONTRARIA[operador_comp]
+        if self.errores:
+            return []
+        self.cuadruplos.agregar(f'if{operador_comp}', op1, op2, None)
+        return [len(self.cuadruplos) - 1]
+    
+    def parchar(self, saltos, etiqueta):
+        """Pone etiqueta como destino de los saltos"""
+        if saltos and not self.errores:
+            self.cuadruplos.completar(saltos, etiqueta)
+    
+    def parchar_aqui(self, saltos):
+        """Los saltos van a lo que se genere despues (con una etiqueta nueva solo si hay saltos)"""
+        if saltos:
+            etiqueta = self.nueva_etiqueta()
+            self.agregar_cuadruplo('label', None, None, etiqueta)
+            self.parchar(saltos, etiqueta)
+    
+    def condicion_antes_de(self, conector, condicion):
+        """Emite la comparacion pendiente antes del lado derecho de and/or; lo que
+        debe evaluar el lado derecho se parcha aqui"""
+        verdaderos, falsos, comparacion = condicion
+        if conector == 'and':
+            falsos.extend(self.saltar_si(False, comparacion))
+            self.parchar_aqui(verdaderos)
+            return [], falsos, None
+        verdaderos.extend(self.saltar_si(True, comparacion))
+        self.parchar_aqui(falsos)
+        return verdaderos, [], None
+    
+    @staticmethod
+    def combinar_condiciones(izquierda, derecha):
+        """izquierda (ya pasada por condicion_antes_de) and/or derecha"""
+        izquierda[0].extend(derecha[0])
+        izquierda[1].extend(derecha[1])
+        return izquierda[0], izquierda[1], derecha[2]
+    
+    @staticmethod
+    def negar_condicion(condicion):
+        verdaderos, falsos, (op1, operador_comp, op2) = condicion
+        return falsos, verdaderos, (op1, COMPARACION_CONTRARIA[operador_comp], op2)
+    
+    def saltar_si_falsa(self, condicion):
+        """Termina la condicion: salta si es falsa y si es verdadera sigue con lo
+        que se genere despues. Regresa los saltos al destino falso"""
+        verdaderos, falsos, comparacion = condicion
+        falsos.extend(self.saltar_si(False, comparacion))
+        self.parchar_aqui(verdaderos)
+        return falsos
     
     #<comparacion> → <operador><condicion_op><operador>
     def comparacion(self):
@@ -270,180 +871,513 @@ class Parser3Direcciones:
     
     #<condicion_op> → = | <= | >= | <> | < | >
     def condicion_op(self):
-        operadores = ['=', '<=', '>=', '<>', '<', '>']
-        for op in operadores:
-            if self.match(op):
-                return op
+        op = OPERADORES_COMPARACION.get(self.tipo_actual)
+        if op is not None:
+            self.get_next_token()
+            return op
         self.error("Se esperaba operador de comparacion (=, <=, >=, <>, <, >)")
     
     #<operador> → <identificador> | <numeros>
     def operador(self):
-        if self.current_token and self.current_token[0] == 'IDENTIFICADOR':
-            return self.identificador()
+        if self.tipo_actual <= T_REAL:
+            valor = self.valor_actual()
+            self.get_next_token()
+            return valor
         else:
             return self.numeros()
     
     #<numeros> → <numero_entero> | <numero_real>
     def numeros(self):
-        if self.current_token and self.current_token[0] == 'ENTERO':
-            valor = self.current_token[1]
-            self.match('ENTERO')
-            return valor
-        elif self.current_token and self.current_token[0] == 'REAL':
-            valor = self.current_token[1]
-            self.match('REAL')
+        if self.tipo_actual == T_ENTERO or self.tipo_actual == T_REAL:
+            valor = self.valor_actual()
+            self.get_next_token()
             return valor
         else:
             self.error("Se esperaba número entero o real")
     
-    #<bucle_while> → while(<comparacion>)<ordenes>endwhile
+    #<bucle_while> → while(<condicion_logica>)<ordenes>endwhile
+    #Analiza el encabezado y regresa (etiqueta_inicio, etiqueta_fin); ordenes() analiza el cuerpo
     def bucle_while(self):
-        if not self.match('while'):
+        if not self.match(T_WHILE):
             self.error("Se esperaba 'while'")
         
-        if not self.match('('):
+        if not self.match(T_PAR_IZQ):
             self.error("Se esperaba '(' después de while")
         
-        #Generar etiquetas para el bucle
-        etiqueta_inicio = self.nueva_etiqueta()
-        etiqueta_fin = self.nueva_etiqueta()
-        
         #Etiqueta de inicio del bucle
+        etiqueta_inicio = self.nueva_etiqueta()
         self.agregar_cuadruplo('label', None, None, etiqueta_inicio)
         
         #Evaluar condicion
-        op1, operador_comp, op2 = self.comparacion()
+        condicion = self.condicion_logica()
         
-        if not self.match(')'):
+        if not self.match(T_PAR_DER):
             self.error("Se esperaba ')' después de comparacion")
         
         #Si condicion es falsa, salir del bucle
-        self.agregar_cuadruplo(f'if{operador_comp}', op1, op2, etiqueta_fin)
-        
-        #Cuerpo del bucle
-        self.ordenes()
-        
+        falsos = self.saltar_si_falsa(condicion)
+        etiqueta_fin = self.nueva_etiqueta()
+        self.parchar(falsos, etiqueta_fin)
+        return etiqueta_inicio, etiqueta_fin
+    
+    def fin_bucle_while(self, etiqueta_inicio, etiqueta_fin):
         #Volver al inicio del bucle
         self.agregar_cuadruplo('goto', None, None, etiqueta_inicio)
         
         #Etiqueta de fin del bucle
         self.agregar_cuadruplo('label', None, None, etiqueta_fin)
+        
+        if not self.match(T_ENDWHILE):
+            self.error("Se esperaba 'endwhile' al final de while")
     
     #<asignar> → <identificador>:=<expresion_arit>
     def asignar(self):
         id_destino = self.identificador()
         
-        if not self.match(':='):
+        if not self.match(T_ASIGNACION):
             self.error("Se esperaba ':=' en asignacion")
         
         #Evaluar expresion y obtener el resultado
         temp_resultado = self.expresion_arit()
         
+        self.asignacion(id_destino, temp_resultado)
+    
+    def asignacion(self, id_destino, temp_resultado):
         #Asignar el resultado a la variable destino
         self.agregar_cuadruplo(':=', temp_resultado, None, id_destino)
+        self.liberar_temporal(temp_resultado)
     
     #<expresion_arit> → <término><expresion_aritR>
-    def expresion_arit(self):
-        temp = self.termino()
-        return self.expresion_aritR(temp)
-    
     #<expresion_aritR> → (+|-)<termino><expresion_aritR> | ε
-    def expresion_aritR(self, temp_inicial):
-        if self.match('+') or self.match('-'):
-            operador = self.tokens[self.pos-1][1]  #'+' o '-'
-            temp2 = self.termino()
-            nueva_temp = self.nueva_temporal()
-            self.agregar_cuadruplo(operador, temp_inicial, temp2, nueva_temp)
-            return self.expresion_aritR(nueva_temp)
-        return temp_inicial
-    
     #<termino> → <factor><terminoR>
-    def termino(self):
-        temp = self.factor()
-        return self.terminoR(temp)
-    
     #<terminoR> → (*|/)<factor><terminoR> | ε
-    def terminoR(self, temp_inicial):
-        if self.match('*') or self.match('/'):
-            operador = self.tokens[self.pos-1][1]  #'*' o '/'
-            temp2 = self.factor()
-            nueva_temp = self.nueva_temporal()
-            self.agregar_cuadruplo(operador, temp_inicial, temp2, nueva_temp)
-            return self.terminoR(nueva_temp)
-        return temp_inicial
+    #Por precedencia de operadores (Pratt) con la tabla de potencias de la clase:
+    #una vuelta por operador, sin un metodo por nivel. La pila guarda los
+    #operadores que esperan su operando derecho, (izquierdo, operador, potencia),
+    #y None por cada '(' abierto, asi que tampoco hay recursion. Al llegar un
+    #operador se generan los de la pila con potencia mayor o igual; los cuadruplos
+    #y temporales salen en el mismo orden que con el descenso recursivo
+    BINARIOS = OPERADORES_BINARIOS
+    PREFIJOS = OPERADORES_PREFIJOS
+    
+    def expresion_arit(self):
+        binarios = self.BINARIOS
+        prefijos = self.PREFIJOS
+        pila = []
+        while True:
+            #Prefijos y '(' antes del operando: (<expresion_arit>) dentro de <factor>
+            while self.tipo_actual == T_PAR_IZQ or prefijos and self.tipo_actual in prefijos:
+                if self.tipo_actual == T_PAR_IZQ:
+                    pila.append(None)
+                else:
+                    operador, potencia, neutro = prefijos[self.tipo_actual]
+                    pila.append((neutro, operador, potencia))
+                self.get_next_token()
+            valor = self.factor()
+            
+            while True:
+                binario = binarios.get(self.tipo_actual)
+                potencia = binario[1] if binario is not None else 0
+                while pila:
+                    pendiente = pila[-1]
+                    if pendiente is None or pendiente[2] < potencia:
+                        break
+                    pila.pop()
+                    valor = self.operacion(pendiente[1], pendiente[0], valor)
+                if binario is not None:
+                    pila.append((valor, binario[0], potencia))
+                    self.get_next_token()
+                    break
+                
+                #Termina la expresion (o la subexpresion entre parentesis)
+                if not pila:
+                    return valor
+                if not self.match(T_PAR_DER):
+                    self.error("Se esperaba ')'")
+                pila.pop()
+    
+    def operacion(self, operador, arg1, arg2):
+        """Genera el cuadruplo de una operacion binaria en una nueva temporal.
+        Los operandos mueren aqui, asi que el resultado puede reutilizar su temporal"""
+        self.liberar_temporal(arg1)
+        self.liberar_temporal(arg2)
+        nueva_temp = self.nueva_temporal()
+        self.agregar_cuadruplo(operador, arg1, arg2, nueva_temp)
+        return nueva_temp
     
     #<factor> → <identificador> | <numeros> | (<expresion_arit>)
+    #Los parentesis los resuelve expresion_arit()
     def factor(self):
-        if self.current_token and self.current_token[0] == 'IDENTIFICADOR':
-            return self.identificador()
-        elif self.current_token and self.current_token[0] in ['ENTERO', 'REAL']:
-            return self.numeros()
-        elif self.match('('):
-            temp = self.expresion_arit()
-            if not self.match(')'):
-                self.error("Se esperaba ')'")
-            return temp
+        #IDENTIFICADOR, ENTERO y REAL son los codigos 0 a 2: una sola comparacion
+        if self.tipo_actual <= T_REAL:
+            valor = self.valor_actual()
+            self.get_next_token()
+            return valor
         else:
             self.error("Se esperaba identificador, número o expresion entre paréntesis")
 
+#Motores de analisis sintactico disponibles
+MOTORES = ('descendente', 'll1')
+
+def crear_parser(tokens, posiciones=None, motor='descendente', reutilizar_temporales=False,
+                 recuperar_errores=True):
+    """Crea el analizador del motor indicado: 'descendente' (un metodo por
+    no terminal) o 'll1' (dirigido por la tabla de motor_ll1)"""
+    if motor == 'descendente':
+        return Parser3Direcciones(tokens, posiciones, reutilizar_temporales, recuperar_errores)
+    if motor == 'll1':
+        from motor_ll1 import ParserLL1
+        return ParserLL1(tokens, posiciones, reutilizar_temporales, recuperar_errores)
+    raise ValueError(f"Motor desconocido: {motor}")
+
+def analizar_con_mensajes(parser):
+    """programa() con los mensajes de inicio y fin del menu"""
+    motor = f" ({parser.NOMBRE})" if parser.NOMBRE else ""
+    print("-" * 60)
+    print(f"\n\033[93mIniciando analisis sintactico{motor}...\033[0m\n")
+    exito, errores = parser.programa()
+    if exito:
+        print("\033[36mAnalisis sintactico completado exitosamente\033[0m\n")
+    return exito, errores
+
+#Renglones, tokens o cuadruplos que el menu muestra como maximo de cada cosa;
+#lo demas se resume en un renglon '... (N mas)'. Los archivos guardados van completos
+LIMITE_PANTALLA = 2000
+
+def texto_recortado(texto, limite=LIMITE_PANTALLA):
+    """Las primeras limite lineas del texto"""
+    fin = -1
+    for _ in range(limite):
+        fin = texto.find("\n", fin + 1)
+        if fin < 0:
+            return texto
+    resto = texto.count("\n", fin + 1) + (not texto.endswith("\n"))
+    if not resto:
+        return texto
+    return texto[:fin] + f"\n... ({resto} lineas mas)"
+
+def texto_tokens(tokens, limite=LIMITE_PANTALLA):
+    """Lista de tokens como la muestra el menu, hasta limite tokens"""
+    if limite is None or len(tokens) <= limite:
+        return str(list(tokens))
+    return f"{list(islice(tokens, limite))} ... ({len(tokens) - limite} tokens mas)"
+
+def _fase(metricas, nombre):
+    """Mide una fase si se pidieron metricas (ver instrumentacion.Metricas)"""
+    return metricas.fase(nombre) if metricas is not None else contextlib.nullcontext()
+
+def compilar_fuente(codigo_fuente, motor='descendente', reutilizar_temporales=False, optimizar=False,
+                    metricas=None, recuperar_errores=True, verificar_tipos=True):
+    """Compila sin menu ni mensajes y devuelve (tokens, parser, exito, errores);
+    si el lexer rechaza el codigo, tokens y parser son None. Con metricas
+    (instrumentacion.Metricas) se miden las fases y se toman los contadores;
+    verificar_tipos hace el analisis semantico (ver Parser3Direcciones.verificar_tipos).
+    Para usar el compilador como biblioteca ver compilador.compilar()"""
+    if metricas is not None:
+        metricas.iniciar()
+    try:
+        try:
+            with _fase(metricas, 'lexer'):
+                tokens = lexer_compacto(codigo_fuente)
+        except ValueError as e:
+            return None, None, False, [str(e)]
+        parser = crear_parser(tokens, motor=motor, reutilizar_temporales=reutilizar_temporales,
+                              recuperar_errores=recuperar_errores)
+        if metricas is not None:
+            metricas.preparar(parser)
+        with _fase(metricas, 'parser'):
+            exito, errores = parser.programa()
+        if exito and verificar_tipos:
+            with _fase(metricas, 'semantica'):
+                exito = parser.verificar_tipos()
+        if exito and optimizar:
+            with _fase(metricas, 'optimizacion'):
+                parser.optimizar()
+                parser.optimizar_ciclos()
+                parser.optimizar()
+                parser.simplificar_flujo()
+        if metricas is not None:
+            metricas.registrar(tokens, parser)
+        return tokens, parser, exito, list(errores)
+    finally:
+        if metricas is not None:
+            metricas.terminar()
+
 #Analizador Léxico
+PALABRAS_RESERVADAS = frozenset(['being', 'end', 'entero', 'real', 'if', 'else', 'while', 'endwhile',
+                                 'and', 'or', 'not'])
+SIMBOLOS = frozenset(['(', ')', ',', ';', ':=', '=', '<=', '>=', '<>', '<', '>', '+', '-', '*', '/'])
+
+#Tokens de palabras reservadas y simbolos: se crean una sola vez y se reutilizan
+_TOKENS_FIJOS = {lexema: (lexema, lexema) for lexema in PALABRAS_RESERVADAS | SIMBOLOS}
+
+#Una sola alternativa compilada para todo el lenguaje. El orden importa:
+#real antes que entero y los simbolos de dos caracteres antes que los de uno
+_ALTERNATIVAS_TOKEN = (r'\d+\.\d+|\d+|[a-zA-Z][a-zA-Z0-9]*|'
+                       + '|'.join(re.escape(s) for s in sorted(SIMBOLOS, key=len, reverse=True)))
+_PATRON_TOKEN = re.compile(r'\s*(' + _ALTERNATIVAS_TOKEN + ')')
+_PATRON_TOKEN_CON_ESPACIO = re.compile(r'(\s*)(' + _ALTERNATIVAS_TOKEN + ')')
+
+class PosicionesTokens:
+    """Posiciones (linea, columna_inicio, columna_fin) de cada token.
+    Solo guarda desplazamientos; la linea y columna se calculan al consultarlas.
+    Las columnas empiezan en 1 y columna_fin es exclusiva"""
+    def __init__(self, inicios, fines, inicios_linea):
+        self.inicios = inicios
+        self.fines = fines
+        self.inicios_linea = inicios_linea
+    
+    def __len__(self):
+        return len(self.inicios)
+    
+    def __getitem__(self, i):
+        inicio = self.inicios[i]
+        linea = bisect_right(self.inicios_linea, inicio)
+        columna = inicio - self.inicios_linea[linea - 1] + 1
+        return (linea, columna, columna + self.fines[i] - inicio)
+
+def _inicios_linea(code):
+    """Desplazamiento donde empieza cada linea del codigo"""
+    return list(accumulate((len(linea) + 1 for linea in code.split('\n')[:-1]), initial=0))
+
+def _error_caracter(code):
+    """Localiza el primer caracter que no pertenece a ningun token y lanza el error"""
+    fin = 0
+    for m in iter(_PATRON_TOKEN_CON_ESPACIO.scanner(code).match, None):
+        fin = m.end()
+    resto = code[fin:]
+    fin += len(resto) - len(resto.lstrip())
+    linea = code.count('\n', 0, fin) + 1
+    columna = fin - (code.rfind('\n', 0, fin) + 1) + 1
+    raise ValueError(f"Caracter no reconocido: '{code[fin]}' (linea {linea}, columna {columna})")
+
+def _tokenizar(code, con_posiciones):
+    """Recorre el codigo una sola vez con el patron maestro.
+    Regresa la lista de tokens (tipo, valor) y, si se pide, sus posiciones"""
+    if con_posiciones:
+        pares = _PATRON_TOKEN_CON_ESPACIO.findall(code)
+        lexemas = list(map(itemgetter(1), pares))
+    else:
+        lexemas = _PATRON_TOKEN.findall(code)
+    
+    #findall salta lo que no reconoce: si los lexemas no cubren todo lo que
+    #no es espacio en blanco, hay un caracter invalido
+    if sum(map(len, lexemas)) != len(''.join(code.split())):
+        _error_caracter(code)
+    
+    #Palabras reservadas y simbolos se resuelven con una busqueda en diccionario
+    fijos = _TOKENS_FIJOS
+    tokens = [fijos[x] if x in fijos
+              else (('REAL', x) if '.' in x else ('ENTERO', x)) if x[0].isdigit()
+              else ('IDENTIFICADOR', x)
+              for x in lexemas]
+    
+    if not con_posiciones:
+        return tokens, None
+    
+    #Espacios y lexemas alternan: las sumas acumuladas dan inicio y fin de cada token
+    limites = list(accumulate(map(len, chain.from_iterable(pares))))
+    posiciones = PosicionesTokens(limites[0::2], limites[1::2], _inicios_linea(code))
+    return tokens, posiciones
+
 def lexer(code):
-    tokens = []
+    """Regresa la lista de tokens (tipo, valor) del codigo fuente"""
+    tokens, _ = _tokenizar(code, False)
+    return tokens
+
+def lexer_con_posiciones(code):
+    """Regresa los tokens (tipo, valor) y sus posiciones (ver PosicionesTokens)"""
+    return _tokenizar(code, True)
+
+#Codigo de cada palabra reservada y simbolo (solo lexemas fijos: un identificador
+#llamado REAL no debe confundirse con el tipo de token REAL)
+_CODIGO_FIJO = {lexema: CODIGO_TIPO[lexema] for lexema in _TOKENS_FIJOS}
+
+class TokensCompactos:
+    """Tokens en columnas paralelas de array: codigo entero del tipo (1 byte) e indice
+    de su lexema (4 bytes) en lexemas, donde cada lexema distinto se guarda una sola
+    vez. Las columnas de inicio y fin en el codigo fuente (4 bytes cada una) se
+    calculan la primera vez que se piden, porque solo se usan para ubicar errores"""
+    def __init__(self, codigo, tipos, ids_lexema, lexemas):
+        self.codigo = codigo
+        self.tipos = tipos
+        self.ids_lexema = ids_lexema
+        self.lexemas = lexemas  #Lexemas internados
+        self._inicios = None
+        self._fines = None
+        self._posiciones = None
     
-    keywords = ['being', 'end', 'entero', 'real', 'if', 'else', 'while', 'endwhile']
-    symbols = ['(', ')', ',', ';', ':=', '=', '<=', '>=', '<>', '<', '>', '+', '-', '*', '/']
+    def __len__(self):
+        return len(self.tipos)
     
-    identifier_pattern = r'[a-zA-Z][a-zA-Z0-9]*'
-    integer_pattern = r'\d+'
-    real_pattern = r'\d+\.\d+'
+    def valor(self, i):
+        """Lexema del token i"""
+        return self.lexemas[self.ids_lexema[i]]
     
-    i = 0
-    while i < len(code):
-        char = code[i]
-        
-        if char.isspace():
-            i += 1
-            continue
-        
-        if char.isalpha():
-            match = re.match(identifier_pattern, code[i:])
-            if match:
-                token = match.group()
-                if token in keywords:
-                    tokens.append((token, token))
-                else:
-                    tokens.append(('IDENTIFICADOR', token))
-                i += len(token)
-                continue
-        
-        if char.isdigit():
-            real_match = re.match(real_pattern, code[i:])
-            if real_match:
-                tokens.append(('REAL', real_match.group()))
-                i += len(real_match.group())
-                continue
-            
-            int_match = re.match(integer_pattern, code[i:])
-            if int_match:
-                tokens.append(('ENTERO', int_match.group()))
-                i += len(int_match.group())
-                continue
-        
-        if i + 1 < len(code):
-            two_char = code[i:i+2]
-            if two_char in [':=', '<=', '>=', '<>']:
-                tokens.append((two_char, two_char))
-                i += 2
-                continue
-        
-        if char in symbols:
-            tokens.append((char, char))
-            i += 1
-            continue
+    def __getitem__(self, i):
+        return (TIPOS_TOKEN[self.tipos[i]], self.lexemas[self.ids_lexema[i]])
+    
+    def __iter__(self):
+        lexemas = self.lexemas
+        for tipo, id_lexema in zip(self.tipos, self.ids_lexema):
+            yield (TIPOS_TOKEN[tipo], lexemas[id_lexema])
+    
+    def _calcular_limites(self):
+        #Espacios y lexemas alternan: las sumas acumuladas dan inicio y fin de cada token
+        pares = _PATRON_TOKEN_CON_ESPACIO.findall(self.codigo)
+        limites = list(accumulate(map(len, chain.from_iterable(pares))))
+        formato = 'I' if len(self.codigo) < 2 ** 32 else 'Q'
+        self._inicios = array(formato, limites[0::2])
+        self._fines = array(formato, limites[1::2])
+    
+    @property
+    def inicios(self):
+        if self._inicios is None:
+            self._calcular_limites()
+        return self._inicios
+    
+    @property
+    def fines(self):
+        if self._fines is None:
+            self._calcular_limites()
+        return self._fines
+    
+    @property
+    def posiciones(self):
+        if self._posiciones is None:
+            self._posiciones = PosicionesTokens(self.inicios, self.fines, _inicios_linea(self.codigo))
+        return self._posiciones
+
+def lexer_compacto(code):
+    """Regresa los tokens del codigo como TokensCompactos"""
+    lexemas = _PATRON_TOKEN.findall(code)
+    if sum(map(len, lexemas)) != len(''.join(code.split())):
+        _error_caracter(code)
+    
+    #Cada lexema distinto recibe un indice; todo el trabajo por token ocurre en C (map)
+    indices = dict.fromkeys(lexemas)
+    for indice, lexema in enumerate(indices):
+        indices[lexema] = indice
+    ids_lexema = array('I', map(indices.__getitem__, lexemas))
+    
+    #Y se clasifica una sola vez
+    fijos = _CODIGO_FIJO
+    tipo_lexema = [fijos[x] if x in fijos
+                   else (T_REAL if '.' in x else T_ENTERO) if x[0].isdigit()
+                   else T_IDENTIFICADOR
+                   for x in indices]
+    tipos = array('B', map(tipo_lexema.__getitem__, ids_lexema))
+    
+    return TokensCompactos(code, tipos, ids_lexema, list(indices))
+
+#Analizador lexico en flujo para archivos grandes.
+#Un grupo por cada palabra reservada y simbolo: el numero del grupo que coincide
+#identifica el token sin copiar su texto del buffer
+_LEXEMAS_FIJOS = (sorted(PALABRAS_RESERVADAS, key=lambda l: (-len(l), l))
+                  + sorted(SIMBOLOS, key=lambda l: (-len(l), l)))
+_PATRON_ARCHIVO = re.compile(
+    rb'\s*(?:(\d+\.\d+)|(\d+)|'
+    + b'|'.join(b'(' + re.escape(lexema.encode()) + b')' + (rb'(?![a-zA-Z0-9])' if lexema.isalpha() else b'')
+                for lexema in _LEXEMAS_FIJOS)
+    + rb'|([a-zA-Z][a-zA-Z0-9]*))'
+)
+_PATRON_ESPACIOS = re.compile(rb'\s*')
+_PATRON_SALTO = re.compile(rb'\n')
+#Numero de grupo -> tupla compartida (palabras reservadas y simbolos) o tipo del token
+_TOKEN_POR_GRUPO = ([None, 'REAL', 'ENTERO']
+                    + [_TOKENS_FIJOS[lexema] for lexema in _LEXEMAS_FIJOS]
+                    + ['IDENTIFICADOR'])
+
+class TokenArchivo:
+    """Identificador o numero leido de un archivo: guarda el tipo y los desplazamientos
+    en el buffer, y solo decodifica el texto cuando se pide token[1]"""
+    __slots__ = ('tipo', 'inicio', 'fin', 'buffer')
+    
+    def __init__(self, tipo, inicio, fin, buffer):
+        self.tipo = tipo
+        self.inicio = inicio
+        self.fin = fin
+        self.buffer = buffer
+    
+    def __getitem__(self, indice):
+        if indice == 0:
+            return self.tipo
+        if indice == 1:
+            return self.buffer[self.inicio:self.fin].decode('ascii')
+        raise IndexError(indice)
+    
+    def __len__(self):
+        return 2
+    
+    def __repr__(self):
+        return f"TokenArchivo({self.tipo!r}, {self.inicio}, {self.fin})"
+
+class _PosicionesFlujo:
+    """Vista de posiciones para el parser en modo flujo: solo conoce el ultimo token entregado"""
+    def __init__(self, lexer):
+        self.lexer = lexer
+    
+    def __len__(self):
+        return self.lexer.cantidad
+    
+    def __getitem__(self, i):
+        if i != self.lexer.cantidad - 1:
+            raise IndexError("En modo flujo solo se conserva la posicion del token actual")
+        return self.lexer.ubicacion(self.lexer.ultimo_inicio, self.lexer.ultimo_fin)
+
+class LexerArchivo:
+    """Produce los tokens de un archivo uno a uno leyendolo a traves de mmap.
+    Palabras reservadas y simbolos son las mismas tuplas que regresa lexer();
+    identificadores y numeros son TokenArchivo que apuntan al buffer.
+    La memoria usada no depende del tamaño del archivo. Los archivos deben ser ASCII"""
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.cantidad = 0  #Tokens entregados hasta ahora
+        self.ultimo_inicio = 0
+        self.ultimo_fin = 0
+        self.posiciones = _PosicionesFlujo(self)
+        self._buffer = None
+    
+    def __iter__(self):
+        with open(self.ruta, 'rb') as archivo:
+            if os.fstat(archivo.fileno()).st_size == 0:
+                return
+            self._buffer = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+            tokens = self._tokens(self._buffer)
+            try:
+                yield from tokens
+            finally:
+                tokens.close()  #Libera el scanner antes de cerrar el mmap
+                self._buffer.close()
+                self._buffer = None
+    
+    def _tokens(self, buffer):
+        por_grupo = _TOKEN_POR_GRUPO
+        escaner = _PATRON_ARCHIVO.scanner(buffer)
+        fin = 0
+        m = None
+        for m in iter(escaner.match, None):
+            grupo = m.lastindex
+            inicio, fin = m.span(grupo)
+            self.ultimo_inicio = inicio
+            self.ultimo_fin = fin
+            self.cantidad += 1
+            token = por_grupo[grupo]
+            yield token if type(token) is tuple else TokenArchivo(token, inicio, fin, buffer)
+        del escaner, m
         
-        raise ValueError(f"Caracter no reconocido: '{char}'")
+        #El scanner se detiene en el primer caracter que no pertenece a ningun token
+        fin = _PATRON_ESPACIOS.match(buffer, fin).end()
+        if fin < len(buffer):
+            linea, columna, _ = self.ubicacion(fin, fin)
+            caracter = buffer[fin:fin + 4].decode('utf-8', errors='replace')[0]
+            raise ValueError(f"Caracter no reconocido: '{caracter}' (linea {linea}, columna {columna})")
     
-    return tokens
+    def ubicacion(self, inicio, fin):
+        """(linea, columna_inicio, columna_fin) de un rango del buffer abierto"""
+        linea = len(_PATRON_SALTO.findall(self._buffer, 0, inicio)) + 1
+        columna = inicio - (self._buffer.rfind(b'\n', 0, inicio) + 1) + 1
+        return (linea, columna, columna + fin - inicio)
 
 #Funcion principal interactiva
 def analizar_con_3_direcciones():
@@ -457,9 +1391,10 @@ def analizar_con_3_direcciones():
         print("\nOPCIONES:")
         print("1. Ingresar programa")
         print("2. Ejemplos predefinidos")
-        print("3. Salir")
+        print("3. Analizar archivo (modo flujo)")
+        print("4. Salir")
         
-        opcion = input("\nSelecciona una opcion (1-3): ").strip()
+        opcion = input("\nSelecciona una opcion (1-4): ").strip()
         
         if opcion == '1':
             print("-" * 60)
@@ -480,17 +1415,36 @@ def analizar_con_3_direcciones():
                 print("\033[91mNo se ingreso ningún codigo\033[0m")
                 continue
             
-            procesar_codigo(codigo_fuente)
+            optimizar = input("¿Aplicar optimizacion local? (s/n): ").strip().lower()
+            ejecutar = input("¿Ejecutar el codigo generado? (s/n): ").strip().lower()
+            medir = input("¿Mostrar metricas de compilacion? (s/n): ").strip().lower()
+            metricas = None
+            if medir == 's':
+                from instrumentacion import Metricas
+                metricas = Metricas(memoria=True, perfil=True)
+            procesar_codigo(codigo_fuente, optimizar=optimizar == 's', ejecutar=ejecutar == 's',
+                            metricas=metricas)
+            if metricas is not None:
+                ruta_metricas = input("\nArchivo JSON para las metricas (Enter para no guardar): ").strip()
+                if ruta_metricas:
+                    metricas.guardar_json(ruta_metricas)
+                    print(f"Metricas guardadas en: {ruta_metricas}")
         
         elif opcion == '2':
             mostrar_ejemplos()
         
         elif opcion == '3':
+            ruta = input("\nRuta del archivo: ").strip()
+            if ruta:
+                guardar = input("¿Quieres guardar el codigo de 3 direcciones en archivo? (s/n): ").strip().lower()
+                procesar_archivo(ruta, guardar == 's')
+        
+        elif opcion == '4':
             print("CERRANDO PROGRAMA")
             break
         
         else:
-            print("Opcion no valida. Por favor selecciona 1, 2 o 3.")
+            print("Opcion no valida. Por favor selecciona 1, 2, 3 o 4.")
 
 #lo importante :p
 
@@ -614,53 +1568,149 @@ def mostrar_ejemplos():
     else:
         print("\033[91mOpcion no valida\033[0m")
 
-def procesar_codigo(codigo_fuente, guardar_archivo=False):
-    """Procesa el codigo y muestra los resultados"""
+def procesar_codigo(codigo_fuente, guardar_archivo=False, motor='descendente', reutilizar_temporales=False,
+                    optimizar=False, ejecutar=False, metricas=None):
+    """Procesa el codigo y muestra los resultados. Con metricas
+    (instrumentacion.Metricas) se mide cada fase y al final se muestra el resumen"""
     print("\n" + "=" * 60)
     print("\n" + "\033[93mANALIZANDO CODIGO...\033[0m")
     print("=" * 60)
     print("Codigo fuente:")
-    print(codigo_fuente)
+    print(texto_recortado(codigo_fuente))
     print("\n" + "=" * 60)
     
+    if metricas is not None:
+        metricas.iniciar()
     try:
         #Analisis léxico
-        tokens = lexer(codigo_fuente)
-        print(f"\nTokens generados: {len(tokens)} tokens")
-        print(f"   {tokens}")
+        with _fase(metricas, 'lexer'):
+            tokens = lexer_compacto(codigo_fuente)
+        with _fase(metricas, 'salida'):
+            print(f"\nTokens generados: {len(tokens)} tokens")
+            print(f"   {texto_tokens(tokens)}")
         
         #Analisis sintactico y generacion de codigo de 3 direcciones
-        parser = Parser3Direcciones(tokens)
-        exito, errores = parser.programa()
+        parser = crear_parser(tokens, motor=motor, reutilizar_temporales=reutilizar_temporales)
+        if metricas is not None:
+            metricas.preparar(parser)
+        with _fase(metricas, 'parser'):
+            exito, errores = analizar_con_mensajes(parser)
         
+        sintaxis_correcta = exito
         if exito:
             print("-" * 60)
             print("\033[32mPROGRAMA SINTACTICAMENTE CORRECTO\033[0m")
             print("-" * 60)
             
-            #Mostrar codigo de 3 direcciones generado
-            parser.mostrar_codigo_intermedio()
+            #Analisis semantico: variables declaradas y tipos de las asignaciones
+            with _fase(metricas, 'semantica'):
+                exito = parser.verificar_tipos()
+        
+        if exito:
+            #Optimizacion local por bloque basico y limpieza del flujo de control
+            if optimizar:
+                with _fase(metricas, 'optimizacion'):
+                    parser.optimizar().mostrar_reporte()
+                    parser.optimizar_ciclos().mostrar_reporte()
+                    parser.optimizar()
+                    parser.simplificar_flujo().mostrar_reporte()
+                    parser.asignar_registros().mostrar_reporte()
+            
+            with _fase(metricas, 'salida'):
+                #Mostrar codigo de 3 direcciones generado
+                parser.mostrar_codigo_intermedio(LIMITE_PANTALLA)
+                
+                #Mostrar tabla de simbolos
+                parser.mostrar_tabla_simbolos(LIMITE_PANTALLA)
             
-            #Mostrar tabla de simbolos
-            parser.mostrar_tabla_simbolos()
+            #Ejecutar el codigo generado (con limite por si el ciclo no termina)
+            if ejecutar:
+                try:
+                    with _fase(metricas, 'ejecucion'):
+                        maquina = parser.ejecutar(max_pasos=10_000_000, perfil=True)
+                    maquina.mostrar_reporte()
+                    #Ya se sabe que termina: se compara con la funcion de Python compilada
+                    programa_python = parser.compilar_python()
+                    programa_python.ejecutar()
+                    programa_python.mostrar_reporte()
+                except (ZeroDivisionError, RuntimeError) as e:
+                    print(f"\n\033[31mERROR DE EJECUCION:\033[0m {e}")
             
             #Guardar en archivo si se solicita
             if guardar_archivo:
                 nombre_archivo = input("\nNombre del archivo (Enter para 'codigo_3direcciones.txt'): ").strip()
                 if not nombre_archivo:
                     nombre_archivo = "codigo_3direcciones.txt"
-                parser.guardar_codigo_archivo(nombre_archivo)
+                with _fase(metricas, 'salida'):
+                    parser.guardar_codigo_archivo(nombre_archivo)
             
+        elif sintaxis_correcta:
+            print("\n\033[31mSE ENCONTRARON ERRORES SEMANTICOS:\033[0m")
+            for error in parser.errores:
+                print(f"   • {error}")
         else:
             print("\n\033[31mSE ENCONTRARON ERRORES SINTaCTICOS:\033[0m")
             for error in errores:
                 print(f"   • {error}")
+        
+        if metricas is not None:
+            metricas.registrar(tokens, parser)
+            
+    except Exception as e:
+        print(f"\nERROR DURANTE EL ANALISIS: {e}")
+    
+    if metricas is not None:
+        metricas.terminar()
+        metricas.mostrar_resumen()
+
+def procesar_archivo(ruta, guardar_archivo=False, motor='descendente', reutilizar_temporales=False):
+    """Procesa un archivo en modo flujo: los tokens se leen del archivo conforme
+    el parser los pide, sin cargar el codigo ni la lista de tokens en memoria"""
+    print("\n" + "=" * 60)
+    print("\n" + f"\033[93mANALIZANDO ARCHIVO {ruta}...\033[0m")
+    print("=" * 60)
+    
+    try:
+        #Analisis léxico y sintactico en un solo recorrido
+        tokens = LexerArchivo(ruta)
+        parser = crear_parser(tokens, tokens.posiciones, motor, reutilizar_temporales)
+        exito, errores = analizar_con_mensajes(parser)
+        print(f"Tokens leidos: {tokens.cantidad} tokens")
+        
+        sintaxis_correcta = exito
+        if exito:
+            print("-" * 60)
+            print("\033[32mPROGRAMA SINTACTICAMENTE CORRECTO\033[0m")
+            print("-" * 60)
+            exito = parser.verificar_tipos()
+        
+        if exito:
+            parser.mostrar_codigo_intermedio(LIMITE_PANTALLA)
+            parser.mostrar_tabla_simbolos(LIMITE_PANTALLA)
             
+            if guardar_archivo:
+                nombre_archivo = input("\nNombre del archivo (Enter para 'codigo_3direcciones.txt'): ").strip()
+                if not nombre_archivo:
+                    nombre_archivo = "codigo_3direcciones.txt"
+                parser.guardar_codigo_archivo(nombre_archivo)
+        elif sintaxis_correcta:
+            print("\n\033[31mSE ENCONTRARON ERRORES SEMANTICOS:\033[0m")
+            for error in parser.errores:
+                print(f"   • {error}")
+        else:
+            print("\n\033[31mSE ENCONTRARON ERRORES SINTaCTICOS:\033[0m")
+            for error in errores:
+                print(f"   • {error}")
+    
     except Exception as e:
         print(f"\nERROR DURANTE EL ANALISIS: {e}")
 
 #Ejecutar el programa principal
 if __name__ == "__main__":
+    #Con argumentos se compila por lotes (ver lotes.py); sin ellos, el menu
+    if len(sys.argv) > 1:
+        from lotes import main
+        sys.exit(main(sys.argv[1:]))
     try:
         analizar_con_3_direcciones()
     except KeyboardInterrupt:
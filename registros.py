@@ -0,0 +1,387 @@
+#Asignacion de registros por barrido lineal (linear scan, Poletto y Sarkar)
+#sobre los cuadruplos de Parser3Direcciones, optimizados o no, tipados o no.
+#    asignacion = AsignacionRegistros(cuadruplos, tabla_simbolos, registros=8)
+#    asignacion.instrucciones, asignacion.texto(), asignacion.mostrar_reporte()
+#Cada variable y temporal tiene un intervalo de vida [inicio, fin] en la
+#numeracion de los cuadruplos. La vivacidad se calcula por bloques basicos, asi
+#que un valor que se lee en la condicion de un while y se escribe en su cuerpo
+#queda vivo en todo el ciclo (por el goto de regreso). Los intervalos se
+#recorren por su inicio; si no hay registro libre se derrama el que termina mas
+#tarde, que vive en memoria todo el tiempo: su propia casilla si es variable o
+#una casilla de derrame (_d0, _d1...) si es temporal, compartida por derramados
+#que no se traslapan. Cada lectura de un derramado es una carga y cada escritura
+#un almacenamiento, en los dos ultimos registros, que se reservan para eso. Las
+#constantes van como inmediatos. Las variables que se leen antes de escribirse
+#se cargan al empezar y las que quedan en registro se guardan al terminar
+import time
+from bisect import insort
+
+from optimizador import (COMPARACIONES, SALTOS, bloques_basicos, dividir, es_constante, es_temporal,
+                         evaluar, valor_constante)
+
+RESERVADOS = 2  #Registros para cargar los operandos derramados
+
+def formatear(instruccion):
+    """Representacion legible de una instruccion del codigo con registros"""
+    op, arg1, arg2, resultado = instruccion
+    if op == 'ld':
+        return f"{resultado} := [{arg1}]"
+    if op == 'st':
+        return f"[{resultado}] := {arg1}"
+    if op[:2] == ':=':
+        return f"{resultado} := {arg1}"
+    if op == 'goto' or op == 'label':
+        return f"{op} {resultado}"
+    if op[:2] == 'if':
+        return f"ifFalse {arg1} {op[2:]} {arg2} goto {resultado}"
+    if arg2 is None:
+        return f"{resultado} := {op} {arg1}"
+    return f"{resultado} := {arg1} {op} {arg2}"
+
+class Intervalo:
+    """Vida de un valor: registro es None si se derramo a memoria"""
+    __slots__ = ('nombre', 'inicio', 'fin', 'registro', 'memoria')
+
+    def __init__(self, nombre, inicio):
+        self.nombre = nombre
+        self.inicio = inicio
+        self.fin = inicio
+        self.registro = None
+        self.memoria = None  #Casilla de memoria del valor si se derramo
+
+    def __repr__(self):
+        lugar = self.registro if self.registro is not None else f"[{self.memoria}]"
+        return f"Intervalo({self.nombre!r}, {self.inicio}, {self.fin}, {lugar})"
+
+class AsignacionRegistros:
+    """Asigna registros a las variables y temporales de los cuadruplos y baja el
+    codigo a instrucciones con registros: las mismas operaciones (con registros
+    o inmediatos como operandos) mas ('ld', casilla, None, registro) y
+    ('st', registro, None, casilla). registros cuenta tambien los reservados"""
+
+    def __init__(self, cuadruplos, tabla_simbolos=None, registros=8):
+        if registros < RESERVADOS + 1:
+            raise ValueError(f"Se necesitan al menos {RESERVADOS + 1} registros")
+        self.cuadruplos = list(cuadruplos)
+        self.tabla_simbolos = tabla_simbolos or {}
+        self.registros = registros
+        self.nombres_registros = [f"r{i}" for i in range(registros)]
+        self.intervalos = {}  #Nombre -> Intervalo
+        self.entrada = []  #Valores que se leen antes de escribirse
+        self.salida = []  #Variables cuyo valor final importa
+        self.presion_maxima = 0  #Mayor numero de valores vivos a la vez
+        self.punto_presion = None  #Cuadruplo donde se alcanza
+        self.casillas_derrame = 0
+        self.instrucciones = []
+        self.cargas_ejecutadas = 0
+        self.almacenamientos_ejecutados = 0
+        self.pasos = 0
+        self.tiempo = 0.0
+        self._calcular_intervalos()
+        self._asignar()
+        self._bajar()
+
+    def es_temporal(self, nombre):
+        return es_temporal(nombre, self.tabla_simbolos)
+
+    def es_variable_final(self, nombre):
+        """Variables que quedan en memoria al terminar: las declaradas y las que
+        no son temporales ni de la optimizacion de ciclos (_c)"""
+        return nombre in self.tabla_simbolos or not (nombre[0] == '_' or self.es_temporal(nombre))
+
+    def _calcular_intervalos(self):
+        cuadruplos = self.cuadruplos
+        intervalos = self.intervalos
+        rangos = bloques_basicos(cuadruplos)
+
+        #Por bloque: lo que lee antes de escribirlo (expuestos) y lo que escribe
+        expuestos = []
+        escritos = []
+        for inicio, fin in rangos:
+            leidos = []
+            definidos = set()
+            for i in range(inicio, fin):
+                op, arg1, arg2, resultado = cuadruplos[i]
+                if op == 'label' or op == 'goto':
+                    continue
+                for arg in (arg1, arg2):
+                    if arg is None or es_constante(arg):
+                        continue
+                    intervalo = intervalos.get(arg)
+                    if intervalo is None:
+                        intervalo = intervalos[arg] = Intervalo(arg, i)
+                    intervalo.fin = i
+                    if arg not in definidos:
+                        leidos.append(arg)
+                if op in SALTOS:
+                    continue
+                intervalo = intervalos.get(resultado)
+                if intervalo is None:
+                    intervalo = intervalos[resultado] = Intervalo(resultado, i)
+                intervalo.fin = i
+                definidos.add(resultado)
+            expuestos.append(leidos)
+            escritos.append(definidos)
+
+        #Solo los valores que algun bloque lee sin escribirlos antes (o que importan
+        #al final) pueden estar vivos entre bloques: las temporales del parser no
+        #cruzan bloques y no entran en los conjuntos, que son enteros usados como bits
+        self.salida = [nombre for nombre in intervalos if self.es_variable_final(nombre)]
+        globales = dict.fromkeys(nombre for leidos in expuestos for nombre in leidos)
+        globales.update(dict.fromkeys(self.salida))
+        bits = {nombre: 1 << k for k, nombre in enumerate(globales)}
+        lee = [sum(bits[nombre] for nombre in dict.fromkeys(leidos)) for leidos in expuestos]
+        escribe = [sum(bits[nombre] for nombre in definidos if nombre in bits) for definidos in escritos]
+        vivas_salida = sum(bits[nombre] for nombre in self.salida)
+
+        #Sucesores: el destino de los saltos y el bloque siguiente (o el fin del programa)
+        por_etiqueta = {cuadruplos[inicio][3]: k for k, (inicio, _) in enumerate(rangos)
+                        if cuadruplos[inicio][0] == 'label'}
+        sucesores = []
+        for k, (_, fin) in enumerate(rangos):
+            op, _, _, resultado = cuadruplos[fin - 1]
+            destinos = [] if op == 'goto' else [k + 1]
+            if op in SALTOS:
+                destinos.append(por_etiqueta[resultado])
+            sucesores.append(destinos)
+
+        #Vivas a la entrada y salida de cada bloque, hasta que nada cambia
+        n = len(rangos)
+        vivas_entrada = [0] * (n + 1)
+        vivas_entrada[n] = vivas_salida  #El fin del programa
+        vivas_fin = [0] * n
+        cambio = True
+        while cambio:
+            cambio = False
+            for k in range(n - 1, -1, -1):
+                vivas = 0
+                for sucesor in sucesores[k]:
+                    vivas |= vivas_entrada[sucesor]
+                vivas_fin[k] = vivas
+                entrada = lee[k] | (vivas & ~escribe[k])
+                if entrada != vivas_entrada[k]:
+                    vivas_entrada[k] = entrada
+                    cambio = True
+
+        #Un valor vivo a la entrada (salida) de un bloque vive desde su inicio (hasta
+        #su fin): el primer bloque donde entra vivo y el ultimo donde sale vivo bastan
+        nombres = list(globales)
+        pendientes = (1 << len(nombres)) - 1
+        for k, (inicio, _) in enumerate(rangos):
+            nuevos = vivas_entrada[k] & pendientes
+            pendientes &= ~nuevos
+            for nombre in _nombres_bits(nuevos, nombres):
+                intervalo = intervalos[nombre]
+                intervalo.inicio = min(intervalo.inicio, inicio)
+        pendientes = (1 << len(nombres)) - 1
+        for k in range(n - 1, -1, -1):
+            nuevos = vivas_fin[k] & pendientes
+            pendientes &= ~nuevos
+            for nombre in _nombres_bits(nuevos, nombres):
+                intervalo = intervalos[nombre]
+                intervalo.fin = max(intervalo.fin, rangos[k][1] - 1)
+        if n and n in sucesores[n - 1]:
+            #Las que siguen vivas al terminar se leen despues del ultimo cuadruplo
+            for nombre in self.salida:
+                intervalos[nombre].fin = len(cuadruplos)
+        self.entrada = _nombres_bits(vivas_entrada[0], nombres) if n else []
+
+        #Presion: valores vivos en cada cuadruplo (un valor que muere en el mismo
+        #cuadruplo donde nace otro no cuenta dos veces)
+        eventos = sorted([(intervalo.inicio, 1) for intervalo in intervalos.values()]
+                         + [(intervalo.fin, -1) for intervalo in intervalos.values()])
+        vivos = 0
+        for posicion, cambio_vivos in eventos:
+            vivos += cambio_vivos
+            if vivos > self.presion_maxima:
+                self.presion_maxima = vivos
+                self.punto_presion = posicion
+
+    def _asignar(self):
+        """Barrido lineal: activos ordenados por fin; un registro se libera cuando
+        su valor se lee por ultima vez en el cuadruplo donde empieza el siguiente
+        (los operandos se leen antes de escribir el resultado)"""
+        disponibles = self.registros - RESERVADOS
+        libres = self.nombres_registros[disponibles - 1::-1]
+        activos = []
+        derramados = []
+        for intervalo in sorted(self.intervalos.values(), key=lambda intervalo: intervalo.inicio):
+            while activos and activos[0].fin <= intervalo.inicio:
+                libres.append(activos.pop(0).registro)
+            if libres:
+                intervalo.registro = libres.pop()
+                insort(activos, intervalo, key=_fin)
+                continue
+            ultimo = activos[-1]
+            if ultimo.fin > intervalo.fin:
+                intervalo.registro = ultimo.registro
+                ultimo.registro = None
+                activos.pop()
+                insort(activos, intervalo, key=_fin)
+                derramados.append(ultimo)
+            else:
+                derramados.append(intervalo)
+
+        #Las variables se derraman a su casilla; las temporales comparten casillas
+        #de derrame mientras sus intervalos no se traslapen
+        libres = []
+        ocupadas = []
+        for intervalo in sorted(derramados, key=lambda intervalo: intervalo.inicio):
+            if not self.es_temporal(intervalo.nombre):
+                intervalo.memoria = intervalo.nombre
+                continue
+            while ocupadas and ocupadas[0].fin <= intervalo.inicio:
+                libres.append(ocupadas.pop(0).memoria)
+            if libres:
+                intervalo.memoria = libres.pop()
+            else:
+                intervalo.memoria = f"_d{self.casillas_derrame}"
+                self.casillas_derrame += 1
+            insort(ocupadas, intervalo, key=_fin)
+
+    def _bajar(self):
+        emitir = self.instrucciones.append
+        intervalos = self.intervalos
+        auxiliares = self.nombres_registros[-RESERVADOS:]
+
+        def fuente(operando, auxiliar):
+            """Registro o inmediato con el valor del operando (cargandolo si se derramo)"""
+            if operando is None or es_constante(operando):
+                return operando
+            intervalo = intervalos[operando]
+            if intervalo.registro is not None:
+                return intervalo.registro
+            emitir(('ld', intervalo.memoria, None, auxiliar))
+            return auxiliar
+
+        for nombre in self.entrada:
+            intervalo = intervalos[nombre]
+            if intervalo.registro is not None:
+                emitir(('ld', nombre, None, intervalo.registro))
+        for op, arg1, arg2, resultado in self.cuadruplos:
+            if op == 'label' or op == 'goto':
+                emitir((op, None, None, resultado))
+                continue
+            if op in SALTOS:
+                emitir((op, fuente(arg1, auxiliares[0]), fuente(arg2, auxiliares[1]), resultado))
+                continue
+            destino = intervalos[resultado]
+            if op[:2] == ':=' and destino.registro is None:
+                #Copia a memoria: basta guardar el registro fuente
+                valor = fuente(arg1, auxiliares[0])
+                if es_constante(valor):
+                    emitir((op, valor, None, auxiliares[0]))
+                    valor = auxiliares[0]
+                emitir(('st', valor, None, destino.memoria))
+                continue
+            a = fuente(arg1, auxiliares[0])
+            b = fuente(arg2, auxiliares[1])
+            if destino.registro is not None:
+                if op[:2] != ':=' or a != destino.registro:
+                    emitir((op, a, b, destino.registro))
+            else:
+                emitir((op, a, b, auxiliares[0]))
+                emitir(('st', auxiliares[0], None, destino.memoria))
+        for nombre in self.salida:
+            intervalo = intervalos[nombre]
+            if intervalo.registro is not None:
+                emitir(('st', intervalo.registro, None, nombre))
+
+    def derramados(self):
+        """Intervalos que viven en memoria"""
+        return [intervalo for intervalo in self.intervalos.values() if intervalo.registro is None]
+
+    def conteo(self):
+        """Instrucciones de memoria en el codigo bajado: cargas, almacenamientos y el resto"""
+        cargas = sum(1 for instruccion in self.instrucciones if instruccion[0] == 'ld')
+        almacenamientos = sum(1 for instruccion in self.instrucciones if instruccion[0] == 'st')
+        return {'cargas': cargas, 'almacenamientos': almacenamientos,
+                'otras': len(self.instrucciones) - cargas - almacenamientos}
+
+    def texto(self, inicio=0, fin=None):
+        """Renglones 'i: instruccion' del codigo con registros"""
+        return "".join(f"{i:4d}: {formatear(instruccion)}\n"
+                       for i, instruccion in enumerate(self.instrucciones[inicio:fin], inicio))
+
+    def ejecutar(self, valores=None, max_pasos=None):
+        """Ejecuta el codigo con registros y regresa el valor final de las
+        variables (como MaquinaVirtual.estado()); cuenta las cargas y
+        almacenamientos ejecutados, que son el trafico real con la memoria"""
+        memoria = {nombre: 0.0 if simbolo.tipo == 'real' else 0 for nombre, simbolo in self.tabla_simbolos.items()}
+        memoria.update(valores or {})
+        registros = dict.fromkeys(self.nombres_registros, 0)
+        programa = self.instrucciones
+        destinos = {instruccion[3]: i for i, instruccion in enumerate(programa) if instruccion[0] == 'label'}
+
+        def valor(operando):
+            return valor_constante(operando) if es_constante(operando) else registros[operando]
+
+        cargas = almacenamientos = 0
+        limite = max_pasos if max_pasos is not None else 1 << 62
+        pc = pasos = 0
+        inicio = time.perf_counter()
+        while pc < len(programa):
+            if pasos == limite:
+                raise RuntimeError(f"Se excedio el limite de {limite} instrucciones ejecutadas")
+            pasos += 1
+            op, arg1, arg2, resultado = programa[pc]
+            pc += 1
+            if op == 'label':
+                continue
+            if op == 'ld':
+                registros[resultado] = memoria.get(arg1, 0)
+                cargas += 1
+            elif op == 'st':
+                memoria[resultado] = registros[arg1]
+                almacenamientos += 1
+            elif op == 'goto':
+                pc = destinos[resultado]
+            elif op == 'real':
+                registros[resultado] = float(valor(arg1))
+            else:
+                base = op[:-1] if op[-1] in 'er' else op  #Sin el sufijo del codigo tipado
+                if base in COMPARACIONES:
+                    if not COMPARACIONES[base](valor(arg1), valor(arg2)):
+                        pc = destinos[resultado]
+                elif base == ':=':
+                    registros[resultado] = valor(arg1)
+                elif base == '/':
+                    registros[resultado] = dividir(valor(arg1), valor(arg2))
+                else:
+                    registros[resultado] = evaluar(base, valor(arg1), valor(arg2))
+        self.tiempo = time.perf_counter() - inicio
+        self.pasos = pasos
+        self.cargas_ejecutadas = cargas
+        self.almacenamientos_ejecutados = almacenamientos
+        return {nombre: memoria[nombre] for nombre in memoria if self.es_variable_final(nombre)}
+
+    def mostrar_reporte(self):
+        """Muestra presion de registros, derrames y accesos a memoria"""
+        derramados = self.derramados()
+        temporales = sum(1 for intervalo in derramados if self.es_temporal(intervalo.nombre))
+        conteo = self.conteo()
+        print("\n" + "\033[95mASIGNACION DE REGISTROS\033[0m")
+        print("=" * 60)
+        print(f"Registros: {self.registros} ({self.registros - RESERVADOS} asignables, "
+              f"{RESERVADOS} para derrames)")
+        print(f"Valores: {len(self.intervalos)} (presion maxima: {self.presion_maxima}"
+              + (f" en el cuadruplo {self.punto_presion})" if self.punto_presion is not None else ")"))
+        print(f"Derramados: {len(derramados)} ({len(derramados) - temporales} variables, "
+              f"{temporales} temporales en {self.casillas_derrame} casillas)")
+        print(f"Instrucciones: {len(self.instrucciones)} ({conteo['cargas']} cargas, "
+              f"{conteo['almacenamientos']} almacenamientos)")
+        if self.pasos:
+            print(f"Ejecutadas: {self.pasos} ({self.cargas_ejecutadas} cargas, "
+                  f"{self.almacenamientos_ejecutados} almacenamientos)")
+
+def _fin(intervalo):
+    return intervalo.fin
+
+def _nombres_bits(bits, nombres):
+    """Nombres de los bits encendidos"""
+    resultado = []
+    while bits:
+        bit = bits & -bits
+        resultado.append(nombres[bit.bit_length() - 1])
+        bits ^= bit
+    return resultado
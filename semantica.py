@@ -0,0 +1,264 @@
+#Analisis semantico sobre los cuadruplos de Parser3Direcciones.
+#verificar() resuelve cada identificador contra la tabla de simbolos y reporta
+#las variables no declaradas y las asignaciones de un valor real a una variable
+#entera. CodigoTipado baja el codigo (ya verificado, y optimizado si se quiere)
+#a operaciones tipadas: sufijo e para entero y r para real ('+e', '/r', 'if<e',
+#':=r'...) y la conversion ('real', a, None, r) explicita donde se mezclan tipos.
+#Las temporales toman el tipo de lo que se les asigna; las variables que agrega
+#la optimizacion de ciclos (_c) son reales si alguna asignacion les da un real.
+#Asi la maquina virtual (o cualquier otro backend) ya no revisa tipos al ejecutar
+from collections import Counter
+from itertools import compress, count
+from operator import itemgetter
+
+from optimizador import ARITMETICAS, es_constante, es_temporal, valor_constante
+from proyFinal import CODIGO_OPERACION, OPERACIONES, TablaCuadruplos
+
+ENTERO = 'entero'
+REAL = 'real'
+SUFIJOS = {ENTERO: 'e', REAL: 'r'}
+
+def tipo_constante(literal):
+    return REAL if '.' in literal or 'e' in literal else ENTERO
+
+def constante_real(literal):
+    """Lexema real de una constante entera"""
+    return repr(float(valor_constante(literal)))
+
+def _tipos_variables(cuadruplos, tabla_simbolos):
+    """Tipo de cada variable no declarada ni temporal (las _c de la optimizacion de
+    ciclos, o las no declaradas): real si alguna asignacion le da un real. Como el
+    tipo de una puede depender de otra, se recorre hasta que nada cambia"""
+    variables = {}
+    while True:
+        tipos = _Tipos(tabla_simbolos, variables)
+        cambio = False
+        for op, arg1, arg2, resultado in cuadruplos:
+            if op == ':=' or op in ARITMETICAS:
+                tipo = tipos.de(arg1) if op == ':=' else tipos.combinado(arg1, arg2)
+                if es_temporal(resultado, tabla_simbolos):
+                    tipos.temporales[resultado] = tipo
+                elif resultado not in tabla_simbolos and variables.get(resultado) != REAL:
+                    cambio |= variables.get(resultado) != tipo
+                    variables[resultado] = tipo
+        if not cambio:
+            return variables
+
+class _Tipos:
+    """Tipo de un operando en el punto del recorrido: las temporales tienen el de
+    su ultima asignacion (nacen y mueren en el mismo bloque)"""
+
+    def __init__(self, tabla_simbolos, variables):
+        self.tabla_simbolos = tabla_simbolos
+        self.variables = variables
+        self.temporales = {}
+
+    def de(self, operando):
+        if es_constante(operando):
+            return tipo_constante(operando)
+        simbolo = self.tabla_simbolos.get(operando)
+        if simbolo is not None:
+            return simbolo.tipo
+        if operando in self.temporales:
+            return self.temporales[operando]
+        return self.variables.get(operando, ENTERO)
+
+    def combinado(self, arg1, arg2):
+        return REAL if self.de(arg1) == REAL or self.de(arg2) == REAL else ENTERO
+
+def verificar(cuadruplos, tabla_simbolos, temporales):
+    """Errores semanticos del codigo sin optimizar, en el orden del programa:
+    lista de (mensaje, nombre, asignacion), donde asignacion es el numero de
+    asignacion a nombre en que ocurre el error (None si es su primera aparicion);
+    con eso el parser ubica el token. temporales son los nombres que genero el
+    parser: un t5 del programa que no este declarado es una variable no
+    declarada aunque parezca temporal, y uno declarado es un error porque
+    chocaria con la temporal del mismo nombre. Cada operando distinto se clasifica una
+    vez y el recorrido solo compara indices de la tabla de operandos"""
+    tabla = cuadruplos if isinstance(cuadruplos, TablaCuadruplos) else TablaCuadruplos(cuadruplos)
+    operandos = tabla.operandos
+    n = len(operandos)
+    real = bytearray(n)  #1 si el operando es real (las temporales cambian en el recorrido)
+    entera = bytearray(n)  #1 si es una variable declarada entera
+    temporal = bytearray(n)
+    for i in range(1, n):
+        operando = operandos[i]
+        if es_constante(operando):
+            real[i] = tipo_constante(operando) == REAL
+        elif operando in tabla_simbolos:
+            real[i] = tabla_simbolos[operando].tipo == REAL
+            entera[i] = not real[i]
+        elif operando in temporales:
+            temporal[i] = 1
+    
+    #No declaradas: operandos que no son constante, temporal ni variable declarada
+    #y aparecen como argumento o resultado de algo que no es salto ni etiqueta
+    valores = bytes(0 if op == 'goto' or op == 'label' or op[0] == 'i' else 1 for op in OPERACIONES)
+    valores = valores.ljust(256, b'\0')  #Tabla de translate: un byte por codigo
+    usados = set(tabla.args1) | set(tabla.args2)
+    usados.update(compress(tabla.resultados, tabla.ops.tobytes().translate(valores)))
+    usados.discard(0)
+    no_declaradas = {i for i in usados
+                     if not temporal[i] and not es_constante(operandos[i]) and operandos[i] not in tabla_simbolos}
+    
+    #Los nombres de temporal estan reservados: se reportan en su declaracion
+    errores = [(-1, f"El nombre '{nombre}' esta reservado para las temporales", nombre, None)
+               for nombre in tabla_simbolos if es_temporal(nombre)]  #(cuadruplo, mensaje, nombre, asignacion)
+    asignar = CODIGO_OPERACION[':=']
+    aritmeticas = frozenset(CODIGO_OPERACION[op] for op in ARITMETICAS)
+    asignaciones = [0] * n
+    for k, op, a, b, r in zip(count(), tabla.ops, tabla.args1, tabla.args2, tabla.resultados):
+        if op == asignar:
+            if temporal[r]:
+                real[r] = real[a]
+                continue
+            asignaciones[r] += 1
+            if entera[r] and real[a]:
+                errores.append((k, f"No se puede asignar un valor real a la variable entera '{operandos[r]}'",
+                                operandos[r], asignaciones[r]))
+        elif op in aritmeticas:
+            real[r] = real[a] | real[b]
+    
+    if no_declaradas:
+        #Solo con errores: se busca el primer cuadruplo de cada una
+        pendientes = set(no_declaradas)
+        for k, op, a, b, r in zip(count(), tabla.ops, tabla.args1, tabla.args2, tabla.resultados):
+            for i in (a, b, r) if valores[op] else (a, b):
+                if i in pendientes:
+                    pendientes.discard(i)
+                    errores.append((k, f"Variable '{operandos[i]}' no declarada", operandos[i], None))
+            if not pendientes:
+                break
+    errores.sort(key=itemgetter(0))
+    return [error[1:] for error in errores]
+
+class CodigoTipado:
+    """Cuadruplos con operaciones tipadas en una TablaCuadruplos. Los operandos
+    1..n de la tabla son las variables declaradas en orden de declaracion, asi el
+    id de un simbolo es su indice de operando; tipos[i] es el tipo del operando i
+    (None para el vacio y las etiquetas). Si una temporal reutilizada cambia de
+    tipo se le da otro nombre, para que cada operando tenga un solo tipo"""
+
+    def __init__(self, cuadruplos, tabla_simbolos):
+        self.tabla_simbolos = tabla_simbolos
+        self.cuadruplos = TablaCuadruplos()
+        self.simbolos = {}  #Nombre -> id (indice de operando)
+        for nombre in tabla_simbolos:
+            self.simbolos[nombre] = self.cuadruplos.indice_operando(nombre)
+        self.tipos = [None] + [simbolo.tipo for simbolo in tabla_simbolos.values()]
+        self.conversiones = 0
+        if not isinstance(cuadruplos, TablaCuadruplos):
+            cuadruplos = TablaCuadruplos(cuadruplos)
+        #Las temporales nuevas siguen a la de numero mas alto
+        numeros = [int(operando[1:]) for operando in cuadruplos.operandos[1:]
+                   if es_temporal(operando, tabla_simbolos)]
+        self._siguiente_temporal = max(numeros, default=-1) + 1
+        self._tipos = _Tipos(tabla_simbolos, _tipos_variables(cuadruplos, tabla_simbolos))
+        self._nombres = {}  #Temporal original -> nombre en el codigo tipado
+        self._bajar(cuadruplos)
+
+    def tipo(self, operando):
+        """Tipo de un operando del codigo tipado"""
+        indice = self.cuadruplos.indices_operando.get(operando)
+        return self.tipos[indice] if indice is not None and indice < len(self.tipos) else None
+
+    def _agregar(self, op, arg1, arg2, resultado, tipo_resultado=None):
+        """Agrega el cuadruplo y el tipo de cada operando nuevo (el resultado sin
+        tipo es una etiqueta)"""
+        self.cuadruplos.agregar(op, arg1, arg2, resultado)
+        tipos = self.tipos
+        indices = self.cuadruplos.indices_operando
+        for operando in (arg1, arg2):
+            if indices[operando] == len(tipos):
+                tipos.append(self._tipos.de(operando))
+        if indices[resultado] == len(tipos):
+            tipos.append(tipo_resultado)
+
+    def _temporal(self, tipo):
+        nombre = f"t{self._siguiente_temporal}"
+        self._siguiente_temporal += 1
+        self._tipos.temporales[nombre] = tipo
+        return nombre
+
+    def _operando(self, operando):
+        return self._nombres.get(operando, operando)
+
+    def _a_real(self, operando):
+        """El operando como real: las constantes se reescriben, lo demas se convierte"""
+        if self._tipos.de(operando) == REAL:
+            return operando
+        if es_constante(operando):
+            return constante_real(operando)
+        temporal = self._temporal(REAL)
+        self._agregar('real', operando, None, temporal, REAL)
+        self.conversiones += 1
+        return temporal
+
+    def _destino(self, resultado, tipo):
+        """Nombre donde se guarda un valor de ese tipo; una temporal que ya tuvo
+        otro tipo recibe un nombre nuevo"""
+        if not es_temporal(resultado, self.tabla_simbolos):
+            return resultado
+        nombre = resultado
+        indice = self.cuadruplos.indices_operando.get(nombre)
+        if indice is not None and indice < len(self.tipos) and self.tipos[indice] != tipo:
+            nombre = self._temporal(tipo)
+        self._nombres[resultado] = nombre
+        self._tipos.temporales[nombre] = tipo
+        return nombre
+
+    def _guardar(self, op, arg1, arg2, resultado, tipo):
+        """Emite op (ya tipada) con un resultado de ese tipo; si el destino es
+        real y el valor entero, pasa por una temporal y se convierte"""
+        if (not es_temporal(resultado, self.tabla_simbolos) and self._tipos.de(resultado) == REAL
+                and tipo == ENTERO):
+            if op == ':=e':
+                self._agregar('real', arg1, None, resultado, REAL)
+                self.conversiones += 1
+                return
+            temporal = self._temporal(ENTERO)
+            self._agregar(op, arg1, arg2, temporal, ENTERO)
+            self._agregar('real', temporal, None, resultado, REAL)
+            self.conversiones += 1
+            return
+        self._agregar(op, arg1, arg2, self._destino(resultado, tipo), tipo)
+
+    def _bajar(self, cuadruplos):
+        tipos = self._tipos
+        for op, arg1, arg2, resultado in cuadruplos:
+            if op == 'goto' or op == 'label':
+                self._agregar(op, None, None, resultado)
+                continue
+            arg1 = self._operando(arg1)
+            arg2 = self._operando(arg2) if arg2 is not None else None
+            if op == ':=':
+                tipo = tipos.de(arg1)
+                if tipo == ENTERO and es_constante(arg1) and tipos.de(resultado) == REAL:
+                    self._guardar(':=r', constante_real(arg1), None, resultado, REAL)
+                else:
+                    self._guardar(':=' + SUFIJOS[tipo], arg1, None, resultado, tipo)
+                continue
+            tipo = tipos.combinado(arg1, arg2)
+            if tipo == REAL:
+                arg1 = self._a_real(arg1)
+                arg2 = self._a_real(arg2)
+            if op in ARITMETICAS:
+                self._guardar(op + SUFIJOS[tipo], arg1, arg2, resultado, tipo)
+            else:
+                self._agregar(op + SUFIJOS[tipo], arg1, arg2, resultado)
+
+    def conteo(self):
+        """Cuadruplos por operacion tipada"""
+        return Counter(op for op, _, _, _ in self.cuadruplos)
+
+    def mostrar_reporte(self):
+        """Muestra cuantas operaciones son enteras, reales y conversiones"""
+        conteo = self.conteo()
+        enteras = sum(veces for op, veces in conteo.items() if op.endswith('e'))
+        reales = sum(veces for op, veces in conteo.items() if op.endswith('r'))
+        print("\n" + "\033[95mCODIGO TIPADO\033[0m")
+        print("=" * 60)
+        print(f"Operaciones enteras: {enteras}")
+        print(f"Operaciones reales: {reales}")
+        print(f"Conversiones a real: {self.conversiones}")
+        print(f"Simbolos: {len(self.simbolos)}")
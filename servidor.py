@@ -0,0 +1,348 @@
+#Servidor de compilacion: un proceso que se queda corriendo para que las
+#herramientas de construccion no paguen el arranque de Python (ni importar re,
+#ni compilar los patrones del lexer) en cada compilacion.
+#Uso: python servidor.py --unix /tmp/compilador.sock     (o --puerto 8765, en 127.0.0.1)
+#Protocolo: JSON por lineas (un objeto por linea, en UTF-8) en ambos sentidos.
+#    {"id": 1, "op": "compilar", "codigo": "being ... end",
+#     "opciones": {"motor": "ll1", "optimizar": true}, "cuadruplos": true}
+#    -> {"id": 1, "ok": true, "origen": "compilado", "tiempos": {...},
+#        "exito": true, "errores": [], "cuadruplos": [[":=", "5", null, "a"], ...],
+#        "simbolos": {"a": "entero"}, ...}
+#Las opciones son las de compilador.Opciones. Otras operaciones: "ping", "estado"
+#y "apagar". Una conexion puede mandar muchas peticiones sin esperar respuesta;
+#las respuestas salen conforme terminan (el id dice a cual corresponde).
+#Las compilaciones corren en un pool de procesos acotado que se queda caliente
+#(modulos importados y cache de compilacion por proceso) y el servidor recuerda
+#las respuestas ya codificadas de las ultimas compilaciones. Ver cliente.py
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cache_compilacion import clave_compilacion
+from compilador import Opciones, Resultado, compilar
+from proyFinal import MOTORES
+
+LIMITE_LINEA = 64 * 1024 * 1024  #Bytes maximos de una peticion
+
+#Estado de cada proceso del pool
+_cache_proceso = None
+
+def _iniciar_proceso(cache, cache_max_bytes):
+    """Prepara un proceso del pool: crea su cache y compila un programa minimo
+    para que la primera peticion no pague la carga de los modulos"""
+    global _cache_proceso
+    if cache is not None:
+        from cache_compilacion import CacheCompilacion
+        _cache_proceso = CacheCompilacion(cache, cache_max_bytes)
+    for motor in MOTORES:
+        compilar("being entero a; a := 1 end", motor=motor, optimizar=True)
+
+def compilar_peticion(codigo_fuente, ajustes, cuadruplos=True):
+    """Compila en un proceso del pool y devuelve (respuesta JSON en bytes, origen,
+    segundos). Con cache, las compilaciones sin metricas pasan por ella"""
+    inicio = time.perf_counter()
+    opciones = Opciones(**ajustes)
+    if _cache_proceso is not None and not opciones.metricas:
+        tokens, parser, exito, errores, origen = _cache_proceso.compilar(
+            codigo_fuente, opciones.motor, opciones.reutilizar_temporales, opciones.optimizar,
+            opciones.recuperar_errores, opciones.verificar_tipos)
+        resultado = Resultado(codigo_fuente, opciones, tokens, parser, exito, errores)
+    else:
+        resultado = compilar(codigo_fuente, opciones)
+        origen = 'compilado'
+    datos = json.dumps(resultado.como_diccionario(cuadruplos), separators=(',', ':')).encode()
+    return datos, origen, time.perf_counter() - inicio
+
+def _respuesta(identificador, datos=None, **campos):
+    """Linea de respuesta: los campos del sobre (id, ok, origen, tiempos...) y,
+    si hay, el objeto JSON ya codificado datos, sin volver a decodificarlo"""
+    sobre = json.dumps({'id': identificador, 'ok': True, **campos}, separators=(',', ':')).encode()
+    if datos is None:
+        return sobre + b'\n'
+    return sobre[:-1] + b',' + datos[1:] + b'\n'
+
+def _error(identificador, mensaje):
+    return json.dumps({'id': identificador, 'ok': False, 'error': mensaje},
+                      separators=(',', ':')).encode() + b'\n'
+
+class ErrorPeticion(Exception):
+    """Peticion mal formada (se contesta con ok=false y la conexion sigue)"""
+
+class ServidorCompilacion:
+    """Servidor asyncio de compilacion. procesos=0 compila en un hilo de este
+    mismo proceso (util para pruebas o maquinas de un CPU). max_pendientes acota
+    las compilaciones en curso: al llegar al limite se deja de leer de los
+    clientes hasta que alguna termina"""
+
+    def __init__(self, procesos=None, max_pendientes=None, max_respuestas=256, cache=None,
+                 cache_max_bytes=64 * 1024 * 1024):
+        self.procesos = (os.cpu_count() or 1) if procesos is None else procesos
+        self.max_pendientes = max_pendientes or max(1, self.procesos) * 4
+        self.max_respuestas = max_respuestas
+        self.cache = cache
+        self.cache_max_bytes = cache_max_bytes
+        self.respuestas = OrderedDict()  #Clave -> respuesta codificada, de la menos a la mas reciente
+        self.en_curso = {}  #Clave -> Future de la compilacion (peticiones iguales la comparten)
+        self.estadisticas = dict.fromkeys(('conexiones', 'peticiones', 'compilaciones',
+                                           'aciertos', 'compartidas', 'errores'), 0)
+        self._pool = None
+        self._limite = None
+        self._servidor = None
+        self._ruta_unix = None
+        self._apagado = None
+        self._conexiones = {}  #StreamWriter -> tarea que atiende la conexion
+        self._inicio = time.perf_counter()
+
+    def _crear_pool(self):
+        argumentos = (self.cache, self.cache_max_bytes)
+        if self.procesos == 0:
+            _iniciar_proceso(*argumentos)
+            return ThreadPoolExecutor(max_workers=1)
+        return ProcessPoolExecutor(max_workers=self.procesos, initializer=_iniciar_proceso,
+                                   initargs=argumentos)
+
+    async def iniciar(self, ruta_unix=None, host='127.0.0.1', puerto=0):
+        """Abre el socket (Unix si se da ruta_unix, si no TCP) y regresa la
+        direccion: la ruta, o (host, puerto) con el puerto real si se pidio 0"""
+        self._limite = asyncio.Semaphore(self.max_pendientes)
+        self._apagado = asyncio.Event()
+        self._pool = self._crear_pool()
+        if ruta_unix is not None:
+            _quitar_socket_viejo(ruta_unix)
+            self._ruta_unix = ruta_unix
+            self._servidor = await asyncio.start_unix_server(self._atender, ruta_unix, limit=LIMITE_LINEA)
+            return ruta_unix
+        self._servidor = await asyncio.start_server(self._atender, host, puerto, limit=LIMITE_LINEA)
+        return self._servidor.sockets[0].getsockname()[:2]
+
+    async def servir(self):
+        """Atiende hasta que se pide apagar"""
+        async with self._servidor:
+            await self._apagado.wait()
+            #Las conexiones abiertas se cierran; lo que ya estaba en curso termina
+            for escritor in self._conexiones:
+                escritor.close()
+            await asyncio.gather(*self._conexiones.values(), return_exceptions=True)
+        self.cerrar()
+
+    def apagar(self):
+        if self._apagado is not None:
+            self._apagado.set()
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._ruta_unix is not None:
+            try:
+                os.remove(self._ruta_unix)
+            except OSError:
+                pass
+            self._ruta_unix = None
+
+    async def _atender(self, lector, escritor):
+        """Lee peticiones de una conexion; cada una se contesta en su propia tarea"""
+        self.estadisticas['conexiones'] += 1
+        self._conexiones[escritor] = asyncio.current_task()
+        candado = asyncio.Lock()  #Un solo drain a la vez por conexion
+        tareas = set()
+        try:
+            while True:
+                try:
+                    linea = await lector.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    await self._escribir(escritor, candado, _error(None, "Peticion demasiado grande"))
+                    break
+                except ConnectionError:
+                    break
+                if not linea:
+                    break
+                if not linea.strip():
+                    continue
+                await self._limite.acquire()
+                tarea = asyncio.create_task(self._contestar(linea, escritor, candado))
+                tareas.add(tarea)
+                tarea.add_done_callback(tareas.discard)
+                tarea.add_done_callback(lambda _: self._limite.release())
+            if tareas:
+                await asyncio.gather(*tareas, return_exceptions=True)
+        finally:
+            del self._conexiones[escritor]
+            escritor.close()
+            try:
+                await escritor.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def _escribir(escritor, candado, datos):
+        async with candado:
+            if escritor.is_closing():
+                return
+            escritor.write(datos)
+            try:
+                await escritor.drain()
+            except ConnectionError:
+                pass
+
+    async def _contestar(self, linea, escritor, candado):
+        identificador = None
+        self.estadisticas['peticiones'] += 1
+        try:
+            try:
+                peticion = json.loads(linea)
+            except ValueError as e:
+                raise ErrorPeticion(f"JSON invalido: {e}") from None
+            if not isinstance(peticion, dict):
+                raise ErrorPeticion("La peticion debe ser un objeto JSON")
+            identificador = peticion.get('id')
+            respuesta = await self._despachar(identificador, peticion)
+        except ErrorPeticion as e:
+            self.estadisticas['errores'] += 1
+            respuesta = _error(identificador, str(e))
+        except Exception as e:  #Un error al compilar no debe tumbar el servidor
+            self.estadisticas['errores'] += 1
+            respuesta = _error(identificador, f"{type(e).__name__}: {e}")
+        await self._escribir(escritor, candado, respuesta)
+
+    async def _despachar(self, identificador, peticion):
+        op = peticion.get('op', 'compilar')
+        if op == 'compilar':
+            return await self._compilar(identificador, peticion)
+        if op == 'ping':
+            return _respuesta(identificador)
+        if op == 'estado':
+            return _respuesta(identificador, estado=self.estado())
+        if op == 'apagar':
+            asyncio.get_running_loop().call_soon(self.apagar)
+            return _respuesta(identificador)
+        raise ErrorPeticion(f"Operacion desconocida: {op}")
+
+    async def _compilar(self, identificador, peticion):
+        llegada = time.perf_counter()
+        codigo_fuente = peticion.get('codigo')
+        if not isinstance(codigo_fuente, str):
+            raise ErrorPeticion("Falta el codigo fuente ('codigo')")
+        ajustes = peticion.get('opciones') or {}
+        if not isinstance(ajustes, dict):
+            raise ErrorPeticion("'opciones' debe ser un objeto")
+        try:
+            opciones = Opciones(**ajustes)
+        except TypeError as e:
+            raise ErrorPeticion(f"Opciones invalidas: {e}") from None
+        if opciones.motor not in MOTORES:
+            raise ErrorPeticion(f"Motor desconocido: {opciones.motor}")
+        if opciones.procesos != 1:
+            raise ErrorPeticion("El servidor ya reparte las compilaciones entre sus procesos ('procesos' debe ser 1)")
+        cuadruplos = bool(peticion.get('cuadruplos', True))
+
+        clave = None
+        if not opciones.metricas:  #Con metricas se quiere medir de verdad
+            clave = (clave_compilacion(codigo_fuente, opciones.motor, opciones.reutilizar_temporales,
+                                       opciones.optimizar, opciones.recuperar_errores,
+                                       opciones.verificar_tipos), cuadruplos)
+            guardada = self.respuestas.get(clave)
+            if guardada is not None:
+                self.respuestas.move_to_end(clave)
+                self.estadisticas['aciertos'] += 1
+                return _respuesta(identificador, guardada, origen='servidor', tiempos={
+                    'cola': 0.0, 'compilacion': 0.0, 'total': time.perf_counter() - llegada})
+
+        futuro = self.en_curso.get(clave) if clave is not None else None
+        if futuro is not None:
+            self.estadisticas['compartidas'] += 1
+        else:
+            futuro = asyncio.ensure_future(self._en_pool(codigo_fuente, vars(opciones), cuadruplos))
+            if clave is not None:
+                self.en_curso[clave] = futuro
+                futuro.add_done_callback(lambda _: self.en_curso.pop(clave, None))
+        datos, origen, compilacion = await asyncio.shield(futuro)
+        if clave is not None and clave not in self.respuestas:
+            self.respuestas[clave] = datos
+            while len(self.respuestas) > self.max_respuestas:
+                self.respuestas.popitem(last=False)
+        total = time.perf_counter() - llegada
+        return _respuesta(identificador, datos, origen=origen, tiempos={
+            'cola': max(0.0, total - compilacion), 'compilacion': compilacion, 'total': total})
+
+    async def _en_pool(self, codigo_fuente, ajustes, cuadruplos):
+        self.estadisticas['compilaciones'] += 1
+        lazo = asyncio.get_running_loop()
+        try:
+            return await lazo.run_in_executor(self._pool, compilar_peticion, codigo_fuente, ajustes, cuadruplos)
+        except BrokenProcessPool:
+            #Un proceso murio (memoria, senal...): se cambia el pool y la peticion falla
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._crear_pool()
+            raise ErrorPeticion("El proceso de compilacion termino inesperadamente") from None
+
+    def estado(self):
+        return {**self.estadisticas, 'procesos': self.procesos, 'max_pendientes': self.max_pendientes,
+                'en_curso': len(self.en_curso), 'respuestas_guardadas': len(self.respuestas),
+                'activo': time.perf_counter() - self._inicio}
+
+def _quitar_socket_viejo(ruta):
+    """Borra un socket Unix que quedo de una corrida anterior (si nadie lo usa)"""
+    if not os.path.exists(ruta):
+        return
+    prueba = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        prueba.connect(ruta)
+    except OSError:
+        os.remove(ruta)
+    else:
+        raise OSError(f"Ya hay un servidor escuchando en {ruta}")
+    finally:
+        prueba.close()
+
+async def _correr(servidor, ruta_unix, host, puerto):
+    direccion = await servidor.iniciar(ruta_unix, host, puerto)
+    if ruta_unix is None:
+        direccion = f"{direccion[0]}:{direccion[1]}"
+    print(f"Servidor de compilacion escuchando en {direccion} "
+          f"({servidor.procesos or 'sin'} procesos, hasta {servidor.max_pendientes} compilaciones en curso)",
+          flush=True)
+    await servidor.servir()
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        prog='servidor.py',
+        description="Servidor de compilacion con JSON por lineas sobre un socket local")
+    direccion = parser.add_mutually_exclusive_group()
+    direccion.add_argument('--unix', metavar='RUTA', help="socket Unix donde escuchar")
+    direccion.add_argument('--puerto', type=int, default=8765, help="puerto TCP (por defecto 8765)")
+    parser.add_argument('--host', default='127.0.0.1', help="interfaz TCP (por defecto solo local)")
+    parser.add_argument('-j', '--procesos', type=int, default=None,
+                        help="procesos del pool (por defecto, uno por CPU; 0 compila en el servidor)")
+    parser.add_argument('--max-pendientes', type=int, default=None,
+                        help="compilaciones en curso como maximo (por defecto 4 por proceso)")
+    parser.add_argument('--respuestas', type=int, default=256,
+                        help="respuestas que el servidor recuerda (por defecto 256)")
+    parser.add_argument('--cache', metavar='DIR', default=None,
+                        help="directorio del cache de compilacion en disco (por defecto no se usa)")
+    parser.add_argument('--cache-max-mb', type=float, default=64)
+    opciones = parser.parse_args(argumentos)
+    if opciones.procesos is not None and opciones.procesos < 0:
+        parser.error("el numero de procesos no puede ser negativo")
+    if opciones.unix is not None and not hasattr(socket, 'AF_UNIX'):
+        parser.error("esta plataforma no tiene sockets Unix; use --puerto")
+
+    servidor = ServidorCompilacion(opciones.procesos, opciones.max_pendientes, opciones.respuestas,
+                                   opciones.cache, int(opciones.cache_max_mb * 1024 * 1024))
+    try:
+        asyncio.run(_correr(servidor, opciones.unix, opciones.host, opciones.puerto))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.cerrar()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())